@@ -3,7 +3,7 @@
 # =============================================================================
 _module_info = {
     "name": "Discord Notifier",
-    "description": "Discord Webhook notification functionality",
+    "description": "Discord Webhook notification functionality (requires the webhook_transport plugin alongside it)",
     "author": "BatteryShark",
     "version": "1.0.0",
     "platform": "any",
@@ -11,15 +11,70 @@ _module_info = {
     "dependencies": ["requests"],
     "environment_variables": {
         "DISCORD_NOTIFIER_WEBHOOK_URL": {
-            "description": "Discord Webhook URL",
+            "description": "Discord Webhook URL (the 'default' destination). Either this or DISCORD_NOTIFIER_DESTINATIONS must be set",
             "default": "",
-            "required": True
+            "required": False
+        },
+        "DISCORD_NOTIFIER_DESTINATIONS": {
+            "description": "JSON object mapping destination names to webhook URLs or to {\"url\": ..., \"match\": regex} routing rules",
+            "default": "",
+            "required": False
         },
         "DISCORD_NOTIFIER_ENABLED": {
             "description": "Enable/disable notifications",
             "default": "true",
             "required": False
         },
+        "DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT": {
+            "description": "Maximum seconds to wait for Discord rate limit capacity before giving up",
+            "default": "30",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_MAX_RATE_LIMIT_RETRIES": {
+            "description": "Times a message rejected with 429 is retried after retry_after",
+            "default": "5",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_COALESCE_WINDOW_MS": {
+            "description": "Background mode: milliseconds to collect messages into one webhook call (0 disables)",
+            "default": "0",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_COALESCE_MAX": {
+            "description": "Background mode: messages that flush a coalescing window early",
+            "default": "10",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_DEDUPE_WINDOW": {
+            "description": "Seconds during which an identical notification is suppressed (0 disables)",
+            "default": "0",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_THROTTLE_PER_MINUTE": {
+            "description": "Notifications allowed per minute for each webhook and title (0 disables)",
+            "default": "0",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_THROTTLE_BURST": {
+            "description": "Notifications a webhook and title may send at once before throttling applies",
+            "default": "5",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_ROLLUP": {
+            "description": "Send one '(xN)' follow-up for notifications suppressed by dedupe or throttling",
+            "default": "false",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_OUTBOX_PATH": {
+            "description": "SQLite file for the durable outbox; messages are persisted before sending and replayed after failures or restarts",
+            "default": "",
+            "required": False
+        },
+        "DISCORD_NOTIFIER_DELIVERY_MODE": {
+            "description": "'sync' waits for the webhook; 'background' queues and returns a delivery id",
+            "default": "sync",
+            "required": False
+        },
         "DISCORD_NOTIFIER_BOT_NAME": {
             "description": "Bot name",
             "default": "MCP Helper",
@@ -33,9 +88,9 @@ _module_info = {
 # =============================================================================
 # START OF EXPORTS
 # =============================================================================
-from .notifier import send_discord_notification
+from .notifier import send_discord_notification, get_discord_notification_status
 _module_exports = {
-    "tools": [send_discord_notification]
+    "tools": [send_discord_notification, get_discord_notification_status]
 }
 # =============================================================================
 # END OF EXPORTS
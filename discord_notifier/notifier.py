@@ -1,25 +1,73 @@
 import requests
 import os
 import logging
+import threading
 
+try:
+    from webhook_transport import get_transport
+    from webhook_transport.delivery import create_delivery_queue
+    from webhook_transport.throttle import SUPPRESSED, create_throttle
+    from webhook_transport.fanout import fan_out, load_destinations, route_destinations
+except ImportError as e:
+    # A sibling plugin, not a pip package: the plugins directory itself must be importable
+    raise ImportError(
+        "discord_notifier requires the webhook_transport plugin from this repository, installed next to "
+        "discord_notifier with their parent (plugins) directory on sys.path"
+    ) from e
+from .rate_limits import get_rate_limiter
 
-def send_discord_notification(message,title="",bot_name=os.getenv("DISCORD_NOTIFIER_BOT_NAME", "General Helper")):
-    if os.getenv("DISCORD_NOTIFIER_ENABLED", "true").lower() == "false":
-        logging.info("Discord notifications are disabled")
-        return False
-    
+# Discord accepts at most 10 embeds and 6000 embed characters per webhook message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+_delivery_queue = None
+_delivery_queue_lock = threading.Lock()
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def _build_payload(message, title, bot_name):
     embed = {
     "title": title,
     "description": message,
     "color": 10181046
     }
 
-    data = {
+    return {
     "username": bot_name,
     "embeds": [embed]
     }
 
-    response = requests.post(os.getenv("DISCORD_NOTIFIER_WEBHOOK_URL"), json=data)
+
+def _deliver(job):
+    """
+    Send one queued or immediate message. Returns True on a 204 from Discord.
+
+    Sends are paced by the webhook's rate limit bucket, and 429 responses are
+    retried once Discord's retry_after has passed.
+    """
+    webhook_url = job["webhook_url"]
+    limiter = get_rate_limiter()
+    max_wait = float(os.getenv("DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT", "30"))
+    max_retries = int(os.getenv("DISCORD_NOTIFIER_MAX_RATE_LIMIT_RETRIES", "5"))
+
+    for attempt in range(max_retries + 1):
+        if not limiter.acquire(webhook_url, max_wait):
+            logging.error('Discord rate limit wait too long, message not sent')
+            return False
+        try:
+            response = get_transport().post_json(webhook_url, job["payload"])
+        except requests.exceptions.RequestException as e:
+            limiter.release(webhook_url)
+            logging.error(f'Error sending message to Discord webhook: {e}')
+            return False
+
+        # On a 429 the limiter now holds the reset time; acquire() waits it out
+        if limiter.update(webhook_url, response) is None:
+            break
+    else:
+        logging.error(f'Discord webhook still rate limited after {max_retries} retries')
+        return False
 
     if response.status_code != 204:
         logging.error('Could not send message to Discord webhook')
@@ -27,7 +75,166 @@ def send_discord_notification(message,title="",bot_name=os.getenv("DISCORD_NOTIF
     logging.info('Message sent to Discord webhook')
     return True
 
+
+def _embed_chars(embed):
+    return len(embed.get("title") or "") + len(embed.get("description") or "")
+
+
+def _coalesce_key(job):
+    return (job["webhook_url"], job["payload"]["username"])
+
+
+def _pack(jobs):
+    """Pack queued messages for one webhook and bot name into as few webhook calls as Discord allows."""
+    packed = []
+    embeds, indexes, chars = [], [], 0
+    for index, job in enumerate(jobs):
+        job_embeds = job["payload"]["embeds"]
+        job_chars = sum(_embed_chars(embed) for embed in job_embeds)
+        if embeds and (len(embeds) + len(job_embeds) > MAX_EMBEDS_PER_MESSAGE or
+                       chars + job_chars > MAX_EMBED_CHARS_PER_MESSAGE):
+            packed.append((embeds, indexes))
+            embeds, indexes, chars = [], [], 0
+        embeds.extend(job_embeds)
+        indexes.append(index)
+        chars += job_chars
+    if embeds:
+        packed.append((embeds, indexes))
+
+    webhook_url, username = _coalesce_key(jobs[0])
+    return [
+        ({"webhook_url": webhook_url, "payload": {"username": username, "embeds": embeds}}, indexes)
+        for embeds, indexes in packed
+    ]
+
+
+def _get_delivery_queue():
+    global _delivery_queue
+    with _delivery_queue_lock:
+        if _delivery_queue is None:
+            _delivery_queue = create_delivery_queue(
+                "discord",
+                _deliver,
+                outbox_path=os.getenv("DISCORD_NOTIFIER_OUTBOX_PATH"),
+                coalesce_window=float(os.getenv("DISCORD_NOTIFIER_COALESCE_WINDOW_MS", "0")) / 1000,
+                coalesce_max=int(os.getenv("DISCORD_NOTIFIER_COALESCE_MAX", "10")),
+                group_key=_coalesce_key,
+                pack=_pack,
+                on_failed=_release_throttle
+            )
+        return _delivery_queue
+
+
+def _dispatch(job, background):
+    if background:
+        return _get_delivery_queue().submit(job) or False
+
+    if os.getenv("DISCORD_NOTIFIER_OUTBOX_PATH"):
+        # Persisted before sending; a failed send stays in the outbox and is replayed
+        return _get_delivery_queue().deliver_now(job)
+    return _deliver(job)
+
+
+def _send_rollup(sample, count):
+    """Send one follow-up standing in for the copies of a notification that were suppressed."""
+    title = f"{sample['title']} (x{count})".strip()
+    job = {"webhook_url": sample["webhook_url"], "payload": _build_payload(sample["message"], title, sample["bot_name"])}
+    _dispatch(job, os.getenv("DISCORD_NOTIFIER_DELIVERY_MODE", "sync").lower() == "background")
+
+
+def _get_throttle():
+    global _throttle
+    with _throttle_lock:
+        if _throttle is None:
+            _throttle = create_throttle("DISCORD_NOTIFIER", rollup=_send_rollup)
+        return _throttle
+
+
+def _release_throttle(job):
+    """Let a retry of an undelivered message through the throttle again."""
+    if "throttle" in job:
+        webhook_url, title, content = job["throttle"]
+        _get_throttle().failed((webhook_url, title), content)
+
+
+def send_discord_notification(message,title="",bot_name=os.getenv("DISCORD_NOTIFIER_BOT_NAME", "General Helper"),background=None,destinations=None):
+    """
+    Send a notification to Discord via webhook.
+
+    Args:
+        message (str): The main message content
+        title (str, optional): Title for the embed. Defaults to "".
+        bot_name (str, optional): Custom bot name. Defaults to environment variable or "General Helper".
+        background (bool, optional): Queue the message and return immediately. Defaults to
+            DISCORD_NOTIFIER_DELIVERY_MODE == "background".
+        destinations (list or str, optional): Names of configured destinations to send to.
+            Defaults to every destination whose routing rule matches the notification.
+
+    Returns:
+        bool or str: True/False for immediate sends; a delivery id for background sends
+        (False if the message could not be queued); "suppressed" if it was dropped as a duplicate or throttled.
+        With DISCORD_NOTIFIER_DESTINATIONS or destinations given, a dict with "success" (all
+        destinations succeeded) and "results" (the result for each destination name).
+    """
+    if os.getenv("DISCORD_NOTIFIER_ENABLED", "true").lower() == "false":
+        logging.info("Discord notifications are disabled")
+        return False
+    
+    configured = load_destinations(os.getenv("DISCORD_NOTIFIER_DESTINATIONS"), os.getenv("DISCORD_NOTIFIER_WEBHOOK_URL"))
+    if not configured:
+        logging.error("Neither DISCORD_NOTIFIER_WEBHOOK_URL nor DISCORD_NOTIFIER_DESTINATIONS is set")
+        return False
+
+    payload = _build_payload(message, title, bot_name)
+    if background is None:
+        background = os.getenv("DISCORD_NOTIFIER_DELIVERY_MODE", "sync").lower() == "background"
+
+    def send_to(webhook_url):
+        job = {"webhook_url": webhook_url, "payload": payload}
+        throttle = _get_throttle()
+        if throttle.enabled:
+            content = f"{bot_name}\0{title}\0{message}"
+            sample = {"webhook_url": webhook_url, "message": message, "title": title, "bot_name": bot_name}
+            if not throttle.allow((webhook_url, title), content, sample):
+                return SUPPRESSED
+            # Kept with the job so a background delivery that finally fails can release it too
+            job["throttle"] = [webhook_url, title, content]
+        result = _dispatch(job, background)
+        if not result:
+            _release_throttle(job)
+        return result
+
+    if destinations is None and not os.getenv("DISCORD_NOTIFIER_DESTINATIONS"):
+        return send_to(configured["default"]["url"])
+
+    targets, unknown = route_destinations(configured, f"{title}\n{message}", destinations)
+    results = fan_out(targets, send_to)
+    for name in unknown:
+        logging.error(f"Unknown Discord destination '{name}'")
+        results[name] = False
+    if not results:
+        logging.warning("No Discord destination matched the notification")
+    return {"success": bool(results) and all(results.values()), "results": results}
+
+
+def get_discord_notification_status(delivery_id):
+    """
+    Look up the status of a background Discord notification.
+
+    Args:
+        delivery_id (str): The id returned by send_discord_notification in background mode
+
+    Returns:
+        dict or None: The delivery record (state is queued, sending, retrying, delivered or failed),
+        or None if the id is unknown
+    """
+    return _get_delivery_queue().status(delivery_id)
+
+# Replay anything a previous run left in the outbox as soon as the plugin loads
+if os.getenv("DISCORD_NOTIFIER_OUTBOX_PATH"):
+    _get_delivery_queue()
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
-    send_discord_notification("Hello, world!")
\ No newline at end of file
+    send_discord_notification("Hello, world!")
@@ -0,0 +1,138 @@
+"""
+Discord webhook rate limit tracking.
+
+Discord reports its limits on every webhook response through the
+X-RateLimit-* headers and, on a 429, a JSON body with retry_after. The
+limiter records them per webhook and makes senders wait for capacity before
+sending instead of bouncing off the limit.
+"""
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiscordRateLimiter:
+    """Per-webhook view of Discord's rate limit buckets, shared by all senders."""
+
+    def __init__(self):
+        self._limits: Dict[str, Dict[str, Any]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._global_reset_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, webhook_url: str, max_wait: float) -> bool:
+        """
+        Reserve one request against the webhook's bucket, sleeping until it has capacity.
+
+        Returns False if the wait would exceed max_wait seconds.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                limit = self._limits.get(webhook_url)
+                if limit and limit["reset_at"] <= now:
+                    # Window elapsed: assume the bucket refilled until Discord tells us otherwise
+                    limit["remaining"] = limit["limit"] - self._in_flight.get(webhook_url, 0)
+                    limit["reset_at"] = now + limit["reset_after"]
+
+                wait_until = self._global_reset_at
+                if limit and limit["remaining"] <= 0:
+                    wait_until = max(wait_until, limit["reset_at"])
+
+                if wait_until <= now:
+                    if limit:
+                        limit["remaining"] -= 1
+                    self._in_flight[webhook_url] = self._in_flight.get(webhook_url, 0) + 1
+                    return True
+
+            if wait_until > deadline:
+                logger.warning(f"Discord rate limit wait of {wait_until - now:.2f}s exceeds {max_wait}s")
+                return False
+            logger.info(f"Waiting {wait_until - now:.2f}s for Discord rate limit")
+            time.sleep(wait_until - now)
+
+    def update(self, webhook_url: str, response) -> Optional[float]:
+        """
+        Record the rate limit state reported by a webhook response.
+
+        Returns the number of seconds to wait before retrying if the response was a 429.
+        """
+        headers = response.headers
+        now = time.monotonic()
+        with self._lock:
+            in_flight = self._release(webhook_url)
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                try:
+                    limit = int(headers.get("X-RateLimit-Limit", remaining))
+                    self._limits[webhook_url] = {
+                        "bucket": headers.get("X-RateLimit-Bucket"),
+                        "limit": max(limit, 1),
+                        # Discord's count does not include our other requests still in flight
+                        "remaining": int(remaining) - in_flight,
+                        "reset_after": float(reset_after),
+                        "reset_at": now + float(reset_after)
+                    }
+                except ValueError:
+                    logger.debug(f"Ignoring malformed Discord rate limit headers: {dict(headers)}")
+
+            if response.status_code != 429:
+                return None
+
+            retry_after = self._retry_after(response)
+            is_global = headers.get("X-RateLimit-Global", "").lower() == "true" or headers.get("X-RateLimit-Scope") == "global"
+            if is_global:
+                self._global_reset_at = max(self._global_reset_at, now + retry_after)
+            else:
+                limit = self._limits.setdefault(webhook_url, {
+                    "bucket": headers.get("X-RateLimit-Bucket"),
+                    "limit": 1,
+                    "reset_after": retry_after
+                })
+                limit["remaining"] = 0
+                limit["reset_at"] = now + retry_after
+            logger.warning(f"Discord webhook rate limited ({'global' if is_global else 'bucket'}), retry after {retry_after:.2f}s")
+            return retry_after
+
+    def release(self, webhook_url: str) -> None:
+        """Return a reservation for a request that failed without a response."""
+        with self._lock:
+            self._release(webhook_url)
+
+    def _release(self, webhook_url: str) -> int:
+        """Drop one in-flight reservation and return how many remain. Caller holds the lock."""
+        in_flight = max(0, self._in_flight.get(webhook_url, 0) - 1)
+        self._in_flight[webhook_url] = in_flight
+        return in_flight
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        try:
+            body = json.loads(response.text or "{}")
+            if "retry_after" in body:
+                return float(body["retry_after"])
+        except (ValueError, TypeError):
+            pass
+        try:
+            return float(response.headers.get("Retry-After", "1"))
+        except ValueError:
+            return 1.0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current per-webhook limit state, for diagnostics."""
+        with self._lock:
+            return {url: dict(limit) for url, limit in self._limits.items()}
+
+
+_rate_limiter = DiscordRateLimiter()
+
+
+def get_rate_limiter() -> DiscordRateLimiter:
+    """The process-wide Discord rate limiter."""
+    return _rate_limiter
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test packing coalesced Discord notifications into webhook calls.
+
+Checks that packed payloads stay within Discord's embed count and character
+limits, and that a background queue using the packer gives every queued
+message an outcome. No webhook is contacted.
+"""
+import os
+import sys
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_notifier import notifier
+from discord_notifier.notifier import MAX_EMBED_CHARS_PER_MESSAGE, MAX_EMBEDS_PER_MESSAGE
+from webhook_transport.delivery import DELIVERED, DeliveryQueue
+
+WEBHOOK_URL = "https://discord.com/api/webhooks/0/test"
+
+
+def _job(message, title="Alert"):
+    return {"webhook_url": WEBHOOK_URL, "payload": notifier._build_payload(message, title, "Bot")}
+
+
+def _check_limits(packed, jobs):
+    """Every pack is within limits and every job is in exactly one pack, in order."""
+    for payload, _ in packed:
+        embeds = payload["payload"]["embeds"]
+        assert len(embeds) <= MAX_EMBEDS_PER_MESSAGE
+        assert len(embeds) == 1 or sum(notifier._embed_chars(embed) for embed in embeds) <= MAX_EMBED_CHARS_PER_MESSAGE
+        assert payload["webhook_url"] == WEBHOOK_URL
+    assert [index for _, indexes in packed for index in indexes] == list(range(len(jobs)))
+
+
+def test_pack_splits_at_embed_limit():
+    jobs = [_job(f"message {i}") for i in range(25)]
+    packed = notifier._pack(jobs)
+    _check_limits(packed, jobs)
+    assert [len(indexes) for _, indexes in packed] == [10, 10, 5]
+
+
+def test_pack_splits_at_character_limit():
+    title = "Alert"
+    jobs = [_job("x" * (2000 - len(title)), title) for _ in range(4)] + [_job("y" * 7000)]
+    packed = notifier._pack(jobs)
+    _check_limits(packed, jobs)
+    # Three 2000 character embeds fill a message; an oversized one goes on its own
+    assert [indexes for _, indexes in packed] == [[0, 1, 2], [3], [4]]
+
+
+def test_every_coalesced_message_gets_an_outcome():
+    """A background queue packing over-limit batches marks every delivery id delivered."""
+    sent = []
+    queue = DeliveryQueue("discord-test", lambda job: sent.append(job) or True, workers=1,
+                          coalesce_window=0.05, coalesce_max=25,
+                          group_key=notifier._coalesce_key, pack=notifier._pack)
+    ids = [queue.submit(_job(f"message {i}")) for i in range(25)]
+
+    assert queue.shutdown(timeout=5)
+    assert [queue.status(delivery_id)["state"] for delivery_id in ids] == [DELIVERED] * 25
+    assert len(sent) == 3
+    assert [embed["description"] for job in sent for embed in job["payload"]["embeds"]] == \
+        [f"message {i}" for i in range(25)]
+
+
+if __name__ == "__main__":
+    test_pack_splits_at_embed_limit()
+    test_pack_splits_at_character_limit()
+    test_every_coalesced_message_gets_an_outcome()
+    print("✅ Discord packing respects limits and every message gets an outcome")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test Discord rate limit handling with synthetic X-RateLimit-* headers.
+
+Responses are stand-ins carrying only a status code, headers and body, and
+reset times are kept to fractions of a second. No webhook is contacted.
+"""
+import os
+import sys
+import json
+import time
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_notifier import notifier
+from discord_notifier.rate_limits import DiscordRateLimiter
+
+WEBHOOK_A = "https://discord.com/api/webhooks/1/a"
+WEBHOOK_B = "https://discord.com/api/webhooks/2/b"
+RESET = 0.2
+
+
+class Response:
+    """Stands in for a requests.Response from a Discord webhook."""
+
+    def __init__(self, status_code=204, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = json.dumps(body) if body is not None else ""
+
+
+def _bucket_headers(remaining, limit=2, bucket="bucket-a", reset_after=RESET):
+    return {
+        "X-RateLimit-Bucket": bucket,
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset-After": str(reset_after)
+    }
+
+
+def _timed_acquire(limiter, webhook_url, max_wait=5):
+    start = time.monotonic()
+    acquired = limiter.acquire(webhook_url, max_wait)
+    return acquired, time.monotonic() - start
+
+
+def test_reset_after_paces_sends():
+    """Once a bucket's remaining count is used up, the next send waits for Reset-After."""
+    limiter = DiscordRateLimiter()
+    assert limiter.acquire(WEBHOOK_A, 5)
+    assert limiter.update(WEBHOOK_A, Response(headers=_bucket_headers(remaining=1))) is None
+
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_A)
+    assert acquired and waited < RESET / 2
+    assert limiter.update(WEBHOOK_A, Response(headers=_bucket_headers(remaining=0))) is None
+
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_A)
+    assert acquired and waited >= RESET * 0.9
+
+
+def test_buckets_are_tracked_per_webhook():
+    """An exhausted bucket on one webhook does not hold back another webhook."""
+    limiter = DiscordRateLimiter()
+    for webhook_url, bucket in ((WEBHOOK_A, "bucket-a"), (WEBHOOK_B, "bucket-b")):
+        assert limiter.acquire(webhook_url, 5)
+        limiter.update(webhook_url, Response(headers=_bucket_headers(remaining=0, bucket=bucket, reset_after=30)))
+
+    limits = limiter.snapshot()
+    assert limits[WEBHOOK_A]["bucket"] == "bucket-a" and limits[WEBHOOK_B]["bucket"] == "bucket-b"
+    assert limits[WEBHOOK_A]["remaining"] == 0
+
+    # A webhook never seen before is not paced at all
+    acquired, waited = _timed_acquire(limiter, "https://discord.com/api/webhooks/3/c")
+    assert acquired and waited < RESET / 2
+    assert not limiter.acquire(WEBHOOK_A, max_wait=0.05)
+
+
+def test_bucket_429_waits_retry_after_for_that_webhook():
+    """A bucket-scoped 429 returns retry_after and only delays the webhook that hit it."""
+    limiter = DiscordRateLimiter()
+    assert limiter.acquire(WEBHOOK_A, 5)
+    response = Response(429, {"X-RateLimit-Scope": "user"}, {"retry_after": RESET, "global": False})
+    assert limiter.update(WEBHOOK_A, response) == RESET
+
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_B)
+    assert acquired and waited < RESET / 2
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_A)
+    assert acquired and waited >= RESET * 0.9
+
+
+def test_global_429_delays_every_webhook():
+    """A global 429 holds back every webhook, not just the one that hit it."""
+    limiter = DiscordRateLimiter()
+    assert limiter.acquire(WEBHOOK_A, 5)
+    response = Response(429, {"X-RateLimit-Global": "true", "Retry-After": str(RESET)})
+    # Without a JSON body, retry_after comes from the Retry-After header
+    assert limiter.update(WEBHOOK_A, response) == RESET
+
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_B)
+    assert acquired and waited >= RESET * 0.9
+
+
+def test_wait_beyond_max_wait_gives_up():
+    """A wait longer than max_wait returns False at once instead of sleeping it out."""
+    limiter = DiscordRateLimiter()
+    assert limiter.acquire(WEBHOOK_A, 5)
+    limiter.update(WEBHOOK_A, Response(429, {}, {"retry_after": 30, "global": False}))
+
+    acquired, waited = _timed_acquire(limiter, WEBHOOK_A, max_wait=1)
+    assert not acquired and waited < 1
+
+
+def test_deliver_drops_message_past_max_rate_limit_wait():
+    """_deliver does not post when the wait exceeds DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT."""
+    limiter = DiscordRateLimiter()
+    posted = []
+
+    class Transport:
+        def post_json(self, url, payload):
+            posted.append(payload)
+            return Response(429, {}, {"retry_after": 30, "global": False})
+
+    saved = notifier.get_rate_limiter, notifier.get_transport, os.environ.get("DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT")
+    notifier.get_rate_limiter, notifier.get_transport = lambda: limiter, Transport
+    os.environ["DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT"] = "1"
+    try:
+        job = {"webhook_url": WEBHOOK_A, "payload": notifier._build_payload("hello", "Alert", "Bot")}
+        assert notifier._deliver(job) is False
+        # The 429 is posted once; the 30 second retry is never attempted
+        assert len(posted) == 1
+    finally:
+        notifier.get_rate_limiter, notifier.get_transport = saved[:2]
+        if saved[2] is None:
+            os.environ.pop("DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT", None)
+        else:
+            os.environ["DISCORD_NOTIFIER_MAX_RATE_LIMIT_WAIT"] = saved[2]
+
+
+if __name__ == "__main__":
+    test_reset_after_paces_sends()
+    test_buckets_are_tracked_per_webhook()
+    test_bucket_429_waits_retry_after_for_that_webhook()
+    test_global_429_delays_every_webhook()
+    test_wait_beyond_max_wait_gives_up()
+    test_deliver_drops_message_past_max_rate_limit_wait()
+    print("✅ Discord rate limit headers pace sends per webhook and globally")
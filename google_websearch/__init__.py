@@ -12,6 +12,7 @@ _module_info = {
         "google-genai>=0.3.0",
         "tenacity>=8.0.0",
         "requests>=2.25.0",
+        "httpx>=0.24.0",
         "aiohttp>=3.8.0"
     ],
     "environment_variables": {
@@ -39,6 +40,66 @@ _module_info = {
             "description": "Request timeout in seconds",
             "default": "10",
             "required": False
+        },
+        "GOOGLE_WEBSEARCH_TITLE_MAX_BYTES": {
+            "description": "Maximum bytes of each reference page read while looking for its title",
+            "default": "65536",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_RESOLVE_DEADLINE": {
+            "description": "Overall seconds allowed for resolving reference URLs and titles",
+            "default": "15",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_RESOLVE_WORKERS": {
+            "description": "Maximum reference URLs resolved concurrently",
+            "default": "8",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_CACHE_TTL": {
+            "description": "Seconds a cached search result stays fresh (0 disables the cache)",
+            "default": "0",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_CACHE_STALE_TTL": {
+            "description": "Extra seconds a stale result is served while it is refreshed in the background",
+            "default": "0",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_CACHE_PATH": {
+            "description": "Path to the on-disk search result cache",
+            "default": ".google_websearch_cache.db",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_REQUESTS_PER_MINUTE": {
+            "description": "Client-side Gemini request quota shared by all callers in the process (0 disables; 15 matches the free tier)",
+            "default": "0",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_THROTTLE_TIMEOUT": {
+            "description": "Maximum seconds to wait for rate limiter capacity before failing",
+            "default": "30",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_MAX_ATTEMPTS": {
+            "description": "Maximum attempts for retryable Gemini errors",
+            "default": "3",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_MAX_RETRY_WAIT": {
+            "description": "Give up instead of retrying when Retry-After exceeds this many seconds",
+            "default": "30",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_CIRCUIT_FAILURES": {
+            "description": "Consecutive upstream failures before the circuit breaker opens",
+            "default": "5",
+            "required": False
+        },
+        "GOOGLE_WEBSEARCH_CIRCUIT_RESET": {
+            "description": "Seconds the circuit stays open before a probe request is allowed",
+            "default": "30",
+            "required": False
         }
     }
 }
@@ -48,7 +109,7 @@ _module_info = {
 # =============================================================================
 # START OF EXPORTS
 # =============================================================================
-from .search_web import search_web
+from .search_web import search_web, search_web_stream
 _module_exports = {
     "tools": [search_web]
 }
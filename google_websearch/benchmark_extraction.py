@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for grounding metadata extraction.
+
+Compares the previous double JSON round trip (model_dump_json -> json.loads,
+once in search_web and again in extract_references) against the single-pass
+extract_grounding stage, using the synthetic grounded responses in fixtures/.
+Reference URL resolution is not performed so only extraction is measured.
+"""
+import os
+import sys
+import json
+import timeit
+import importlib
+from pathlib import Path
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.genai import types
+
+# The package re-exports the search_web function under the module's name
+search_module = importlib.import_module("google_websearch.search_web")
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(path: Path) -> types.GenerateContentResponse:
+    """Load a synthetic response fixture into a typed response object."""
+    with open(path) as f:
+        return types.GenerateContentResponse.model_validate(json.load(f))
+
+
+def legacy_extraction(response, max_references: int = 10):
+    """The previous pipeline: two full serialize/parse cycles of the response."""
+    raw_response = json.loads(response.model_dump_json())
+    grounding_metadata = raw_response["candidates"][0].get("grounding_metadata", {})
+    search_queries = grounding_metadata.get("web_search_queries", [])
+
+    raw_response = json.loads(response.model_dump_json())
+    grounding_metadata = raw_response["candidates"][0]["grounding_metadata"]
+    references = []
+    for support in grounding_metadata.get("grounding_supports", []):
+        if len(references) >= max_references:
+            break
+        for chunk_idx in support.get("grounding_chunk_indices", []):
+            chunk = grounding_metadata["grounding_chunks"][chunk_idx]
+            references.append({
+                "content": support["segment"]["text"],
+                "url": chunk["web"]["uri"],
+                "title": chunk["web"].get("title", "")
+            })
+            if len(references) >= max_references:
+                break
+    return search_queries, references
+
+
+def single_pass_extraction(response, max_references: int = 10):
+    """The current pipeline: one typed walk feeding reference extraction."""
+    grounding = search_module.extract_grounding(response)
+    references = [
+        search_module._build_reference(candidate, None, None)
+        for candidate in search_module._reference_candidates(grounding, max_references)
+    ]
+    return grounding["web_search_queries"], references
+
+
+def run_benchmark(number: int = 200, repeat: int = 5) -> None:
+    for path in sorted(FIXTURES_DIR.glob("grounded_response_*.json")):
+        response = load_fixture(path)
+        size_kb = path.stat().st_size / 1024
+
+        legacy = legacy_extraction(response)
+        current = single_pass_extraction(response)
+        assert legacy[0] == current[0], "search queries differ"
+        assert [r["url"] for r in legacy[1]] == [r["url"] for r in current[1]], "references differ"
+
+        results = {}
+        for name, func in (("legacy", legacy_extraction), ("single-pass", single_pass_extraction)):
+            timings = timeit.repeat(lambda: func(response), number=number, repeat=repeat)
+            results[name] = min(timings) / number * 1e6
+
+        print(f"{path.name} ({size_kb:.1f} KB)")
+        for name, usec in results.items():
+            print(f"  {name:<12} {usec:10.1f} us/response")
+        print(f"  speedup      {results['legacy'] / results['single-pass']:10.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
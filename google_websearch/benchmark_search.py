@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and load-test harness for the Google Web Search plugin.
+
+Replaces the Gemini client with a fake that replays the synthetic grounded
+responses in fixtures/, and points every grounding URI at a local stub HTTP
+server that simulates redirect chains, slow hosts and Cloudflare challenge
+pages. No API key or internet access is needed.
+
+Example:
+    python google_websearch/benchmark_search.py --searches 200 --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmark the pipeline, not the client-side quota or the cache
+os.environ.setdefault("GOOGLE_WEBSEARCH_API_KEY", "offline-benchmark")
+os.environ.setdefault("GOOGLE_WEBSEARCH_REQUESTS_PER_MINUTE", "1000000")
+os.environ["GOOGLE_WEBSEARCH_CACHE_TTL"] = "0"
+
+from google.genai import types
+
+# The package re-exports the search_web function under the module's name
+search_module = importlib.import_module("google_websearch.search_web")
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Stub server scenarios a grounding URI can be assigned to
+SCENARIOS = ("redirect", "slow", "cloudflare")
+
+
+# =============================================================================
+# STUB PUBLISHER SERVER
+# =============================================================================
+
+class StubPublisherServer:
+    """Local HTTP server standing in for the publishers behind grounding URIs."""
+
+    def __init__(self, slow_delay: float = 2.0, page_padding: int = 4096):
+        self.slow_delay = slow_delay
+        self.page_padding = page_padding
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StubPublisherServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] += 1
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_html(self, status: int, title: str) -> None:
+                body = (
+                    f"<html><head><meta charset=\"utf-8\"><title>{title}</title></head>"
+                    f"<body>{'x' * stub.page_padding}</body></html>"
+                ).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_HEAD(self):
+                stub.count("head")
+                self.send_response(405)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                kind = parts[0]
+                stub.count(kind)
+
+                if kind == "redirect":
+                    # /redirect/<hops>/<id>
+                    hops, page_id = int(parts[1]), parts[2]
+                    location = f"/redirect/{hops - 1}/{page_id}" if hops > 1 else f"/page/{page_id}"
+                    self.send_response(302)
+                    self.send_header("Location", location)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif kind == "page":
+                    self._send_html(200, f"Stub Page {parts[1]}")
+                elif kind == "slow":
+                    time.sleep(stub.slow_delay)
+                    self._send_html(200, f"Slow Page {parts[1]}")
+                elif kind == "cloudflare":
+                    self._send_html(503, "Just a moment...")
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+
+        return Handler
+
+
+# =============================================================================
+# FAKE GEMINI CLIENT
+# =============================================================================
+
+class FakeGenaiClient:
+    """Replays fixture grounded responses with grounding URIs pointed at the stub server."""
+
+    def __init__(self, responses: List[types.GenerateContentResponse], latency: float = 0.0):
+        self.responses = responses
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        with self._lock:
+            response = self.responses[self.calls % len(self.responses)]
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return response
+
+
+def load_responses(base_url: str, rng: random.Random, redirect_hops: int,
+                   slow_fraction: float, cloudflare_fraction: float) -> List[types.GenerateContentResponse]:
+    """Load fixtures and rewrite every grounding URI to a stub server scenario."""
+    responses = []
+    for path in sorted(FIXTURES_DIR.glob("grounded_response_*.json")):
+        with open(path) as f:
+            response = types.GenerateContentResponse.model_validate(json.load(f))
+        for index, chunk in enumerate(response.candidates[0].grounding_metadata.grounding_chunks or []):
+            if not chunk.web:
+                continue
+            page_id = f"{path.stem}-{index}"
+            roll = rng.random()
+            if roll < slow_fraction:
+                chunk.web.uri = f"{base_url}/slow/{page_id}"
+            elif roll < slow_fraction + cloudflare_fraction:
+                chunk.web.uri = f"{base_url}/cloudflare/{page_id}"
+            else:
+                chunk.web.uri = f"{base_url}/redirect/{redirect_hops}/{page_id}"
+        responses.append(response)
+    return responses
+
+
+def scenario_of(url: str) -> str:
+    """Stub scenario a reference or request URL belongs to; redirect chains end on /page/."""
+    kind = urlparse(url).path.strip("/").split("/")[0]
+    return "redirect" if kind == "page" else kind
+
+
+# =============================================================================
+# LOAD TEST
+# =============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_load_test(searches: int, concurrency: int, gemini_latency: float, slow_delay: float,
+                  slow_fraction: float, cloudflare_fraction: float, redirect_hops: int,
+                  seed: int = 1) -> Dict[str, Any]:
+    """Run `searches` end-to-end search_web calls across `concurrency` workers and collect stats."""
+    server = StubPublisherServer(slow_delay=slow_delay).start()
+    try:
+        rng = random.Random(seed)
+        client = FakeGenaiClient(
+            load_responses(server.base_url, rng, redirect_hops, slow_fraction, cloudflare_fraction),
+            latency=gemini_latency
+        )
+        search_module._get_client = lambda api_key: client
+
+        latencies: List[float] = []
+        statuses = Counter()
+        references = {scenario: Counter() for scenario in SCENARIOS}
+        lock = threading.Lock()
+
+        def one_search(i: int) -> None:
+            start = time.perf_counter()
+            result = search_module.search_web(f"benchmark query {i}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[result["status"]] += 1
+                for reference in result.get("data", {}).get("references", []):
+                    outcome = "resolved" if reference.get("resolved") else "unresolved"
+                    references.setdefault(scenario_of(reference["url"]), Counter())[outcome] += 1
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one_search, range(searches)))
+        wall = time.perf_counter() - wall_start
+
+        scenarios = {}
+        for scenario, counts in references.items():
+            scenarios[scenario] = {
+                "references": sum(counts.values()),
+                "resolved": counts["resolved"],
+                "unresolved": counts["unresolved"],
+                "http_requests": sum(count for kind, count in server.requests.items()
+                                     if scenario_of(f"/{kind}") == scenario)
+            }
+
+        return {
+            "searches": searches,
+            "concurrency": concurrency,
+            "wall_seconds": wall,
+            "searches_per_second": searches / wall if wall else 0.0,
+            "latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p90": percentile(latencies, 90) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": max(latencies) * 1000 if latencies else 0.0
+            },
+            "statuses": dict(statuses),
+            "scenarios": scenarios,
+            # Only normal pages: a Cloudflare page "resolves" to a challenge and slow pages are a separate cost
+            "references_resolved_per_second": scenarios["redirect"]["resolved"] / wall if wall else 0.0,
+            "gemini_calls": client.calls,
+            "http_requests": dict(server.requests),
+            "http_requests_total": sum(server.requests.values())
+        }
+    finally:
+        server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for google_websearch.search_web")
+    parser.add_argument("--searches", type=int, default=50, help="Total searches to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent search_web callers")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Simulated Gemini response time (s)")
+    parser.add_argument("--slow-delay", type=float, default=3.0, help="Response delay of slow hosts (s)")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="Fraction of references on slow hosts")
+    parser.add_argument("--cloudflare-fraction", type=float, default=0.05, help="Fraction of references behind Cloudflare")
+    parser.add_argument("--redirect-hops", type=int, default=2, help="Redirects before each normal page")
+    parser.add_argument("--deadline", type=float, default=None, help="Override GOOGLE_WEBSEARCH_RESOLVE_DEADLINE")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for scenario assignment")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.deadline is not None:
+        os.environ["GOOGLE_WEBSEARCH_RESOLVE_DEADLINE"] = str(args.deadline)
+
+    stats = run_load_test(
+        searches=args.searches,
+        concurrency=args.concurrency,
+        gemini_latency=args.gemini_latency,
+        slow_delay=args.slow_delay,
+        slow_fraction=args.slow_fraction,
+        cloudflare_fraction=args.cloudflare_fraction,
+        redirect_hops=args.redirect_hops,
+        seed=args.seed
+    )
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+
+    print(f"Searches: {stats['searches']} at concurrency {stats['concurrency']} "
+          f"in {stats['wall_seconds']:.2f}s ({stats['searches_per_second']:.1f}/s)")
+    latency = stats["latency_ms"]
+    print(f"Latency ms: p50 {latency['p50']:.0f}  p90 {latency['p90']:.0f}  "
+          f"p99 {latency['p99']:.0f}  max {latency['max']:.0f}")
+    print(f"Statuses: {stats['statuses']}")
+    print("Scenarios:")
+    for scenario, counts in stats["scenarios"].items():
+        print(f"  {scenario}: {counts['references']} references "
+              f"({counts['resolved']} resolved, {counts['unresolved']} unresolved), "
+              f"{counts['http_requests']} HTTP requests")
+    print(f"Normal pages resolved: {stats['references_resolved_per_second']:.1f}/s")
+    print(f"Gemini calls: {stats['gemini_calls']}")
+    print(f"HTTP requests: {stats['http_requests_total']} {stats['http_requests']}")
+
+
+if __name__ == "__main__":
+    main()
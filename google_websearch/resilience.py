@@ -0,0 +1,337 @@
+"""
+Client-side rate limiting, circuit breaking and retry policy for Gemini requests.
+One limiter and one breaker are shared by every search in the process.
+"""
+import os
+import re
+import asyncio
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from tenacity import RetryCallState
+from tenacity.stop import stop_base
+from tenacity.wait import wait_base
+from google.genai import errors as genai_errors
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class RateLimitError(Exception):
+    """Custom exception for rate limit errors."""
+    pass
+
+
+class ThrottledError(RateLimitError):
+    """Raised when the client-side rate limiter has no capacity within the wait budget."""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and requests fail fast."""
+    pass
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, float] = {
+    "requests": 0,
+    "throttled": 0,
+    "throttle_wait_seconds": 0.0,
+    "throttle_rejected": 0,
+    "retries": 0,
+    "circuit_opened": 0,
+    "circuit_rejected": 0
+}
+
+
+def record_metric(name: str, value: float = 1) -> None:
+    """Increment a resilience metric."""
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + value
+
+
+def get_metrics() -> Dict[str, float]:
+    """Return a snapshot of the resilience metrics."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+# =============================================================================
+# RATE LIMITER
+# =============================================================================
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all callers. A rate of 0 only enforces pause()."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to timeout seconds. Returns False if none became available."""
+        deadline = time.monotonic() + timeout
+        waited = False
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and (self.rate <= 0 or self._tokens >= 1):
+                    if self.rate > 0:
+                        self._tokens -= 1
+                    if waited:
+                        record_metric("throttle_wait_seconds", now - start)
+                    return True
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate if self.rate > 0 else 0.0)
+
+            if now + delay > deadline:
+                record_metric("throttle_rejected")
+                return False
+            if not waited:
+                record_metric("throttled")
+                logger.info(f"Gemini requests throttled client-side, waiting {delay:.2f}s")
+                waited = True
+            time.sleep(delay)
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, probing again after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a request may be attempted right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        record_metric("circuit_rejected")
+        return False
+
+    def release(self) -> None:
+        """Give back a half-open probe slot that was granted but not used."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Gemini circuit breaker closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    record_metric("circuit_opened")
+                    logger.warning(f"Gemini circuit breaker opened for {self.reset_timeout}s")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+_rate_limiter: Optional[TokenBucket] = None
+_circuit_breaker: Optional[CircuitBreaker] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Get the process-wide rate limiter, sized from GOOGLE_WEBSEARCH_REQUESTS_PER_MINUTE."""
+    global _rate_limiter
+    with _shared_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(float(os.getenv("GOOGLE_WEBSEARCH_REQUESTS_PER_MINUTE", "0")))
+        return _rate_limiter
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Get the process-wide circuit breaker."""
+    global _circuit_breaker
+    with _shared_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failure_threshold=int(os.getenv("GOOGLE_WEBSEARCH_CIRCUIT_FAILURES", "5")),
+                reset_timeout=float(os.getenv("GOOGLE_WEBSEARCH_CIRCUIT_RESET", "30"))
+            )
+        return _circuit_breaker
+
+
+# =============================================================================
+# RETRY POLICY
+# =============================================================================
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for errors worth retrying: rate limits, 5xx and transport failures."""
+    if isinstance(exc, (ThrottledError, CircuitOpenError)):
+        return False
+    if isinstance(exc, RateLimitError):
+        return True
+    code = _status_code(exc)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TransportError, requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout, ConnectionError, TimeoutError))
+
+
+def retry_after_seconds(exc: Optional[BaseException]) -> Optional[float]:
+    """Extract a server-provided retry delay from a Retry-After header or RetryInfo detail."""
+    while exc is not None:
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers:
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    pass
+
+        details = getattr(exc, "details", None)
+        if isinstance(details, dict):
+            for detail in details.get("error", {}).get("details", []) or []:
+                delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+                match = re.fullmatch(r"([\d.]+)s", delay or "")
+                if match:
+                    return float(match.group(1))
+
+        exc = exc.__cause__
+    return None
+
+
+class wait_retry_after(wait_base):
+    """Full-jitter exponential backoff that never waits less than the server's Retry-After."""
+
+    def __init__(self, multiplier: float = 1, max: float = 10):
+        self.multiplier = multiplier
+        self.max = max
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        retry_after = retry_after_seconds(retry_state.outcome.exception() if retry_state.outcome else None)
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 1)
+        return random.uniform(0, min(self.max, self.multiplier * 2 ** retry_state.attempt_number))
+
+
+class stop_if_retry_after_exceeds(stop_base):
+    """Give up instead of sleeping when the server asks us to wait longer than max_wait."""
+
+    def __init__(self, max_wait: float):
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        retry_after = retry_after_seconds(retry_state.outcome.exception() if retry_state.outcome else None)
+        return retry_after is not None and retry_after > self.max_wait
+
+
+def before_retry_sleep(retry_state: RetryCallState) -> None:
+    """Tenacity hook: count the retry and log why it happened."""
+    record_metric("retries")
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    logger.warning(f"Retrying Gemini request in {retry_state.next_action.sleep:.2f}s after: {exc}")
+
+
+def _admit() -> CircuitBreaker:
+    """Pass the circuit breaker and take a rate limiter token, or raise."""
+    breaker = get_circuit_breaker()
+    if not breaker.allow():
+        raise CircuitOpenError("Gemini API is temporarily unavailable (circuit open)")
+
+    if not get_rate_limiter().acquire(float(os.getenv("GOOGLE_WEBSEARCH_THROTTLE_TIMEOUT", "30"))):
+        breaker.release()
+        raise ThrottledError("Client-side rate limit reached; no request capacity available")
+
+    record_metric("requests")
+    return breaker
+
+
+def _record_failure(breaker: CircuitBreaker, exc: Exception) -> None:
+    if is_retryable(exc):
+        breaker.record_failure()
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            get_rate_limiter().pause(retry_after)
+    else:
+        # Says nothing about upstream health: neither close nor trip the circuit, just free a probe slot
+        breaker.release()
+
+
+def call_with_protection(func, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run one upstream call through the shared rate limiter and circuit breaker.
+
+    Retryable failures count against the circuit; client errors such as an
+    invalid API key do not, since the upstream itself is healthy.
+    """
+    breaker = _admit()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        _record_failure(breaker, e)
+        raise
+    breaker.record_success()
+    return result
+
+
+async def acall_with_protection(func, *args: Any, **kwargs: Any) -> Any:
+    """Async variant of call_with_protection for coroutine functions."""
+    breaker = await asyncio.to_thread(_admit)
+    try:
+        result = await func(*args, **kwargs)
+    except Exception as e:
+        _record_failure(breaker, e)
+        raise
+    breaker.record_success()
+    return result
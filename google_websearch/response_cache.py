@@ -0,0 +1,114 @@
+"""
+On-disk response cache for Google Web Search results.
+Backed by SQLite so cached answers survive process restarts.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def make_cache_key(query: str, model: str, max_references: int) -> str:
+    """Build the cache key for a query, model and reference limit."""
+    raw = json.dumps([normalize_query(query), model, max_references])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed store of search result payloads keyed by query."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "stored_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def lookup(self, key: str, ttl: float, stale_ttl: float = 0) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Look up a cached payload.
+
+        Returns the payload and FRESH if it is younger than ttl, the payload and
+        STALE if it is within the additional stale_ttl window, or (None, None).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+
+        age = time.time() - row[1]
+        if age < ttl:
+            return json.loads(row[0]), FRESH
+        if age < ttl + stale_ttl:
+            return json.loads(row[0]), STALE
+        return None, None
+
+    def store(self, key: str, data: Dict[str, Any]) -> None:
+        """Store a payload, replacing any previous entry for the key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, data, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(data), time.time())
+            )
+            self._conn.commit()
+
+    def purge(self, max_age: float) -> int:
+        """Delete entries older than max_age seconds and return how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE stored_at < ?", (time.time() - max_age,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def begin_refresh(self, key: str) -> bool:
+        """Mark a key as being refreshed. Returns False if a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str) -> None:
+        """Clear the in-flight refresh marker for a key."""
+        with self._lock:
+            self._refreshing.discard(key)
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: str) -> Optional[ResponseCache]:
+    """Get the shared cache instance for a path, creating it on first use."""
+    with _caches_lock:
+        if path not in _caches:
+            try:
+                _caches[path] = ResponseCache(path)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open response cache at {path}: {e}")
+                return None
+        return _caches[path]
@@ -4,154 +4,342 @@ Powered by Google Gemini API with grounding support
 """
 import os
 import json
+import html
 import time
+import codecs
+import threading
 import requests
 import re
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, List, Optional, Any
+from tenacity import retry, stop_after_attempt, retry_if_exception
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
 
+from .response_cache import FRESH, STALE, get_response_cache, make_cache_key
+from .resilience import (
+    RateLimitError,
+    CircuitOpenError,
+    acall_with_protection,
+    before_retry_sleep,
+    call_with_protection,
+    is_retryable,
+    stop_if_retry_after_exceeds,
+    wait_retry_after
+)
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class RateLimitError(Exception):
-    """Custom exception for rate limit errors."""
-    pass
+TITLE_END_MARKERS = (b"</title", b"</head")
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+BLOCKED_PAGE_TITLES = [
+    "Attention Required! | Cloudflare",
+    "Just a moment...",
+    "Security check",
+    "Access denied"
+]
 
 def extract_title_from_html(html_content: str) -> Optional[str]:
     """Extract title from HTML content using regex."""
     try:
         title_match = re.search(r'<title[^>]*>([^<]+)</title>', html_content, re.IGNORECASE)
-        return title_match.group(1).strip() if title_match else None
+        if not title_match:
+            return None
+        return " ".join(html.unescape(title_match.group(1)).split()) or None
     except Exception:
         return None
 
-def follow_redirect(url: str, timeout: int = 10) -> tuple[str, Optional[str]]:
-    """Follow a URL redirect and return the final URL and page title."""
+def _detect_charset(content_type: str, head: bytes) -> str:
+    """Pick the page encoding from the Content-Type header, then <meta charset>, then UTF-8."""
+    candidates = []
+    header_match = re.search(r'charset=["\']?([\w.:-]+)', content_type, re.IGNORECASE)
+    if header_match:
+        candidates.append(header_match.group(1))
+    meta_match = META_CHARSET_PATTERN.search(head)
+    if meta_match:
+        candidates.append(meta_match.group(1).decode("ascii", errors="ignore"))
+    
+    for charset in candidates:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+def follow_redirect(url: str, timeout: int = 10, max_bytes: Optional[int] = None) -> tuple[Optional[str], Optional[str]]:
+    """
+    Follow a URL redirect and return the final URL and page title.
+    
+    Uses a single streamed GET that follows redirects itself and stops reading as
+    soon as </title> or </head> is seen, or after max_bytes of decompressed body.
+    Returns (None, None) if the request fails, so the URL is not reported as resolved.
+    """
+    if max_bytes is None:
+        max_bytes = int(os.getenv("GOOGLE_WEBSEARCH_TITLE_MAX_BYTES", "65536"))
+    
     try:
-        # First try HEAD request to follow redirects
-        head_response = requests.head(url, allow_redirects=True, timeout=timeout)
-        final_url = head_response.url
-        
-        # Then get content to extract title
-        response = requests.get(final_url, stream=True, timeout=timeout)
-        content = next(response.iter_content(8192)).decode('utf-8', errors='ignore')
-        response.close()
+        with requests.get(
+            url,
+            allow_redirects=True,
+            stream=True,
+            timeout=timeout,
+            headers={"Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"}
+        ) as response:
+            final_url = response.url
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and "html" not in content_type.lower():
+                return final_url, None
+            
+            # iter_content transparently decompresses gzip/deflate bodies
+            body = bytearray()
+            for chunk in response.iter_content(4096):
+                scan_from = max(0, len(body) - len(b"</title"))
+                body.extend(chunk)
+                window = bytes(body[scan_from:]).lower()
+                if any(marker in window for marker in TITLE_END_MARKERS) or len(body) >= max_bytes:
+                    break
         
-        title = extract_title_from_html(content)
+        head = bytes(body[:max_bytes])
+        title = extract_title_from_html(head.decode(_detect_charset(content_type, head), errors="replace"))
         
         # Filter out Cloudflare and other protection pages
-        if title and any(phrase in title for phrase in [
-            "Attention Required! | Cloudflare",
-            "Just a moment...",
-            "Security check",
-            "Access denied"
-        ]):
+        if title and any(phrase in title for phrase in BLOCKED_PAGE_TITLES):
             return final_url, None
             
         return final_url, title
     except Exception as e:
         logger.debug(f"Error following redirect for {url}: {e}")
-        return url, None
+        return None, None
+
+def extract_grounding(response) -> Dict[str, Any]:
+    """
+    Read search queries, grounding chunks and supports from a Gemini response.
+    
+    Works directly on the typed response object in a single pass, without
+    serializing it to JSON and parsing it back.
+    """
+    grounding = {
+        "web_search_queries": [],
+        "grounding_chunks": [],
+        "grounding_supports": []
+    }
+    
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return grounding
+    
+    metadata = candidates[0].grounding_metadata
+    if metadata is None:
+        return grounding
+    
+    grounding["web_search_queries"] = list(metadata.web_search_queries or [])
+    grounding["grounding_chunks"] = [
+        {"uri": chunk.web.uri, "title": chunk.web.title or ""} if chunk.web and chunk.web.uri else None
+        for chunk in metadata.grounding_chunks or []
+    ]
+    grounding["grounding_supports"] = [
+        {
+            "text": support.segment.text if support.segment and support.segment.text else "",
+            "chunk_indices": list(support.grounding_chunk_indices or []),
+            "confidence_scores": list(support.confidence_scores or [])
+        }
+        for support in metadata.grounding_supports or []
+    ]
+    return grounding
 
-def extract_references(response, max_references: int = 10) -> List[Dict]:
-    """Extract detailed references from Gemini response."""
+def _reference_candidates(grounding: Dict[str, Any], max_references: int) -> List[Dict[str, Any]]:
+    """Pair grounding supports with their web chunks, up to max_references."""
+    chunks = grounding["grounding_chunks"]
+    candidates = []
+    
+    for support in grounding["grounding_supports"]:
+        for chunk_idx in support["chunk_indices"]:
+            if chunk_idx >= len(chunks) or chunks[chunk_idx] is None:
+                continue
+            candidates.append({"support": support, "chunk": chunks[chunk_idx]})
+            if len(candidates) >= max_references:
+                return candidates
+    
+    return candidates
+
+def _build_reference(candidate: Dict[str, Any], final_url: Optional[str], title: Optional[str]) -> Dict[str, Any]:
+    """Build a reference dict, falling back to the grounding URI and chunk title when unresolved."""
+    support = candidate["support"]
+    chunk = candidate["chunk"]
+    reference = {
+        "content": support["text"],
+        "url": final_url or chunk["uri"],
+        "title": title or chunk["title"],
+        "resolved": final_url is not None
+    }
+    
+    # Add confidence if available
+    if support["confidence_scores"]:
+        reference["confidence"] = support["confidence_scores"][0]
+    
+    return reference
+
+def extract_references(grounding: Dict[str, Any], max_references: int = 10, deadline: Optional[float] = None) -> List[Dict]:
+    """
+    Extract detailed references from grounding data produced by extract_grounding.
+    
+    Grounding URIs are resolved concurrently. Once `deadline` seconds have passed
+    the references resolved so far are kept and the rest fall back to the
+    grounding URI and chunk title with "resolved": False.
+    """
     try:
-        # Convert response to raw format to access grounding metadata
-        raw_response = json.loads(response.model_dump_json())
-        
-        if "candidates" not in raw_response or not raw_response["candidates"]:
-            return []
-            
-        candidate = raw_response["candidates"][0]
-        if "grounding_metadata" not in candidate:
+        candidates = _reference_candidates(grounding, max_references)
+        if not candidates:
             return []
-            
-        grounding_metadata = candidate["grounding_metadata"]
-        references = []
         
-        for support in grounding_metadata.get("grounding_supports", []):
-            if len(references) >= max_references:
-                break
-                
-            for chunk_idx in support.get("grounding_chunk_indices", []):
-                if chunk_idx >= len(grounding_metadata.get("grounding_chunks", [])):
-                    continue
-                    
-                chunk = grounding_metadata["grounding_chunks"][chunk_idx]
-                if "web" in chunk:
-                    # Follow URL and get actual title
-                    url = chunk["web"]["uri"]
-                    final_url, actual_title = follow_redirect(
-                        url, 
-                        timeout=int(os.getenv("GOOGLE_WEBSEARCH_TIMEOUT", "10"))
-                    )
-                    
-                    reference = {
-                        "content": support["segment"]["text"],
-                        "url": final_url,
-                        "title": actual_title or chunk["web"].get("title", "")
-                    }
-                    
-                    # Add confidence if available
-                    if support.get("confidence_scores"):
-                        reference["confidence"] = support["confidence_scores"][0]
-                    
-                    references.append(reference)
-                    
-                    if len(references) >= max_references:
-                        break
+        if deadline is None:
+            deadline = float(os.getenv("GOOGLE_WEBSEARCH_RESOLVE_DEADLINE", "15"))
+        timeout = int(os.getenv("GOOGLE_WEBSEARCH_TIMEOUT", "10"))
+        workers = int(os.getenv("GOOGLE_WEBSEARCH_RESOLVE_WORKERS", "8"))
+        
+        # Follow each unique URL once and get its actual title
+        uris = list(dict.fromkeys(candidate["chunk"]["uri"] for candidate in candidates))
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(uris))))
+        try:
+            futures = {uri: executor.submit(follow_redirect, uri, timeout) for uri in uris}
+            done, not_done = wait(futures.values(), timeout=deadline)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if not_done:
+            logger.info(f"Reference resolution deadline of {deadline}s reached, {len(not_done)} of {len(uris)} URLs unresolved")
+        
+        references = []
+        for candidate in candidates:
+            future = futures[candidate["chunk"]["uri"]]
+            final_url, actual_title = future.result() if future in done else (None, None)
+            references.append(_build_reference(candidate, final_url, actual_title))
         
         return references
     except Exception as e:
         logger.error(f"Error extracting references: {e}")
         return []
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((RateLimitError, Exception)),
+_gemini_retry = retry(
+    stop=(stop_after_attempt(int(os.getenv("GOOGLE_WEBSEARCH_MAX_ATTEMPTS", "3"))) |
+          stop_if_retry_after_exceeds(float(os.getenv("GOOGLE_WEBSEARCH_MAX_RETRY_WAIT", "30")))),
+    wait=wait_retry_after(multiplier=1, max=10),
+    retry=retry_if_exception(is_retryable),
+    before_sleep=before_retry_sleep,
     reraise=True
 )
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def _get_client(api_key: str):
+    """Get a Gemini client for the API key, reusing it across searches."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = genai.Client(api_key=api_key)
+        return _clients[api_key]
+
+def _search_config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())]
+    )
+
+def _translate_gemini_error(e: Exception) -> Exception:
+    """Map rate limit errors to RateLimitError and log the failure."""
+    if isinstance(e, (RateLimitError, CircuitOpenError)):
+        return e
+    if isinstance(e, genai_errors.APIError):
+        # Trust the status: a 400/403 about a disabled billing or project quota is not a rate limit
+        rate_limited = e.code == 429 or e.status == "RESOURCE_EXHAUSTED"
+    else:
+        error_str = str(e).lower()
+        rate_limited = "rate limit" in error_str or "quota" in error_str or "429" in error_str
+    if rate_limited:
+        logger.warning(f"Rate limit hit: {e}")
+        error = RateLimitError(f"Rate limit exceeded: {e}")
+        error.__cause__ = e
+        return error
+    logger.error(f"Gemini API error: {e}")
+    return e
+
+@_gemini_retry
 def _make_gemini_request(client, model: str, query: str) -> Any:
-    """Make a request to Gemini API with retry logic."""
+    """Make a rate-limited, circuit-protected request to Gemini API with retry logic."""
     try:
-        response = client.models.generate_content(
+        return call_with_protection(
+            client.models.generate_content,
             model=model,
             contents=f"{query}",
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())]
-            )
+            config=_search_config()
         )
-        return response
     except Exception as e:
-        error_str = str(e).lower()
-        if "rate limit" in error_str or "quota" in error_str or "429" in error_str:
-            logger.warning(f"Rate limit hit, will retry: {e}")
-            raise RateLimitError(f"Rate limit exceeded: {e}")
-        else:
-            logger.error(f"Gemini API error: {e}")
-            raise
+        raise _translate_gemini_error(e)
 
-def search_web(search_term: str) -> Dict[str, Any]:
-    """
-    Perform a web search using Google Gemini API with grounding.
+async def _open_stream(client, model: str, query: str):
+    stream = await client.aio.models.generate_content_stream(
+        model=model,
+        contents=f"{query}",
+        config=_search_config()
+    )
+    # The request is only sent once the first chunk is awaited
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+    return first_chunk, stream
+
+@_gemini_retry
+async def _start_gemini_stream(client, model: str, query: str):
+    """Open a streaming Gemini request with the same protection and retries as _make_gemini_request."""
+    try:
+        return await acall_with_protection(_open_stream, client, model, query)
+    except Exception as e:
+        raise _translate_gemini_error(e)
+
+def _run_search(api_key: str, model: str, search_term: str, max_references: int) -> Dict[str, Any]:
+    """Run a grounded Gemini search and return the result payload."""
+    client = _get_client(api_key)
     
-    Args:
-        search_term: The search query to process
-        
-    Returns:
-        Dictionary containing search results and metadata
-    """
+    # Make the request with retry logic
+    response = _make_gemini_request(client, model, search_term)
+    
+    # Extract grounding metadata once, straight from the typed response
+    grounding = extract_grounding(response)
+    
+    # Extract references with detailed information
+    references = extract_references(grounding, max_references=max_references)
+    
+    return {
+        "query": search_term,
+        "search_queries": grounding["web_search_queries"],
+        "response": response.text,
+        "references": references,
+        "reference_count": len(references)
+    }
+
+def _refresh_cached_search(cache, key: str, api_key: str, model: str, search_term: str, max_references: int) -> None:
+    """Re-run a search in the background and replace its cache entry."""
+    try:
+        _store_result(cache, key, _run_search(api_key, model, search_term, max_references))
+        logger.debug(f"Refreshed cached search for: {search_term}")
+    except Exception as e:
+        logger.warning(f"Background refresh failed for '{search_term}': {e}")
+    finally:
+        cache.end_refresh(key)
+
+def _preflight() -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Check that search is enabled and configured. Returns (error_result, api_key)."""
     # Check if the tool is enabled
     if os.getenv("GOOGLE_WEBSEARCH_ENABLED", "true").lower() == "false":
         logger.info("Google web search is disabled")
         return {
             "status": "disabled",
             "message": "Google web search functionality is disabled"
-        }
+        }, None
     
     # Check for API key
     api_key = os.getenv("GOOGLE_WEBSEARCH_API_KEY")
@@ -160,62 +348,219 @@ def search_web(search_term: str) -> Dict[str, Any]:
         return {
             "status": "error",
             "error": "Google Gemini API key not provided. Please set GOOGLE_WEBSEARCH_API_KEY environment variable."
+        }, None
+    
+    return None, api_key
+
+def _cached_result(api_key: str, model: str, search_term: str, max_references: int) -> tuple[Any, Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Look the search up in the response cache when it is enabled.
+    
+    Returns (cache, cache_key, cached_data). A stale hit schedules a background
+    refresh; cache is None when caching is disabled.
+    """
+    cache_ttl = float(os.getenv("GOOGLE_WEBSEARCH_CACHE_TTL", "0"))
+    cache_stale_ttl = float(os.getenv("GOOGLE_WEBSEARCH_CACHE_STALE_TTL", "0"))
+    if cache_ttl <= 0:
+        return None, None, None
+    
+    cache = get_response_cache(os.getenv("GOOGLE_WEBSEARCH_CACHE_PATH", ".google_websearch_cache.db"))
+    if cache is None:
+        return None, None, None
+    
+    cache_key = make_cache_key(search_term, model, max_references)
+    try:
+        cached, state = cache.lookup(cache_key, cache_ttl, cache_stale_ttl)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed: {e}")
+        return cache, cache_key, None
+    
+    if state == STALE and cache.begin_refresh(cache_key):
+        threading.Thread(
+            target=_refresh_cached_search,
+            args=(cache, cache_key, api_key, model, search_term, max_references),
+            daemon=True
+        ).start()
+    
+    if state in (FRESH, STALE):
+        logger.debug(f"Serving {state} cached result for: {search_term}")
+        cached["query"] = search_term
+        return cache, cache_key, cached
+    return cache, cache_key, None
+
+def _store_result(cache, cache_key: Optional[str], data: Dict[str, Any]) -> None:
+    if cache is None:
+        return
+    # Unresolved references (deadline missed or fetch failed) would be served for the whole TTL
+    if any(not reference["resolved"] for reference in data["references"]):
+        logger.debug(f"Not caching result with unresolved references for: {data['query']}")
+        return
+    try:
+        cache.store(cache_key, data)
+    except Exception as e:
+        logger.warning(f"Response cache store failed: {e}")
+
+def _error_result(e: Exception) -> Dict[str, Any]:
+    """Build the error result for a failed search."""
+    if isinstance(e, CircuitOpenError):
+        logger.error(f"Web search skipped: {e}")
+        return {
+            "status": "error",
+            "error": f"{str(e)}. Please try again shortly."
+        }
+    if isinstance(e, RateLimitError):
+        logger.error(f"Rate limit exceeded after retries: {e}")
+        return {
+            "status": "error",
+            "error": f"Rate limit exceeded: {str(e)}. Please wait before making more requests."
         }
+    logger.error(f"Web search failed: {str(e)}")
+    return {
+        "status": "error",
+        "error": f"Web search failed: {str(e)}"
+    }
+
+def search_web(search_term: str) -> Dict[str, Any]:
+    """
+    Perform a web search using Google Gemini API with grounding.
+    
+    Args:
+        search_term: The search query to process
+        
+    Returns:
+        Dictionary containing search results and metadata
+    """
+    error_result, api_key = _preflight()
+    if error_result:
+        return error_result
     
     # Get configuration from environment variables
     model = os.getenv("GOOGLE_WEBSEARCH_MODEL", "gemini-2.0-flash")
     max_references = int(os.getenv("GOOGLE_WEBSEARCH_MAX_REFERENCES", "10"))
     
+    # Serve from the response cache when enabled
+    cache, cache_key, cached = _cached_result(api_key, model, search_term, max_references)
+    if cached is not None:
+        return {
+            "status": "success",
+            "cached": True,
+            "data": cached
+        }
+    
     try:
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
-        
-        # Make the request with retry logic
-        response = _make_gemini_request(client, model, search_term)
-        
-        # Extract metadata from response
-        raw_response = json.loads(response.model_dump_json())
-        
-        # Get grounding metadata if available
-        grounding_metadata = {}
-        if ("candidates" in raw_response and 
-            raw_response["candidates"] and 
-            "grounding_metadata" in raw_response["candidates"][0]):
-            grounding_metadata = raw_response["candidates"][0]["grounding_metadata"]
-        
-        # Extract references with detailed information
-        references = extract_references(response, max_references=max_references)
-        
-        # Get search queries used
-        search_queries = grounding_metadata.get("web_search_queries", [])
+        data = _run_search(api_key, model, search_term, max_references)
+        _store_result(cache, cache_key, data)
         
         # Return structured response
         return {
             "status": "success",
-            "data": {
-                "query": search_term,
-                "search_queries": search_queries,
-                "response": response.text,
-                "references": references,
-                "reference_count": len(references)
-            }
+            "data": data
         }
+    except Exception as e:
+        return _error_result(e)
+
+async def _resolve_references_stream(candidates: List[Dict[str, Any]]) -> AsyncIterator[tuple[int, Dict[str, Any]]]:
+    """Resolve reference URLs concurrently, yielding (index, reference) as each one completes."""
+    deadline = float(os.getenv("GOOGLE_WEBSEARCH_RESOLVE_DEADLINE", "15"))
+    timeout = int(os.getenv("GOOGLE_WEBSEARCH_TIMEOUT", "10"))
+    semaphore = asyncio.Semaphore(int(os.getenv("GOOGLE_WEBSEARCH_RESOLVE_WORKERS", "8")))
+    
+    async def resolve(uri: str) -> tuple[str, tuple[str, Optional[str]]]:
+        async with semaphore:
+            return uri, await asyncio.to_thread(follow_redirect, uri, timeout)
+    
+    indexes_by_uri: Dict[str, List[int]] = {}
+    for index, candidate in enumerate(candidates):
+        indexes_by_uri.setdefault(candidate["chunk"]["uri"], []).append(index)
+    
+    tasks = [asyncio.create_task(resolve(uri)) for uri in indexes_by_uri]
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    end_time = loop.time() + deadline
+    try:
+        while pending:
+            remaining = end_time - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                uri, (final_url, title) = task.result()
+                for index in indexes_by_uri.pop(uri):
+                    yield index, _build_reference(candidates[index], final_url, title)
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    if indexes_by_uri:
+        logger.info(f"Reference resolution deadline of {deadline}s reached, {len(indexes_by_uri)} URLs unresolved")
+    for indexes in indexes_by_uri.values():
+        for index in indexes:
+            yield index, _build_reference(candidates[index], None, None)
+
+async def search_web_stream(search_term: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a web search using Google Gemini API with grounding.
+    
+    Yields events as they become available:
+        {"type": "text", "text": ...} for each chunk of the answer,
+        {"type": "reference", "index": ..., "reference": {...}} as each reference resolves,
+        then a final {"type": "summary", ...} carrying the same result as search_web.
+    Failures are reported as a final {"type": "summary", "status": "error", ...}.
+    """
+    error_result, api_key = _preflight()
+    if error_result:
+        yield {"type": "summary", **error_result}
+        return
+    
+    model = os.getenv("GOOGLE_WEBSEARCH_MODEL", "gemini-2.0-flash")
+    max_references = int(os.getenv("GOOGLE_WEBSEARCH_MAX_REFERENCES", "10"))
+    
+    cache, cache_key, cached = await asyncio.to_thread(_cached_result, api_key, model, search_term, max_references)
+    if cached is not None:
+        yield {"type": "text", "text": cached["response"]}
+        for index, reference in enumerate(cached["references"]):
+            yield {"type": "reference", "index": index, "reference": reference}
+        yield {"type": "summary", "status": "success", "cached": True, "data": cached}
+        return
+    
+    try:
+        first_chunk, stream = await _start_gemini_stream(_get_client(api_key), model, search_term)
         
-    except RateLimitError as e:
-        logger.error(f"Rate limit exceeded after retries: {e}")
-        return {
-            "status": "error",
-            "error": f"Rate limit exceeded: {str(e)}. Please wait before making more requests."
+        text_parts = []
+        grounding = extract_grounding(None)
+        chunk = first_chunk
+        while chunk is not None:
+            if chunk.text:
+                text_parts.append(chunk.text)
+                yield {"type": "text", "text": chunk.text}
+            
+            # Grounding metadata normally arrives with the final chunk
+            chunk_grounding = extract_grounding(chunk)
+            if chunk_grounding["grounding_chunks"] or chunk_grounding["web_search_queries"]:
+                grounding = chunk_grounding
+            
+            chunk = await anext(stream, None)
+        
+        candidates = _reference_candidates(grounding, max_references)
+        references: List[Optional[Dict[str, Any]]] = [None] * len(candidates)
+        async for index, reference in _resolve_references_stream(candidates):
+            references[index] = reference
+            yield {"type": "reference", "index": index, "reference": reference}
+        
+        data = {
+            "query": search_term,
+            "search_queries": grounding["web_search_queries"],
+            "response": "".join(text_parts),
+            "references": references,
+            "reference_count": len(references)
         }
+        await asyncio.to_thread(_store_result, cache, cache_key, data)
+        yield {"type": "summary", "status": "success", "data": data}
     except Exception as e:
-        logger.error(f"Web search failed: {str(e)}")
-        return {
-            "status": "error",
-            "error": f"Web search failed: {str(e)}"
-        }
+        yield {"type": "summary", **_error_result(e)}
 
 if __name__ == "__main__":
-    # Test the function
+    # Run from the plugins directory as a module: python -m google_websearch.search_web
     from dotenv import load_dotenv
     load_dotenv()
     
@@ -7,10 +7,10 @@ import sys
 import json
 from dotenv import load_dotenv
 
-# Add the plugin directory to the path
-sys.path.insert(0, os.path.dirname(__file__))
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from search_web import search_web
+from google_websearch.search_web import search_web
 
 def test_search():
     """Test the web search functionality."""
@@ -1,30 +1,30 @@
 import requests
 import os
 import logging
+import threading
 
+try:
+    from webhook_transport import get_transport
+    from webhook_transport.delivery import create_delivery_queue
+    from webhook_transport.throttle import SUPPRESSED, create_throttle
+    from webhook_transport.fanout import fan_out, load_destinations, route_destinations
+except ImportError as e:
+    # A sibling plugin, not a pip package: the plugins directory itself must be importable
+    raise ImportError(
+        "slack_notifier requires the webhook_transport plugin from this repository, installed next to "
+        "slack_notifier with their parent (plugins) directory on sys.path"
+    ) from e
 
-def send_slack_notification(message, title=""):
-    """
-    Send a notification to Slack via webhook.
-    
-    Args:
-        message (str): The main message content
-        title (str, optional): Title for the message. Defaults to "".
-        bot_name (str, optional): Custom bot name. Defaults to environment variable or "MCP Helper".
-    
-    Returns:
-        bool: True if message was sent successfully, False otherwise
-    """
-    if os.getenv("SLACK_NOTIFIER_ENABLED", "true").lower() == "false":
-        logging.info("Slack notifications are disabled")
-        return False
-    
-    webhook_url = os.getenv("SLACK_NOTIFIER_WEBHOOK_URL")
-    if not webhook_url:
-        logging.error("SLACK_NOTIFIER_WEBHOOK_URL environment variable is not set")
-        return False
-    
+# Slack accepts at most 50 blocks per message
+MAX_BLOCKS_PER_MESSAGE = 50
+
+_delivery_queue = None
+_delivery_queue_lock = threading.Lock()
+_throttle = None
+_throttle_lock = threading.Lock()
 
+
+def _build_payload(message, title):
     data = {"blocks": []}
     if title:
         data["blocks"].append({
@@ -42,10 +42,13 @@ def send_slack_notification(message, title=""):
             "text": message
         }
     })
+    return data
 
-    
+
+def _deliver(job):
+    """Send one queued or immediate message. Returns True when Slack answers "ok"."""
     try:
-        response = requests.post(webhook_url, json=data)
+        response = get_transport().post_json(job["webhook_url"], job["payload"])
         
         if response.status_code == 200 and response.text == "ok":
             logging.info('Message sent to Slack webhook')
@@ -59,7 +62,158 @@ def send_slack_notification(message, title=""):
         return False
 
 
+def _coalesce_key(job):
+    return job["webhook_url"]
+
+
+def _pack(jobs):
+    """Pack queued messages for one webhook into as few payloads as Slack's block limit allows."""
+    packed = []
+    blocks, indexes = [], []
+    for index, job in enumerate(jobs):
+        job_blocks = job["payload"]["blocks"]
+        # Separate coalesced notifications with a divider
+        if blocks and len(blocks) + 1 + len(job_blocks) > MAX_BLOCKS_PER_MESSAGE:
+            packed.append((blocks, indexes))
+            blocks, indexes = [], []
+        if blocks:
+            blocks.append({"type": "divider"})
+        blocks.extend(job_blocks)
+        indexes.append(index)
+    if blocks:
+        packed.append((blocks, indexes))
+
+    webhook_url = _coalesce_key(jobs[0])
+    return [({"webhook_url": webhook_url, "payload": {"blocks": blocks}}, indexes) for blocks, indexes in packed]
+
+
+def _get_delivery_queue():
+    global _delivery_queue
+    with _delivery_queue_lock:
+        if _delivery_queue is None:
+            _delivery_queue = create_delivery_queue(
+                "slack",
+                _deliver,
+                outbox_path=os.getenv("SLACK_NOTIFIER_OUTBOX_PATH"),
+                coalesce_window=float(os.getenv("SLACK_NOTIFIER_COALESCE_WINDOW_MS", "0")) / 1000,
+                coalesce_max=int(os.getenv("SLACK_NOTIFIER_COALESCE_MAX", "20")),
+                group_key=_coalesce_key,
+                pack=_pack,
+                on_failed=_release_throttle
+            )
+        return _delivery_queue
+
+
+def _dispatch(job, background):
+    if background:
+        return _get_delivery_queue().submit(job) or False
+
+    if os.getenv("SLACK_NOTIFIER_OUTBOX_PATH"):
+        # Persisted before sending; a failed send stays in the outbox and is replayed
+        return _get_delivery_queue().deliver_now(job)
+    return _deliver(job)
+
+
+def _send_rollup(sample, count):
+    """Send one follow-up standing in for the copies of a notification that were suppressed."""
+    title = f"{sample['title']} (x{count})".strip()
+    job = {"webhook_url": sample["webhook_url"], "payload": _build_payload(sample["message"], title)}
+    _dispatch(job, os.getenv("SLACK_NOTIFIER_DELIVERY_MODE", "sync").lower() == "background")
+
+
+def _get_throttle():
+    global _throttle
+    with _throttle_lock:
+        if _throttle is None:
+            _throttle = create_throttle("SLACK_NOTIFIER", rollup=_send_rollup)
+        return _throttle
+
+
+def _release_throttle(job):
+    """Let a retry of an undelivered message through the throttle again."""
+    if "throttle" in job:
+        webhook_url, title, content = job["throttle"]
+        _get_throttle().failed((webhook_url, title), content)
+
+
+def send_slack_notification(message, title="", background=None, destinations=None):
+    """
+    Send a notification to Slack via webhook.
+    
+    Args:
+        message (str): The main message content
+        title (str, optional): Title for the message. Defaults to "".
+        background (bool, optional): Queue the message and return immediately. Defaults to
+            SLACK_NOTIFIER_DELIVERY_MODE == "background".
+        destinations (list or str, optional): Names of configured destinations to send to.
+            Defaults to every destination whose routing rule matches the notification.
+    
+    Returns:
+        bool or str: True/False for immediate sends; a delivery id for background sends
+        (False if the message could not be queued); "suppressed" if it was dropped as a duplicate or throttled.
+        With SLACK_NOTIFIER_DESTINATIONS or destinations given, a dict with "success" (all
+        destinations succeeded) and "results" (the result for each destination name).
+    """
+    if os.getenv("SLACK_NOTIFIER_ENABLED", "true").lower() == "false":
+        logging.info("Slack notifications are disabled")
+        return False
+    
+    configured = load_destinations(os.getenv("SLACK_NOTIFIER_DESTINATIONS"), os.getenv("SLACK_NOTIFIER_WEBHOOK_URL"))
+    if not configured:
+        logging.error("Neither SLACK_NOTIFIER_WEBHOOK_URL nor SLACK_NOTIFIER_DESTINATIONS is set")
+        return False
+
+    payload = _build_payload(message, title)
+    if background is None:
+        background = os.getenv("SLACK_NOTIFIER_DELIVERY_MODE", "sync").lower() == "background"
+
+    def send_to(webhook_url):
+        job = {"webhook_url": webhook_url, "payload": payload}
+        throttle = _get_throttle()
+        if throttle.enabled:
+            content = f"{title}\0{message}"
+            sample = {"webhook_url": webhook_url, "message": message, "title": title}
+            if not throttle.allow((webhook_url, title), content, sample):
+                return SUPPRESSED
+            # Kept with the job so a background delivery that finally fails can release it too
+            job["throttle"] = [webhook_url, title, content]
+        result = _dispatch(job, background)
+        if not result:
+            _release_throttle(job)
+        return result
+
+    if destinations is None and not os.getenv("SLACK_NOTIFIER_DESTINATIONS"):
+        return send_to(configured["default"]["url"])
+
+    targets, unknown = route_destinations(configured, f"{title}\n{message}", destinations)
+    results = fan_out(targets, send_to)
+    for name in unknown:
+        logging.error(f"Unknown Slack destination '{name}'")
+        results[name] = False
+    if not results:
+        logging.warning("No Slack destination matched the notification")
+    return {"success": bool(results) and all(results.values()), "results": results}
+
+
+def get_slack_notification_status(delivery_id):
+    """
+    Look up the status of a background Slack notification.
+
+    Args:
+        delivery_id (str): The id returned by send_slack_notification in background mode
+
+    Returns:
+        dict or None: The delivery record (state is queued, sending, retrying, delivered or failed),
+        or None if the id is unknown
+    """
+    return _get_delivery_queue().status(delivery_id)
+
+
+# Replay anything a previous run left in the outbox as soon as the plugin loads
+if os.getenv("SLACK_NOTIFIER_OUTBOX_PATH"):
+    _get_delivery_queue()
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
-    send_slack_notification("Hello, world!", title="Test Message") 
\ No newline at end of file
+    send_slack_notification("Hello, world!", title="Test Message")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test packing coalesced Slack notifications into webhook calls.
+
+Checks that packed payloads stay within Slack's block limit, dividers
+included, and that a background queue using the packer gives every queued
+message an outcome. No webhook is contacted.
+"""
+import os
+import sys
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_notifier import notifier
+from slack_notifier.notifier import MAX_BLOCKS_PER_MESSAGE
+from webhook_transport.delivery import DELIVERED, DeliveryQueue
+
+WEBHOOK_URL = "https://hooks.slack.com/services/T0/B0/test"
+
+
+def _job(message, title="Alert"):
+    return {"webhook_url": WEBHOOK_URL, "payload": notifier._build_payload(message, title)}
+
+
+def test_pack_splits_at_block_limit():
+    """Header, section and divider blocks of 40 messages are split under the block limit."""
+    jobs = [_job(f"message {i}") for i in range(40)]
+    packed = notifier._pack(jobs)
+
+    for payload, indexes in packed:
+        blocks = payload["payload"]["blocks"]
+        assert len(blocks) <= MAX_BLOCKS_PER_MESSAGE
+        # Two blocks per message plus a divider between messages
+        assert len(blocks) == 3 * len(indexes) - 1
+    assert [index for _, indexes in packed for index in indexes] == list(range(40))
+    assert [len(indexes) for _, indexes in packed] == [17, 17, 6]
+
+
+def test_every_coalesced_message_gets_an_outcome():
+    """A packed payload that fails only retries its own members; every id ends up delivered."""
+    attempts = []
+
+    def deliver(job):
+        attempts.append(job)
+        # The first packed payload fails once
+        return len(attempts) != 1
+
+    queue = DeliveryQueue("slack-test", deliver, workers=1, backoff=0.01,
+                          coalesce_window=0.05, coalesce_max=40,
+                          group_key=notifier._coalesce_key, pack=notifier._pack)
+    ids = [queue.submit(_job(f"message {i}")) for i in range(40)]
+
+    assert queue.shutdown(timeout=5)
+    assert [queue.status(delivery_id)["state"] for delivery_id in ids] == [DELIVERED] * 40
+    # Three packed payloads, then the 17 members of the failed one retried one by one
+    assert len(attempts) == 3 + 17
+
+
+if __name__ == "__main__":
+    test_pack_splits_at_block_limit()
+    test_every_coalesced_message_gets_an_outcome()
+    print("✅ Slack packing respects the block limit and every message gets an outcome")
@@ -8,7 +8,7 @@ _module_info = {
     "version": "1.0.0",
     "platform": "any",
     "python_requires": ">=3.10",
-    "dependencies": ["spotipy"],
+    "dependencies": ["spotipy", "rapidfuzz>=3.0.0"],
     "environment_variables": {
         "SPOTIFY_CLIENT_ID": {
             "description": "Spotify app client ID from developer dashboard",
@@ -26,9 +26,84 @@ _module_info = {
             "required": False
         },
         "SPOTIFY_CACHE_PATH": {
-            "description": "Path to the Spotify token cache file",
+            "description": "Path to the Spotify token cache file (empty keeps the token in memory only)",
             "default": ".cache",
             "required": False
+        },
+        "SPOTIFY_TOKEN_REFRESH_LEAD": {
+            "description": "Seconds before expiry to refresh the access token in the background (0 disables)",
+            "default": "300",
+            "required": False
+        },
+        "SPOTIFY_STATE_CACHE_TTL": {
+            "description": "Seconds to reuse playback state and device list responses (0 disables)",
+            "default": "1.0",
+            "required": False
+        },
+        "SPOTIFY_SEARCH_CACHE_TTL": {
+            "description": "Seconds to reuse search_spotify results (0 disables)",
+            "default": "300",
+            "required": False
+        },
+        "SPOTIFY_SEARCH_CACHE_SIZE": {
+            "description": "Maximum number of cached search results",
+            "default": "256",
+            "required": False
+        },
+        "SPOTIFY_COMMAND_DEBOUNCE": {
+            "description": "Seconds to hold volume, transfer and skip commands so bursts are coalesced (0 sends immediately)",
+            "default": "0.25",
+            "required": False
+        },
+        "SPOTIFY_MAX_WORKERS": {
+            "description": "Threads used to run Spotify API calls off the event loop",
+            "default": "4",
+            "required": False
+        },
+        "SPOTIFY_LIBRARY_INDEX_PATH": {
+            "description": "Path to the local library index used by search_library",
+            "default": ".spotify_library.json",
+            "required": False
+        },
+        "SPOTIFY_PAGE_CONCURRENCY": {
+            "description": "Pages fetched at once when reading all playlists or playlist tracks",
+            "default": "4",
+            "required": False
+        },
+        "SPOTIFY_WATCH_INTERVAL": {
+            "description": "Longest gap in seconds between playback polls while music plays (polls sooner near the end of a track)",
+            "default": "5",
+            "required": False
+        },
+        "SPOTIFY_WATCH_IDLE_INTERVAL": {
+            "description": "Seconds between playback polls while paused or idle",
+            "default": "15",
+            "required": False
+        },
+        "SPOTIFY_POOL_SIZE": {
+            "description": "Most named accounts with a live controller; the least recently used is closed beyond this",
+            "default": "32",
+            "required": False
+        },
+        "SPOTIFY_POOL_IDLE_TIMEOUT": {
+            "description": "Seconds after which an unused named account's controller is closed",
+            "default": "1800",
+            "required": False
+        },
+        "SPOTIFY_RATE_LIMIT": {
+            "description": "Most Spotify API requests per rate limit window; lowered automatically after a 429",
+            "default": "90",
+            "required": False
+        },
+        "SPOTIFY_RATE_LIMIT_WINDOW": {
+            "description": "Length of the rolling rate limit window in seconds",
+            "default": "30",
+            "required": False
+        },
+        "SPOTIFY_MAX_RETRY_WAIT": {
+            "description": "Longest Retry-After to wait out before failing a request",
+            "default": "60",
+            "required": False
         }
     }
 }
@@ -51,7 +126,16 @@ from .spotify_functions import (
     set_volume,
     get_user_playlists,
     get_available_devices,
-    transfer_playback
+    transfer_playback,
+    get_all_user_playlists,
+    get_all_playlist_tracks,
+    iter_user_playlists,
+    iter_playlist_tracks,
+    search_library,
+    sync_library,
+    get_api_stats,
+    watch_playback,
+    wait_for_playback_change
 )
 
 _module_exports = {
@@ -67,7 +151,13 @@ _module_exports = {
         set_volume,
         get_user_playlists,
         get_available_devices,
-        transfer_playback
+        transfer_playback,
+        get_all_user_playlists,
+        get_all_playlist_tracks,
+        search_library,
+        sync_library,
+        get_api_stats,
+        wait_for_playback_change
     ]
 }
 # =============================================================================
@@ -0,0 +1,134 @@
+"""
+Short-lived, thread-safe cache with single-flight loading.
+
+Used by SpotifyController for reads that agents repeat before almost every
+action (playback state, device list) and for catalog searches. Concurrent
+misses for the same key share a single Spotify request, and our own commands
+can update or drop the cached value so it never contradicts what we just did.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache values for `ttl` seconds; a ttl of 0 disables caching but keeps coalescing.
+
+    With max_entries, the least recently used entries are evicted beyond that size.
+    """
+
+    def __init__(self, ttl: float, max_entries: Optional[int] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()  # key -> {"value", "expires_at"}
+        self._inflight: Dict[Hashable, Dict[str, Any]] = {}  # key -> {"done", "value", "error"}
+        self._generations: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        If another thread is already loading the key, wait for its result
+        instead of calling loader() again. Loader exceptions propagate to every
+        waiting caller and nothing is cached.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry["value"]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._inflight[key] = {"done": threading.Event(), "value": None, "error": None}
+                generation = self._generations.get(key, 0)
+            else:
+                self.hits += 1
+
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["value"]
+
+        try:
+            flight["value"] = loader()
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                # Skip storing if the key was invalidated while we were loading
+                if flight["error"] is None and self._generations.get(key, 0) == generation:
+                    self._store(key, flight["value"])
+            flight["done"].set()
+        return flight["value"]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key without loading it, or default."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache a value fetched outside get(), such as one part of a combined response."""
+        with self._lock:
+            self._store(key, value)
+
+    def update(self, key: Hashable, mutate: Callable[[Any], Optional[bool]]) -> None:
+        """
+        Apply an optimistic change to a cached value in place.
+
+        If mutate returns False the change could not be applied and the entry
+        is dropped instead. Keys that are not cached are left alone.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return
+            if entry["value"] is None or mutate(entry["value"]) is False:
+                self._invalidate(key)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or everything if key is None."""
+        with self._lock:
+            for k in ([key] if key is not None else list(set(self._entries) | set(self._inflight))):
+                self._invalidate(k)
+
+    def _lookup(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Return the live entry for key, dropping it if expired. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """Caller holds the lock."""
+        if self.ttl <= 0:
+            return
+        self._entries[key] = {"value": value, "expires_at": time.monotonic() + self.ttl}
+        self._entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _invalidate(self, key: Hashable) -> None:
+        """Caller holds the lock."""
+        self._entries.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
@@ -0,0 +1,144 @@
+"""
+Per-device scheduling for Spotify playback commands.
+
+Agents tend to fire bursts of controls - volume stepped 10 -> 20 -> 30,
+several skips in a row, a transfer that is immediately retargeted - and each
+one is a Spotify request that counts against the rate limit. Commands are
+held for a short window per device: idempotent ones (volume, transfer) keep
+only their latest value, skips are kept in order with a next immediately
+undone by a previous dropped, and everything for a device is sent one
+command at a time so Spotify sees them in the order they were issued.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Called with the exception when a deferred command fails
+ErrorHandler = Callable[[Exception], None]
+
+
+class CommandScheduler:
+    """
+    Debounce and serialize playback commands per device.
+
+    Device keys are whatever the caller targets; None means the active device.
+    A window of 0 sends every command immediately (still serialized).
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._lock = threading.Lock()
+        self._device_locks: Dict[Hashable, threading.Lock] = {}
+        self._pending: Dict[Hashable, "OrderedDict[str, Dict[str, Any]]"] = {}  # device -> kind -> slot
+        self._timers: Dict[Hashable, threading.Timer] = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0  # deferred commands that raised after the caller was told they succeeded
+        self.last_error: Optional[str] = None
+
+    def run(self, device: Optional[Hashable], send: Callable[[], Any]) -> Any:
+        """
+        Send a command now and return its result; exceptions propagate.
+
+        Pending commands are sent first so this one never overtakes them.
+        """
+        self.flush()
+        with self._device_lock(device):
+            with self._lock:
+                self.sent += 1
+            return send()
+
+    def debounce(self, device: Optional[Hashable], kind: str, send: Callable[[], Any],
+                 on_error: Optional[ErrorHandler] = None) -> None:
+        """
+        Send a command after the window, replacing any pending command of the same kind.
+
+        With no window the command is sent immediately and exceptions propagate;
+        otherwise failures are passed to on_error.
+        """
+        if self.window <= 0:
+            self.run(device, send)
+            return
+        with self._lock:
+            pending = self._pending.setdefault(device, OrderedDict())
+            # The replacement is sent in the order it was issued, after other kinds queued since
+            if pending.pop(kind, None) is not None:
+                self.coalesced += 1
+            pending[kind] = {"commands": [(send, on_error)]}
+            self._schedule(device)
+
+    def skip(self, device: Optional[Hashable], forward: bool, send: Callable[[], Any],
+             on_error: Optional[ErrorHandler] = None) -> None:
+        """
+        Queue a next (forward) or previous track command, sent in order after the window.
+
+        A previous that directly follows a pending next cancels it: right
+        after a skip, previous returns to the track that was skipped.
+        """
+        if self.window <= 0:
+            self.run(device, send)
+            return
+        with self._lock:
+            pending = self._pending.setdefault(device, OrderedDict())
+            slot = pending.setdefault("skip", {"commands": [], "forward": []})
+            if not forward and slot["forward"] and slot["forward"][-1]:
+                slot["commands"].pop()
+                slot["forward"].pop()
+                self.coalesced += 2
+                if not slot["commands"]:
+                    del pending["skip"]
+            else:
+                slot["commands"].append((send, on_error))
+                slot["forward"].append(forward)
+            self._schedule(device)
+
+    def flush(self, device: Any = ...) -> None:
+        """Send pending commands now, for one device or (by default) all of them."""
+        with self._lock:
+            devices = list(self._pending) if device is ... else [device]
+        for key in devices:
+            self._flush_device(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Commands sent, commands saved by coalescing, and deferred commands that failed."""
+        with self._lock:
+            return {"sent": self.sent, "coalesced": self.coalesced,
+                    "failed": self.failed, "last_error": self.last_error}
+
+    def _device_lock(self, device: Optional[Hashable]) -> threading.Lock:
+        with self._lock:
+            return self._device_locks.setdefault(device, threading.Lock())
+
+    def _schedule(self, device: Optional[Hashable]) -> None:
+        """Start the device's flush timer if it isn't running. Caller holds the lock."""
+        if device not in self._timers:
+            timer = threading.Timer(self.window, self._flush_device, args=(device,))
+            # close() flushes what is pending; a lingering timer must not keep the process alive
+            timer.daemon = True
+            self._timers[device] = timer
+            timer.start()
+
+    def _flush_device(self, device: Optional[Hashable]) -> None:
+        # Hold the device lock while taking the batch so a later batch can't be sent first
+        with self._device_lock(device):
+            with self._lock:
+                pending = self._pending.pop(device, None)
+                timer = self._timers.pop(device, None)
+            if timer is not None:
+                timer.cancel()
+            if not pending:
+                return
+            for kind, slot in pending.items():
+                for send, on_error in slot["commands"]:
+                    with self._lock:
+                        self.sent += 1
+                    try:
+                        send()
+                    except Exception as e:
+                        with self._lock:
+                            self.failed += 1
+                            self.last_error = f"{kind}: {e}"
+                        if on_error is not None:
+                            on_error(e)
+                        else:
+                            print(f"Error sending {kind} command: {e}")
@@ -1,10 +1,35 @@
-import spotipy
+import requests
 from spotipy.oauth2 import SpotifyOAuth
 import json
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, AsyncIterator
+
+from .cache import TTLCache
+from .commands import CommandScheduler
+from .rate_limit import RequestScheduler, ScheduledSpotify, get_request_scheduler
+from .tokens import TokenStore, TokenRefresher
+from .watcher import PlaybackWatcher
+
+# Largest page sizes Spotify allows for these endpoints
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLIST_TRACKS_PAGE_SIZE = 100
+SAVED_TRACKS_PAGE_SIZE = 50
+
+# Server-side projection for playlist items: only what format_playlist_track reads
+PLAYLIST_TRACK_FIELDS = "total,items(added_at,track(id,name,uri,artists(name),album(name)))"
+
+# Types search_spotify can format; several may be combined in one request
+SEARCH_TYPES = ('track', 'artist', 'album', 'playlist')
+
+# Keys in the playback/device state cache
+PLAYBACK_STATE = "playback"
+DEVICES_STATE = "devices"
 
 class SpotifyController:
-    def __init__(self, client_id: str, client_secret: str, redirect_uri: str = "http://127.0.0.1:8888/callback", manual_auth: bool = False, cache_path: str = ".cache"):
+    def __init__(self, client_id: str, client_secret: str, redirect_uri: str = "http://127.0.0.1:8888/callback", manual_auth: bool = False, cache_path: str = ".cache", state_cache_ttl: float = 1.0,
+                 search_cache_ttl: float = 300.0, search_cache_size: int = 256, command_debounce: float = 0.25,
+                 rate_limiter: Optional[RequestScheduler] = None, token_refresh_lead: float = 300.0,
+                 requests_session: Optional[requests.Session] = None, watch_interval: float = 5.0,
+                 watch_idle_interval: float = 15.0):
         """
         Initialize Spotify controller with your app credentials.
         
@@ -13,10 +38,27 @@ class SpotifyController:
             client_secret: Your Spotify app client secret
             redirect_uri: Redirect URI (default uses IPv4 loopback as required by Spotify)
             manual_auth: If True, will print auth URL for manual authorization
-            cache_path: Path to the token cache file
+            cache_path: Path to the token cache file (None keeps the token in memory only)
+            state_cache_ttl: Seconds to reuse playback state and device list responses (0 disables)
+            search_cache_ttl: Seconds to reuse search results (0 disables)
+            search_cache_size: Maximum cached searches (per query, type, limit and market)
+            command_debounce: Seconds to hold volume, transfer and skip commands for coalescing (0 sends immediately)
+            rate_limiter: Scheduler all API requests go through (default: the shared process-wide one)
+            token_refresh_lead: Seconds before expiry to refresh the access token in the background (0 disables)
+            requests_session: HTTP session to share with other controllers (default: a session of its own)
+            watch_interval: Longest gap between playback polls while something is playing
+            watch_idle_interval: Gap between playback polls while paused or idle
         """
+        self.state_cache = TTLCache(state_cache_ttl)
+        self.search_cache = TTLCache(search_cache_ttl, max_entries=search_cache_size)
+        self.commands = CommandScheduler(command_debounce)
+        self.rate_limiter = rate_limiter or get_request_scheduler()
+        self.requests_session = requests_session if requests_session is not None else True
+        self.playback_watcher = PlaybackWatcher(self, interval=watch_interval, idle_interval=watch_idle_interval)
         self.scope = "user-read-playback-state user-modify-playback-state user-read-currently-playing playlist-read-private playlist-read-collaborative user-library-read"
         self.manual_auth = manual_auth
+        # Read the token file once; spotipy asks for the token before every request
+        self.token_store = TokenStore(cache_path)
         
         if manual_auth:
             # For manual authorization, we'll handle the flow differently
@@ -26,17 +68,31 @@ class SpotifyController:
                 redirect_uri=redirect_uri,
                 scope=self.scope,
                 open_browser=False,  # Don't auto-open browser
-                cache_path=cache_path
+                cache_handler=self.token_store
             )
             self.sp = None  # Will be set after manual auth
         else:
-            self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+            self.auth_manager = SpotifyOAuth(
                 client_id=client_id,
                 client_secret=client_secret,
                 redirect_uri=redirect_uri,
                 scope=self.scope,
-                cache_path=cache_path
-            ))
+                cache_handler=self.token_store
+            )
+            self.sp = ScheduledSpotify(auth_manager=self.auth_manager, scheduler=self.rate_limiter,
+                                       requests_session=self.requests_session)
+
+        self.token_refresher = None
+        if token_refresh_lead > 0:
+            self.token_refresher = TokenRefresher(self.auth_manager, self.token_store, lead=token_refresh_lead)
+            self.token_refresher.start()
+
+    def close(self):
+        """Send pending commands and stop the background token refresh and playback polling."""
+        self.commands.flush()
+        self.playback_watcher.stop()
+        if self.token_refresher is not None:
+            self.token_refresher.stop()
     
     def get_auth_url(self) -> str:
         """Get the authorization URL for manual authentication."""
@@ -59,7 +115,8 @@ class SpotifyController:
         
         try:
             token_info = self.auth_manager.get_access_token(authorization_code)
-            self.sp = spotipy.Spotify(auth_manager=self.auth_manager)
+            self.sp = ScheduledSpotify(auth_manager=self.auth_manager, scheduler=self.rate_limiter,
+                                       requests_session=self.requests_session)
             return True
         except Exception as e:
             print(f"Error during authentication: {e}")
@@ -77,33 +134,85 @@ class SpotifyController:
             else:
                 raise ValueError("Authentication failed.")
     
+    def _update_playback(self, device_id: Optional[str], **fields: Any):
+        """Optimistically apply a command's effect to the cached playback state."""
+        def mutate(current: Dict[str, Any]) -> bool:
+            # A command aimed at another device says nothing about the active one
+            if device_id and (current.get('device') or {}).get('id') != device_id:
+                return False
+            current.update(fields)
+            return True
+        self.state_cache.update(PLAYBACK_STATE, mutate)
+
+    def _update_volume(self, volume_percent: int, device_id: Optional[str]):
+        """Optimistically apply a volume change to the cached playback state and device list."""
+        def set_device_volume(device: Optional[Dict[str, Any]]) -> bool:
+            if device and (device['id'] == device_id if device_id else device.get('is_active')):
+                device['volume_percent'] = volume_percent
+                return True
+            return False
+
+        self.state_cache.update(PLAYBACK_STATE, lambda current: set_device_volume(current.get('device')))
+        self.state_cache.update(DEVICES_STATE, lambda devices: any([set_device_volume(d) for d in devices['devices']]))
+
+    def _deferred_error(self, message: str):
+        """Error handler for a debounced command that failed after we reported success."""
+        def on_error(e: Exception):
+            print(f"{message}: {e}")
+            # The optimistic cache update no longer holds
+            self.state_cache.invalidate()
+        return on_error
+
+    def fetch_playback(self, flush: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Like get_current_playback, but API errors are raised instead of returning None.
+
+        flush=False leaves debounced commands pending, for background polls that
+        should not cut the debounce window short.
+        """
+        self._ensure_authenticated()
+        # Reads must see the effect of commands that already returned
+        if flush:
+            self.commands.flush()
+        current = self.state_cache.get(PLAYBACK_STATE, self.sp.current_playback)
+        if current:
+            return {
+                'is_playing': current['is_playing'],
+                'track_uri': current['item']['uri'] if current['item'] else None,
+                'track_name': current['item']['name'] if current['item'] else None,
+                'artist': ', '.join([artist['name'] for artist in current['item']['artists']]) if current['item'] else None,
+                'album': current['item']['album']['name'] if current['item'] else None,
+                'device': current['device']['name'] if current['device'] else None,
+                'progress_ms': current['progress_ms'],
+                'duration_ms': current['item']['duration_ms'] if current['item'] else None,
+                'shuffle_state': current['shuffle_state'],
+                'repeat_state': current['repeat_state']
+            }
+        return None
+
     def get_current_playback(self) -> Optional[Dict[str, Any]]:
         """Get information about the current playback state."""
         self._ensure_authenticated()
         try:
-            current = self.sp.current_playback()
-            if current:
-                return {
-                    'is_playing': current['is_playing'],
-                    'track_name': current['item']['name'] if current['item'] else None,
-                    'artist': ', '.join([artist['name'] for artist in current['item']['artists']]) if current['item'] else None,
-                    'album': current['item']['album']['name'] if current['item'] else None,
-                    'device': current['device']['name'] if current['device'] else None,
-                    'progress_ms': current['progress_ms'],
-                    'duration_ms': current['item']['duration_ms'] if current['item'] else None,
-                    'shuffle_state': current['shuffle_state'],
-                    'repeat_state': current['repeat_state']
-                }
-            return None
+            return self.fetch_playback()
         except Exception as e:
             print(f"Error getting current playback: {e}")
             return None
     
+    def watch_playback(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream playback change events (track changed, paused, stopped, ...).
+
+        All subscribers share one adaptive poller; see PlaybackWatcher.
+        """
+        return self.playback_watcher.subscribe()
+
     def get_available_devices(self) -> List[Dict[str, Any]]:
         """Get all available Spotify devices."""
         self._ensure_authenticated()
         try:
-            devices = self.sp.devices()
+            self.commands.flush()
+            devices = self.state_cache.get(DEVICES_STATE, self.sp.devices)
             return [{
                 'id': device['id'],
                 'name': device['name'],
@@ -118,83 +227,155 @@ class SpotifyController:
             return []
     
     def transfer_playback(self, device_id: str, force_play: bool = False) -> bool:
-        """Transfer playback to a specific device."""
-        try:
+        """Transfer playback to a specific device. Only the last transfer within the debounce window is sent."""
+        def send():
             self.sp.transfer_playback(device_id=device_id, force_play=force_play)
+            self.state_cache.invalidate()
+
+        try:
+            # Transfers move the whole session, so they share the active-device key
+            self.commands.debounce(None, 'transfer', send, self._deferred_error("Error transferring playback"))
             return True
         except Exception as e:
             print(f"Error transferring playback: {e}")
             return False
     
-    def search_spotify(self, query: str, search_type: str = 'track', limit: int = 10) -> Dict[str, Any]:
+    @staticmethod
+    def _format_search_results(search_type: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce one type's section of a search response to the fields the tools return."""
+        if search_type == 'track':
+            return {
+                'tracks': [{
+                    'id': track['id'],
+                    'name': track['name'],
+                    'artist': ', '.join([artist['name'] for artist in track['artists']]),
+                    'album': track['album']['name'],
+                    'uri': track['uri']
+                } for track in results['tracks']['items']]
+            }
+        elif search_type == 'artist':
+            return {
+                'artists': [{
+                    'id': artist['id'],
+                    'name': artist['name'],
+                    'followers': artist['followers']['total'],
+                    'genres': artist['genres'],
+                    'uri': artist['uri']
+                } for artist in results['artists']['items']]
+            }
+        elif search_type == 'album':
+            return {
+                'albums': [{
+                    'id': album['id'],
+                    'name': album['name'],
+                    'artist': ', '.join([artist['name'] for artist in album['artists']]),
+                    'release_date': album['release_date'],
+                    'uri': album['uri']
+                } for album in results['albums']['items']]
+            }
+        elif search_type == 'playlist':
+            return {
+                'playlists': [{
+                    'id': playlist['id'],
+                    'name': playlist['name'],
+                    'owner': playlist['owner']['display_name'],
+                    'tracks_total': playlist['tracks']['total'],
+                    'uri': playlist['uri']
+                } for playlist in results['playlists']['items']]
+            }
+        raise ValueError(f"Unsupported search type: {search_type}")
+
+    def search_spotify(self, query: str, search_type: str = 'track', limit: int = 10, market: Optional[str] = None) -> Dict[str, Any]:
         """
         Search Spotify for tracks, artists, albums, or playlists.
         
         Args:
             query: Search query
-            search_type: 'track', 'artist', 'album', or 'playlist'
-            limit: Number of results to return
+            search_type: 'track', 'artist', 'album', or 'playlist', or several comma-separated (e.g. 'track,artist')
+            limit: Number of results to return per type
+            market: Optional ISO country code to restrict results to
         """
         try:
-            results = self.sp.search(q=query, type=search_type, limit=limit)
-            
-            if search_type == 'track':
-                return {
-                    'tracks': [{
-                        'id': track['id'],
-                        'name': track['name'],
-                        'artist': ', '.join([artist['name'] for artist in track['artists']]),
-                        'album': track['album']['name'],
-                        'uri': track['uri']
-                    } for track in results['tracks']['items']]
-                }
-            elif search_type == 'artist':
-                return {
-                    'artists': [{
-                        'id': artist['id'],
-                        'name': artist['name'],
-                        'followers': artist['followers']['total'],
-                        'genres': artist['genres'],
-                        'uri': artist['uri']
-                    } for artist in results['artists']['items']]
-                }
-            elif search_type == 'album':
-                return {
-                    'albums': [{
-                        'id': album['id'],
-                        'name': album['name'],
-                        'artist': ', '.join([artist['name'] for artist in album['artists']]),
-                        'release_date': album['release_date'],
-                        'uri': album['uri']
-                    } for album in results['albums']['items']]
-                }
-            elif search_type == 'playlist':
-                return {
-                    'playlists': [{
-                        'id': playlist['id'],
-                        'name': playlist['name'],
-                        'owner': playlist['owner']['display_name'],
-                        'tracks_total': playlist['tracks']['total'],
-                        'uri': playlist['uri']
-                    } for playlist in results['playlists']['items']]
-                }
+            types = [t.strip() for t in search_type.split(',') if t.strip()]
+            unsupported = [t for t in types if t not in SEARCH_TYPES]
+            if not types or unsupported:
+                raise ValueError(f"Unsupported search type: {search_type}")
+
+            # Results are cached per type, so one combined search also serves later single-type searches
+            normalized = ' '.join(query.casefold().split())
+            results: Dict[str, Any] = {}
+            missing = []
+            for t in types:
+                cached = self.search_cache.peek((normalized, t, limit, market))
+                if cached is None:
+                    missing.append(t)
+                else:
+                    results.update(cached)
+
+            if missing:
+                response = self.sp.search(q=query, type=','.join(missing), limit=limit, market=market)
+                for t in missing:
+                    formatted = self._format_search_results(t, response)
+                    self.search_cache.set((normalized, t, limit, market), formatted)
+                    results.update(formatted)
+            return results
         except Exception as e:
             print(f"Error searching Spotify: {e}")
             return {}
     
+    @staticmethod
+    def format_playlist(playlist: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce a Spotify playlist object to the fields the tools return."""
+        return {
+            'id': playlist['id'],
+            'name': playlist['name'],
+            'owner': playlist['owner']['display_name'],
+            'tracks_total': playlist['tracks']['total'],
+            'public': playlist['public'],
+            'collaborative': playlist['collaborative'],
+            'uri': playlist['uri'],
+            'snapshot_id': playlist.get('snapshot_id')
+        }
+
+    @staticmethod
+    def format_playlist_track(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Reduce a playlist or saved-track item to the fields the tools return, or None for removed tracks."""
+        track = item.get('track')
+        if not track:
+            return None
+        return {
+            'id': track['id'],
+            'name': track['name'],
+            'artist': ', '.join([artist['name'] for artist in track['artists']]),
+            'album': track['album']['name'],
+            'uri': track['uri'],
+            'added_at': item['added_at']
+        }
+
+    def user_playlists_page(self, offset: int, limit: int = PLAYLISTS_PAGE_SIZE) -> Dict[str, Any]:
+        """Fetch one raw page of the current user's playlists."""
+        self._ensure_authenticated()
+        with self.rate_limiter.bulk():
+            return self.sp.current_user_playlists(limit=limit, offset=offset)
+
+    def playlist_tracks_page(self, playlist_id: str, offset: int, limit: int = PLAYLIST_TRACKS_PAGE_SIZE) -> Dict[str, Any]:
+        """Fetch one raw page of a playlist's tracks, asking Spotify for only the fields we use."""
+        self._ensure_authenticated()
+        with self.rate_limiter.bulk():
+            return self.sp.playlist_items(playlist_id, fields=PLAYLIST_TRACK_FIELDS, limit=limit, offset=offset,
+                                          additional_types=('track',))
+
+    def saved_tracks_page(self, offset: int, limit: int = SAVED_TRACKS_PAGE_SIZE) -> Dict[str, Any]:
+        """Fetch one raw page of the user's saved tracks, newest first."""
+        self._ensure_authenticated()
+        with self.rate_limiter.bulk():
+            return self.sp.current_user_saved_tracks(limit=limit, offset=offset)
+
     def get_user_playlists(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get current user's playlists."""
         try:
             playlists = self.sp.current_user_playlists(limit=limit)
-            return [{
-                'id': playlist['id'],
-                'name': playlist['name'],
-                'owner': playlist['owner']['display_name'],
-                'tracks_total': playlist['tracks']['total'],
-                'public': playlist['public'],
-                'collaborative': playlist['collaborative'],
-                'uri': playlist['uri']
-            } for playlist in playlists['items']]
+            return [self.format_playlist(playlist) for playlist in playlists['items']]
         except Exception as e:
             print(f"Error getting playlists: {e}")
             return []
@@ -203,18 +384,7 @@ class SpotifyController:
         """Get tracks from a specific playlist."""
         try:
             results = self.sp.playlist_tracks(playlist_id, limit=limit)
-            tracks = []
-            for item in results['items']:
-                if item['track']:
-                    tracks.append({
-                        'id': item['track']['id'],
-                        'name': item['track']['name'],
-                        'artist': ', '.join([artist['name'] for artist in item['track']['artists']]),
-                        'album': item['track']['album']['name'],
-                        'uri': item['track']['uri'],
-                        'added_at': item['added_at']
-                    })
-            return tracks
+            return [track for track in map(self.format_playlist_track, results['items']) if track]
         except Exception as e:
             print(f"Error getting playlist tracks: {e}")
             return []
@@ -222,7 +392,8 @@ class SpotifyController:
     def play_track(self, track_uri: str, device_id: Optional[str] = None) -> bool:
         """Play a specific track."""
         try:
-            self.sp.start_playback(device_id=device_id, uris=[track_uri])
+            self.commands.run(device_id, lambda: self.sp.start_playback(device_id=device_id, uris=[track_uri]))
+            self.state_cache.invalidate(PLAYBACK_STATE)
             return True
         except Exception as e:
             print(f"Error playing track: {e}")
@@ -231,7 +402,8 @@ class SpotifyController:
     def play_playlist(self, playlist_uri: str, device_id: Optional[str] = None) -> bool:
         """Play a playlist."""
         try:
-            self.sp.start_playback(device_id=device_id, context_uri=playlist_uri)
+            self.commands.run(device_id, lambda: self.sp.start_playback(device_id=device_id, context_uri=playlist_uri))
+            self.state_cache.invalidate(PLAYBACK_STATE)
             return True
         except Exception as e:
             print(f"Error playing playlist: {e}")
@@ -240,7 +412,8 @@ class SpotifyController:
     def play_album(self, album_uri: str, device_id: Optional[str] = None) -> bool:
         """Play an album."""
         try:
-            self.sp.start_playback(device_id=device_id, context_uri=album_uri)
+            self.commands.run(device_id, lambda: self.sp.start_playback(device_id=device_id, context_uri=album_uri))
+            self.state_cache.invalidate(PLAYBACK_STATE)
             return True
         except Exception as e:
             print(f"Error playing album: {e}")
@@ -249,7 +422,8 @@ class SpotifyController:
     def pause_playback(self, device_id: Optional[str] = None) -> bool:
         """Pause current playback."""
         try:
-            self.sp.pause_playback(device_id=device_id)
+            self.commands.run(device_id, lambda: self.sp.pause_playback(device_id=device_id))
+            self._update_playback(device_id, is_playing=False)
             return True
         except Exception as e:
             print(f"Error pausing playback: {e}")
@@ -258,34 +432,45 @@ class SpotifyController:
     def resume_playback(self, device_id: Optional[str] = None) -> bool:
         """Resume current playback."""
         try:
-            self.sp.start_playback(device_id=device_id)
+            self.commands.run(device_id, lambda: self.sp.start_playback(device_id=device_id))
+            self._update_playback(device_id, is_playing=True)
             return True
         except Exception as e:
             print(f"Error resuming playback: {e}")
             return False
     
     def next_track(self, device_id: Optional[str] = None) -> bool:
-        """Skip to next track."""
-        try:
+        """Skip to next track. Skips within the debounce window are sent together, in order."""
+        def send():
             self.sp.next_track(device_id=device_id)
+            self.state_cache.invalidate(PLAYBACK_STATE)
+
+        try:
+            self.commands.skip(device_id, True, send, self._deferred_error("Error skipping track"))
             return True
         except Exception as e:
             print(f"Error skipping track: {e}")
             return False
     
     def previous_track(self, device_id: Optional[str] = None) -> bool:
-        """Go to previous track."""
-        try:
+        """Go to previous track. Skips within the debounce window are sent together, in order."""
+        def send():
             self.sp.previous_track(device_id=device_id)
+            self.state_cache.invalidate(PLAYBACK_STATE)
+
+        try:
+            self.commands.skip(device_id, False, send, self._deferred_error("Error going to previous track"))
             return True
         except Exception as e:
             print(f"Error going to previous track: {e}")
             return False
     
     def set_volume(self, volume_percent: int, device_id: Optional[str] = None) -> bool:
-        """Set volume (0-100)."""
+        """Set volume (0-100). Only the last volume within the debounce window is sent."""
         try:
-            self.sp.volume(volume_percent, device_id=device_id)
+            self.commands.debounce(device_id, 'volume', lambda: self.sp.volume(volume_percent, device_id=device_id),
+                                   self._deferred_error("Error setting volume"))
+            self._update_volume(volume_percent, device_id)
             return True
         except Exception as e:
             print(f"Error setting volume: {e}")
@@ -294,7 +479,8 @@ class SpotifyController:
     def toggle_shuffle(self, state: bool, device_id: Optional[str] = None) -> bool:
         """Toggle shuffle on/off."""
         try:
-            self.sp.shuffle(state, device_id=device_id)
+            self.commands.run(device_id, lambda: self.sp.shuffle(state, device_id=device_id))
+            self._update_playback(device_id, shuffle_state=state)
             return True
         except Exception as e:
             print(f"Error toggling shuffle: {e}")
@@ -303,7 +489,8 @@ class SpotifyController:
     def set_repeat(self, state: str, device_id: Optional[str] = None) -> bool:
         """Set repeat mode: 'track', 'context', or 'off'."""
         try:
-            self.sp.repeat(state, device_id=device_id)
+            self.commands.run(device_id, lambda: self.sp.repeat(state, device_id=device_id))
+            self._update_playback(device_id, repeat_state=state)
             return True
         except Exception as e:
             print(f"Error setting repeat: {e}")
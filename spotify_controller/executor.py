@@ -0,0 +1,44 @@
+"""
+Bounded thread pool for running blocking Spotify calls off the event loop.
+
+Spotipy is synchronous: every API call, and any token refresh it triggers,
+blocks the calling thread for a full round trip to Spotify. The async tools
+await these calls on a dedicated pool instead, so the agent's event loop keeps
+running while Spotify answers.
+"""
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the shared Spotify thread pool, sized by SPOTIFY_MAX_WORKERS."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SPOTIFY_MAX_WORKERS", "4")),
+                thread_name_prefix="spotify"
+            )
+        return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking function on the Spotify thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    """Shut down the thread pool; a new one is created on next use."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
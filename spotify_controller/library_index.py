@@ -0,0 +1,240 @@
+"""
+Local index of the user's Spotify library for offline fuzzy search.
+
+Playlists, their tracks and the user's saved tracks are stored in a JSON file
+so that library lookups ("play my gym playlist") resolve locally in
+milliseconds without a Spotify API call. Syncs are incremental: only
+playlists whose snapshot_id changed are refetched, and only newly saved
+tracks are read unless removals are detected.
+"""
+import os
+import json
+import time
+import asyncio
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process, utils
+
+from .controller import SpotifyController, PLAYLISTS_PAGE_SIZE, PLAYLIST_TRACKS_PAGE_SIZE, SAVED_TRACKS_PAGE_SIZE
+from .executor import run_blocking
+from .pagination import iter_paginated
+
+INDEX_VERSION = 1
+
+
+def _track_identity(track: Dict[str, Any]) -> str:
+    """Local files have no Spotify id, only a spotify:local: URI."""
+    return track["id"] or track["uri"]
+
+
+def _saved_key(track: Dict[str, Any]) -> Tuple[str, str]:
+    return _track_identity(track), track["added_at"]
+
+
+class LibraryIndex:
+    """Persisted snapshot of the user's playlists and saved tracks with fuzzy lookup."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = self._empty()
+        self._loaded = False
+        self._sync_lock = asyncio.Lock()
+        self._choices: Optional[Dict[str, Tuple[List[str], List[Dict[str, Any]]]]] = None
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {"version": INDEX_VERSION, "synced_at": None, "playlists": {}, "saved_tracks": [],
+                "saved_tracks_unavailable": 0}
+
+    @property
+    def synced_at(self) -> Optional[float]:
+        self.load()
+        return self.data["synced_at"]
+
+    def load(self):
+        """Load the index from disk once; a missing or outdated file means an empty index."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.data = data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error loading Spotify library index: {e}")
+
+    def save(self):
+        """Write the index atomically so a crash never leaves a truncated file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".spotify_library-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    async def sync(self, controller: SpotifyController, full: bool = False) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the user's library.
+
+        Unless full is set, playlists whose snapshot_id is unchanged keep their
+        indexed tracks and only newly saved tracks are fetched.
+        """
+        async with self._sync_lock:
+            self.load()
+            start = time.perf_counter()
+            stored = {} if full else self.data["playlists"]
+
+            playlists = [playlist async for playlist in iter_paginated(
+                controller.user_playlists_page, PLAYLISTS_PAGE_SIZE, transform=controller.format_playlist
+            )]
+            changed = [
+                playlist for playlist in playlists
+                if not playlist.get("snapshot_id") or stored.get(playlist["id"], {}).get("snapshot_id") != playlist["snapshot_id"]
+            ]
+
+            semaphore = asyncio.Semaphore(int(os.getenv("SPOTIFY_PAGE_CONCURRENCY", "4")))
+
+            async def fetch_tracks(playlist: Dict[str, Any]):
+                async with semaphore:
+                    playlist["tracks"] = [track async for track in iter_paginated(
+                        lambda offset, limit: controller.playlist_tracks_page(playlist["id"], offset, limit),
+                        PLAYLIST_TRACKS_PAGE_SIZE,
+                        transform=controller.format_playlist_track
+                    )]
+
+            await asyncio.gather(*(fetch_tracks(playlist) for playlist in changed))
+            for playlist in playlists:
+                if "tracks" not in playlist:
+                    playlist["tracks"] = stored[playlist["id"]]["tracks"]
+
+            saved_tracks, unavailable, saved_refetched = await self._sync_saved_tracks(
+                controller, [] if full else self.data["saved_tracks"],
+                self.data.get("saved_tracks_unavailable", 0)
+            )
+
+            self.data = {
+                "version": INDEX_VERSION,
+                "synced_at": time.time(),
+                "playlists": {playlist["id"]: playlist for playlist in playlists},
+                "saved_tracks": saved_tracks,
+                "saved_tracks_unavailable": unavailable
+            }
+            self._choices = None
+            self.save()
+
+            return {
+                "playlists": len(playlists),
+                "playlists_refetched": len(changed),
+                "playlist_tracks": sum(len(playlist["tracks"]) for playlist in playlists),
+                "saved_tracks": len(saved_tracks),
+                "saved_tracks_refetched": saved_refetched,
+                "duration_seconds": round(time.perf_counter() - start, 2)
+            }
+
+    async def _sync_saved_tracks(self, controller: SpotifyController, stored: List[Dict[str, Any]],
+                                 unavailable: int) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Update the saved tracks, newest first.
+
+        Returns (tracks, unavailable, whether everything was refetched), where
+        unavailable counts saved items without a playable track: they are not
+        indexed but still count towards Spotify's total.
+
+        Saved tracks come back newest first, so new saves are read until the
+        first already indexed track. The list is refetched if tracks were removed:
+        when what follows the new saves on that page (ids and added_at) differs
+        from the head of the indexed list, or the count disagrees with Spotify's total.
+        """
+        async def fetch_all() -> Tuple[List[Dict[str, Any]], int, bool]:
+            skipped = 0
+
+            def transform(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                nonlocal skipped
+                track = controller.format_playlist_track(item)
+                if track is None:
+                    skipped += 1
+                return track
+
+            tracks = [track async for track in iter_paginated(
+                controller.saved_tracks_page, SAVED_TRACKS_PAGE_SIZE, transform=transform
+            )]
+            return sorted(tracks, key=lambda track: track["added_at"], reverse=True), skipped, True
+
+        if not stored:
+            return await fetch_all()
+
+        known = {_saved_key(track) for track in stored}
+        new_tracks: List[Dict[str, Any]] = []
+        head: List[Tuple[str, str]] = []  # already indexed tracks following the new saves
+        offset = 0
+        while True:
+            page = await run_blocking(controller.saved_tracks_page, offset, SAVED_TRACKS_PAGE_SIZE)
+            for item in page.get("items") or []:
+                track = controller.format_playlist_track(item)
+                if track is None:
+                    if not head:
+                        unavailable += 1  # new since the last sync
+                    continue
+                if head or _saved_key(track) in known:
+                    head.append(_saved_key(track))
+                else:
+                    new_tracks.append(track)
+            offset += SAVED_TRACKS_PAGE_SIZE
+            if head or offset >= (page.get("total") or 0):
+                break
+
+        merged = new_tracks + stored
+        if head != [_saved_key(track) for track in stored[:len(head)]] or len(merged) + unavailable != page.get("total"):
+            return await fetch_all()
+        return merged, unavailable, False
+
+    def _build_choices(self) -> Dict[str, Tuple[List[str], List[Dict[str, Any]]]]:
+        """Precompute normalized search strings so lookups only process the query."""
+        if self._choices is not None:
+            return self._choices
+
+        playlists = []
+        tracks: Dict[str, Dict[str, Any]] = {}
+        for playlist in self.data["playlists"].values():
+            playlists.append({key: value for key, value in playlist.items() if key != "tracks"})
+            for track in playlist["tracks"]:
+                entry = tracks.setdefault(_track_identity(track), dict(track, playlists=[], saved=False))
+                entry["playlists"].append(playlist["name"])
+        for track in self.data["saved_tracks"]:
+            tracks.setdefault(_track_identity(track), dict(track, playlists=[], saved=False))["saved"] = True
+        for entry in tracks.values():
+            entry.pop("added_at", None)
+
+        track_list = list(tracks.values())
+        self._choices = {
+            "playlists": ([utils.default_process(p["name"]) for p in playlists], playlists),
+            "tracks": ([utils.default_process(f"{t['name']} {t['artist']}") for t in track_list], track_list)
+        }
+        return self._choices
+
+    def search(self, query: str, kind: str = "all", limit: int = 10, threshold: float = 60) -> Dict[str, Any]:
+        """
+        Fuzzy search indexed playlists by name and tracks by name and artist.
+
+        Results carry a 0-100 similarity score and are sorted best first.
+        """
+        self.load()
+        choices = self._build_choices()
+        processed_query = utils.default_process(query)
+
+        results: Dict[str, Any] = {"synced_at": self.data["synced_at"]}
+        for key, wanted in (("playlists", "playlist"), ("tracks", "track")):
+            if kind not in ("all", wanted):
+                continue
+            strings, items = choices[key]
+            matches = process.extract(processed_query, strings, scorer=fuzz.WRatio, processor=None,
+                                      limit=limit, score_cutoff=threshold)
+            results[key] = [dict(items[index], score=round(score, 1)) for _, score, index in matches]
+        return results
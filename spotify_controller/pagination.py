@@ -0,0 +1,70 @@
+"""
+Concurrent pagination over Spotify's offset-paged endpoints.
+
+The first page tells us `total`, so the remaining offsets are known up front
+and can be fetched concurrently (bounded by SPOTIFY_PAGE_CONCURRENCY) instead
+of following `next` one page at a time. Items are streamed as pages arrive.
+"""
+import os
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from .executor import run_blocking
+
+# fetch_page(offset, limit) -> a Spotify paging object with "items" and "total"
+PageFetcher = Callable[[int, int], Dict[str, Any]]
+
+
+def project(item: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Keep only the requested keys of an item, or all of them if fields is empty."""
+    if not fields:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+async def iter_paginated(
+    fetch_page: PageFetcher,
+    page_size: int,
+    concurrency: Optional[int] = None,
+    transform: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield every item of a paged endpoint, fetching pages after the first concurrently.
+
+    Items are yielded in page arrival order, so pages may interleave out of
+    offset order. transform is applied to each raw item; items it maps to None
+    are skipped.
+    """
+    if concurrency is None:
+        concurrency = int(os.getenv("SPOTIFY_PAGE_CONCURRENCY", "4"))
+
+    first = await run_blocking(fetch_page, 0, page_size)
+    offsets = iter(range(page_size, first.get("total") or 0, page_size))
+    pending = set()
+
+    def launch_next() -> None:
+        offset = next(offsets, None)
+        if offset is not None:
+            pending.add(asyncio.ensure_future(run_blocking(fetch_page, offset, page_size)))
+
+    for _ in range(max(1, concurrency)):
+        launch_next()
+
+    try:
+        page = first
+        while True:
+            for item in page.get("items") or []:
+                item = transform(item) if transform else item
+                if item is not None:
+                    yield item
+            if not pending:
+                return
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            task = done.pop()
+            pending.discard(task)
+            launch_next()
+            page = task.result()
+    finally:
+        # The consumer stopped early or a page failed: don't leave fetches running
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,97 @@
+"""
+Pool of SpotifyControllers for serving several Spotify accounts from one process.
+
+Each account gets its own controller - token, state and search caches,
+per-device command scheduling - created on first use. Controllers idle for
+longer than idle_timeout, or beyond max_size, are closed least recently used
+first. All of them share the app-wide request budget and HTTP connections.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .controller import SpotifyController
+from .executor import get_executor
+
+# Account names end up in file names, so keep them to safe characters
+ACCOUNT_PATTERN = re.compile(r"^[A-Za-z0-9_.@-]+$")
+
+
+def validate_account(account: str) -> str:
+    """Return the account name, or raise ValueError if it can't be used in a file name."""
+    if not ACCOUNT_PATTERN.match(account) or account in (".", ".."):
+        raise ValueError(f"Invalid Spotify account name: {account!r}")
+    return account
+
+
+class ControllerPool:
+    """LRU pool of controllers keyed by account name."""
+
+    def __init__(self, factory: Callable[[str], SpotifyController], max_size: int = 32,
+                 idle_timeout: float = 1800.0, on_evict: Optional[Callable[[str], None]] = None):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self._controllers: "OrderedDict[str, SpotifyController]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, account: str) -> SpotifyController:
+        """Get the account's controller, creating it on first use."""
+        validate_account(account)
+        with self._lock:
+            now = time.monotonic()
+            evicted = self._evict_idle(now)
+            controller = self._controllers.get(account)
+            if controller is None:
+                controller = self._controllers[account] = self.factory(account)
+                self.created += 1
+            self._controllers.move_to_end(account)
+            self._last_used[account] = now
+            while len(self._controllers) > self.max_size:
+                evicted.append(self._pop(next(iter(self._controllers))))
+        self._close(evicted)
+        return controller
+
+    def peek(self, account: str) -> Optional[SpotifyController]:
+        """The account's controller if one is live, without creating it or marking it used."""
+        with self._lock:
+            return self._controllers.get(account)
+
+    def accounts(self) -> List[str]:
+        """Accounts with a live controller, least recently used first."""
+        with self._lock:
+            return list(self._controllers)
+
+    def close(self):
+        """Close every controller."""
+        with self._lock:
+            evicted = [self._pop(account) for account in list(self._controllers)]
+        self._close(evicted)
+
+    def _evict_idle(self, now: float) -> List[Tuple[str, SpotifyController]]:
+        """Caller holds the lock."""
+        evicted = []
+        for account in list(self._controllers):
+            if now - self._last_used[account] < self.idle_timeout:
+                break  # LRU order: everything after this was used more recently
+            evicted.append(self._pop(account))
+        return evicted
+
+    def _pop(self, account: str) -> Tuple[str, SpotifyController]:
+        """Caller holds the lock."""
+        self._last_used.pop(account, None)
+        self.evicted += 1
+        return account, self._controllers.pop(account)
+
+    def _close(self, evicted: List[Tuple[str, SpotifyController]]):
+        for account, controller in evicted:
+            if self.on_evict is not None:
+                self.on_evict(account)
+            # Closing sends pending commands, which is network I/O: keep it off the caller's thread
+            get_executor().submit(controller.close)
@@ -0,0 +1,259 @@
+"""
+Shared scheduler for every Spotify Web API request.
+
+Spotify rate limits per app over a rolling 30 second window and answers 429
+with a Retry-After header. Spotipy normally retries those inside urllib3,
+invisibly and per call, so concurrent callers keep hammering the API while
+one of them backs off. Here every request takes a slot from one shared
+budget instead:
+
+- a 429 blocks all callers until Retry-After has passed, then the request is retried
+- the budget adapts: it is halved on a 429 and creeps back up on success
+- interactive requests (playback control, state, search) go first; bulk reads
+  (pagination, library sync) wait while interactive requests are queued and
+  leave part of the budget free for them
+"""
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+import spotipy
+from requests.adapters import HTTPAdapter
+from spotipy.exceptions import SpotifyException
+from urllib3.util.retry import Retry
+
+INTERACTIVE = 0
+BULK = 1
+
+# Statuses spotipy still retries itself; 429 is left to the scheduler
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class RateLimited(Exception):
+    """Spotify asked us to back off for longer than we are willing to wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Spotify rate limit exceeded, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RequestScheduler:
+    """
+    Rolling-window request budget with Retry-After handling and two priorities.
+
+    budget is the most requests allowed per window; bulk requests may use
+    bulk_share of it. A Retry-After longer than max_wait fails fast with
+    RateLimited rather than stalling the caller.
+    """
+
+    def __init__(self, budget: int = 90, window: float = 30.0, bulk_share: float = 0.7,
+                 min_budget: int = 5, max_retries: int = 3, max_wait: float = 60.0):
+        self.max_budget = budget
+        self.min_budget = min(min_budget, budget)
+        self.window = window
+        self.bulk_share = bulk_share
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.limit = float(budget)
+        self._sent: deque = deque()  # monotonic send times within the window
+        self._blocked_until = 0.0
+        self._waiting: List[int] = [0, 0]  # waiters per priority
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._metrics = {"requests": 0, "bulk_requests": 0, "rate_limited": 0, "retries": 0,
+                         "rejected": 0, "delayed": 0, "wait_seconds": 0.0}
+
+    @contextmanager
+    def bulk(self) -> Iterator[None]:
+        """Run the requests made by this thread inside the block at bulk priority."""
+        previous = getattr(self._local, "priority", INTERACTIVE)
+        self._local.priority = BULK
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Make one Spotify request through the budget, retrying 429s after Retry-After."""
+        priority = getattr(self._local, "priority", INTERACTIVE)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority)
+            try:
+                result = func(*args, **kwargs)
+            except SpotifyException as e:
+                if not self._is_rate_limit(e):
+                    raise
+                retry_after = self._retry_after(e, attempt)
+                self._throttled(retry_after)
+                if attempt == self.max_retries or retry_after > self.max_wait:
+                    raise RateLimited(retry_after) from e
+                with self._cond:
+                    self._metrics["retries"] += 1
+                continue
+            self._succeeded()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Throttling metrics since startup, plus the current budget."""
+        with self._cond:
+            now = time.monotonic()
+            self._expire(now)
+            return dict(
+                self._metrics,
+                wait_seconds=round(self._metrics["wait_seconds"], 2),
+                budget=round(self.limit, 1),
+                max_budget=self.max_budget,
+                window_seconds=self.window,
+                in_window=len(self._sent),
+                blocked_for=round(max(0.0, self._blocked_until - now), 2),
+                waiting_interactive=self._waiting[INTERACTIVE],
+                waiting_bulk=self._waiting[BULK]
+            )
+
+    @staticmethod
+    def _is_rate_limit(e: SpotifyException) -> bool:
+        """
+        Whether Spotify really answered 429.
+
+        spotipy also reports its own 5xx retries running out as a 429, without
+        headers and with "Max Retries" in the message; that is a server error,
+        not a reason to throttle every caller.
+        """
+        if e.http_status != 429:
+            return False
+        return bool(e.headers) or "Max Retries" not in str(e.msg)
+
+    @staticmethod
+    def _retry_after(e: SpotifyException, attempt: int) -> float:
+        try:
+            return max(0.0, float((e.headers or {}).get("Retry-After")))
+        except (TypeError, ValueError):
+            # A 429 without a usable Retry-After header: back off exponentially
+            return float(2 ** attempt)
+
+    def _expire(self, now: float) -> None:
+        """Caller holds the lock."""
+        while self._sent and self._sent[0] <= now - self.window:
+            self._sent.popleft()
+
+    def _delay(self, priority: int, now: float) -> Optional[float]:
+        """Seconds until this priority may send, 0 to send now, None to wait for a notify."""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if priority == BULK and self._waiting[INTERACTIVE]:
+            return None
+        self._expire(now)
+        allowed = max(1, int(self.limit * (self.bulk_share if priority == BULK else 1.0)))
+        if len(self._sent) < allowed:
+            return 0.0
+        # Wait until enough of the window has rolled off to get under the allowance
+        return self._sent[len(self._sent) - allowed] + self.window - now
+
+    def _acquire(self, priority: int) -> None:
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._blocked_until - now > self.max_wait:
+                        self._metrics["rejected"] += 1
+                        raise RateLimited(self._blocked_until - now)
+                    delay = self._delay(priority, now)
+                    if delay is not None and delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                self._sent.append(now)
+                self._metrics["requests"] += 1
+                if priority == BULK:
+                    self._metrics["bulk_requests"] += 1
+                waited = now - start
+                if waited > 0.001:
+                    self._metrics["delayed"] += 1
+                    self._metrics["wait_seconds"] += waited
+            finally:
+                self._waiting[priority] -= 1
+                # Bulk waiters may be free to go now that an interactive request has its slot
+                self._cond.notify_all()
+
+    def _throttled(self, retry_after: float) -> None:
+        with self._cond:
+            self._metrics["rate_limited"] += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self.limit = max(float(self.min_budget), self.limit / 2)
+        print(f"Spotify rate limited: pausing requests for {retry_after:.1f}s, "
+              f"budget now {self.limit:.0f} per {self.window:.0f}s")
+
+    def _succeeded(self) -> None:
+        with self._cond:
+            if self.limit < self.max_budget:
+                # Additive increase: about one more request per window for each window of successes
+                self.limit = min(float(self.max_budget), self.limit + 1 / self.limit)
+
+
+class ScheduledSpotify(spotipy.Spotify):
+    """Spotipy client whose API requests all go through a RequestScheduler."""
+
+    def __init__(self, *args: Any, scheduler: RequestScheduler, **kwargs: Any):
+        kwargs.setdefault("status_forcelist", RETRY_STATUSES)
+        self._owns_session = not isinstance(kwargs.get("requests_session"), requests.Session)
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    def __del__(self):
+        # spotipy closes its session on collection; a shared one must outlive this client
+        if getattr(self, "_owns_session", True):
+            super().__del__()
+
+    def _internal_call(self, method, url, payload, params):
+        return self.scheduler.call(super()._internal_call, method, url, payload, params)
+
+
+_scheduler: Optional[RequestScheduler] = None
+_http_session: Optional[requests.Session] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the HTTP session shared by all clients, so accounts reuse pooled connections to Spotify.
+
+    Retries match what spotipy configures for its own sessions, minus 429.
+    """
+    global _http_session
+    with _scheduler_lock:
+        if _http_session is None:
+            retry = Retry(
+                total=spotipy.Spotify.max_retries,
+                connect=None,
+                read=False,
+                allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+                status=spotipy.Spotify.max_retries,
+                backoff_factor=0.3,
+                status_forcelist=RETRY_STATUSES
+            )
+            # One connection per worker thread is enough; more would sit idle
+            pool_size = int(os.getenv("SPOTIFY_MAX_WORKERS", "4"))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            _http_session = requests.Session()
+            _http_session.mount("https://", adapter)
+            _http_session.mount("http://", adapter)
+        return _http_session
+
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get the process-wide scheduler; Spotify's limit is per app, so all clients share it."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                budget=int(os.getenv("SPOTIFY_RATE_LIMIT", "90")),
+                window=float(os.getenv("SPOTIFY_RATE_LIMIT_WINDOW", "30")),
+                max_wait=float(os.getenv("SPOTIFY_MAX_RETRY_WAIT", "60"))
+            )
+        return _scheduler
@@ -1,114 +1,328 @@
 import os
-from typing import Annotated, Optional, Dict, Any, List
+import asyncio
+from typing import Annotated, Optional, Dict, Any, List, AsyncIterator
 from pydantic import Field
-from .controller import SpotifyController
+from .controller import SpotifyController, PLAYLISTS_PAGE_SIZE, PLAYLIST_TRACKS_PAGE_SIZE
+from .executor import run_blocking
+from .pagination import iter_paginated, project
+from .library_index import LibraryIndex
+from .rate_limit import get_request_scheduler, get_http_session
+from .pool import ControllerPool
 
-# Global controller instance
+# Global controller instance for the default account, plus a pool for named accounts
 _spotify_controller = None
+_controller_pool = None
+_library_indexes: Dict[Optional[str], LibraryIndex] = {}
 
 def reset_controller():
-    """Reset the global controller instance."""
-    global _spotify_controller
+    """Reset the global controller instance and close any pooled account controllers."""
+    global _spotify_controller, _controller_pool
     _spotify_controller = None
+    if _controller_pool is not None:
+        _controller_pool.close()
+        _controller_pool = None
+
+def _account_path(path: str, account: Optional[str]) -> str:
+    """Per-account variant of a file path: .cache -> .cache-alice, index.json -> index-alice.json."""
+    if account is None or not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{account}{ext}"
+
+def _create_controller(account: Optional[str] = None) -> SpotifyController:
+    """Create a controller from the environment, using the account's own token cache file."""
+    client_id = os.getenv("SPOTIFY_CLIENT_ID")
+    client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
+    redirect_uri = os.getenv("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8888/callback")
+    cache_path = _account_path(os.getenv("SPOTIFY_CACHE_PATH", ".cache"), account)
+    state_cache_ttl = float(os.getenv("SPOTIFY_STATE_CACHE_TTL", "1.0"))
+    search_cache_ttl = float(os.getenv("SPOTIFY_SEARCH_CACHE_TTL", "300"))
+    search_cache_size = int(os.getenv("SPOTIFY_SEARCH_CACHE_SIZE", "256"))
+    command_debounce = float(os.getenv("SPOTIFY_COMMAND_DEBOUNCE", "0.25"))
+    token_refresh_lead = float(os.getenv("SPOTIFY_TOKEN_REFRESH_LEAD", "300"))
+    watch_interval = float(os.getenv("SPOTIFY_WATCH_INTERVAL", "5"))
+    watch_idle_interval = float(os.getenv("SPOTIFY_WATCH_IDLE_INTERVAL", "15"))
+    
+    if not client_id or not client_secret:
+        raise ValueError("SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables are required")
+    
+    return SpotifyController(client_id, client_secret, redirect_uri, cache_path=cache_path,
+                             state_cache_ttl=state_cache_ttl,
+                             search_cache_ttl=search_cache_ttl,
+                             search_cache_size=search_cache_size,
+                             command_debounce=command_debounce,
+                             token_refresh_lead=token_refresh_lead,
+                             requests_session=get_http_session(),
+                             watch_interval=watch_interval,
+                             watch_idle_interval=watch_idle_interval)
+
+def _get_pool() -> ControllerPool:
+    """Get or create the pool of named account controllers."""
+    global _controller_pool
+    if _controller_pool is None:
+        _controller_pool = ControllerPool(
+            _create_controller,
+            max_size=int(os.getenv("SPOTIFY_POOL_SIZE", "32")),
+            idle_timeout=float(os.getenv("SPOTIFY_POOL_IDLE_TIMEOUT", "1800")),
+            on_evict=lambda account: _library_indexes.pop(account, None)
+        )
+    return _controller_pool
 
-def _get_controller() -> SpotifyController:
-    """Get or create the Spotify controller instance."""
+def _get_controller(account: Optional[str] = None) -> SpotifyController:
+    """Get or create the Spotify controller for an account (None for the default account)."""
     global _spotify_controller
+    if account is not None:
+        return _get_pool().get(account)
     if _spotify_controller is None:
-        client_id = os.getenv("SPOTIFY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        redirect_uri = os.getenv("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8888/callback")
-        cache_path = os.getenv("SPOTIFY_CACHE_PATH", ".cache")
-        
-        if not client_id or not client_secret:
-            raise ValueError("SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables are required")
-        
-        _spotify_controller = SpotifyController(client_id, client_secret, redirect_uri, cache_path=cache_path)
-    
+        _spotify_controller = _create_controller()
     return _spotify_controller
 
-async def get_current_playback() -> Optional[Dict[str, Any]]:
+def _get_library_index(account: Optional[str] = None) -> LibraryIndex:
+    """Get or create the local library index for an account."""
+    if account not in _library_indexes:
+        path = os.getenv("SPOTIFY_LIBRARY_INDEX_PATH", ".spotify_library.json")
+        _library_indexes[account] = LibraryIndex(_account_path(path, account))
+    return _library_indexes[account]
+
+async def get_current_playback(
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> Optional[Dict[str, Any]]:
     """Get information about what's currently playing on Spotify."""
-    controller = _get_controller()
-    return controller.get_current_playback()
+    controller = _get_controller(account)
+    return await run_blocking(controller.get_current_playback)
 
 async def search_spotify(
     query: Annotated[str, Field(description="Search query for tracks, artists, albums, or playlists")],
-    search_type: Annotated[str, Field(description="Type of search: 'track', 'artist', 'album', or 'playlist'")] = "track",
-    limit: Annotated[int, Field(description="Number of results to return (1-50)", ge=1, le=50)] = 10
+    search_type: Annotated[str, Field(description="Type of search: 'track', 'artist', 'album', or 'playlist', or several comma-separated (e.g. 'track,artist')")] = "track",
+    limit: Annotated[int, Field(description="Number of results to return per type (1-50)", ge=1, le=50)] = 10,
+    market: Annotated[Optional[str], Field(description="ISO 3166-1 alpha-2 country code to restrict results to (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> Dict[str, Any]:
     """Search Spotify for music content."""
-    controller = _get_controller()
-    return controller.search_spotify(query, search_type, limit)
+    controller = _get_controller(account)
+    return await run_blocking(controller.search_spotify, query, search_type, limit, market)
 
 async def play_track(
     track_uri: Annotated[str, Field(description="Spotify URI of the track to play (e.g., spotify:track:4iV5W9uYEdYUVa79Axb7Rh)")],
-    device_id: Annotated[Optional[str], Field(description="ID of the device to play on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to play on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
     """Play a specific track on Spotify."""
-    controller = _get_controller()
-    return controller.play_track(track_uri, device_id)
+    controller = _get_controller(account)
+    return await run_blocking(controller.play_track, track_uri, device_id)
 
 async def play_playlist(
     playlist_uri: Annotated[str, Field(description="Spotify URI of the playlist to play (e.g., spotify:playlist:37i9dQZF1DXcBWIGoYBM5M)")],
-    device_id: Annotated[Optional[str], Field(description="ID of the device to play on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to play on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
     """Play a specific playlist on Spotify."""
-    controller = _get_controller()
-    return controller.play_playlist(playlist_uri, device_id)
+    controller = _get_controller(account)
+    return await run_blocking(controller.play_playlist, playlist_uri, device_id)
 
 async def pause_playback(
-    device_id: Annotated[Optional[str], Field(description="ID of the device to pause (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to pause (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
     """Pause the current Spotify playback."""
-    controller = _get_controller()
-    return controller.pause_playback(device_id)
+    controller = _get_controller(account)
+    return await run_blocking(controller.pause_playback, device_id)
 
 async def resume_playback(
-    device_id: Annotated[Optional[str], Field(description="ID of the device to resume playback on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to resume playback on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
     """Resume the current Spotify playback."""
-    controller = _get_controller()
-    return controller.resume_playback(device_id)
+    controller = _get_controller(account)
+    return await run_blocking(controller.resume_playback, device_id)
 
 async def next_track(
-    device_id: Annotated[Optional[str], Field(description="ID of the device to skip track on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to skip track on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
-    """Skip to the next track on Spotify."""
-    controller = _get_controller()
-    return controller.next_track(device_id)
+    """Skip to the next track on Spotify. With SPOTIFY_COMMAND_DEBOUNCE set, True means the command was queued and is sent shortly after; a later failure shows up in get_api_stats (commands.failed, commands.last_error)."""
+    controller = _get_controller(account)
+    return await run_blocking(controller.next_track, device_id)
 
 async def previous_track(
-    device_id: Annotated[Optional[str], Field(description="ID of the device to go to previous track on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to go to previous track on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
-    """Go to the previous track on Spotify."""
-    controller = _get_controller()
-    return controller.previous_track(device_id)
+    """Go to the previous track on Spotify. With SPOTIFY_COMMAND_DEBOUNCE set, True means the command was queued and is sent shortly after; a later failure shows up in get_api_stats (commands.failed, commands.last_error)."""
+    controller = _get_controller(account)
+    return await run_blocking(controller.previous_track, device_id)
 
 async def set_volume(
     volume_percent: Annotated[int, Field(description="Volume level from 0 to 100", ge=0, le=100)],
-    device_id: Annotated[Optional[str], Field(description="ID of the device to set volume on (optional)")] = None
+    device_id: Annotated[Optional[str], Field(description="ID of the device to set volume on (optional)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
-    """Set the volume for Spotify playback."""
-    controller = _get_controller()
-    return controller.set_volume(volume_percent, device_id)
+    """Set the volume for Spotify playback. With SPOTIFY_COMMAND_DEBOUNCE set, True means the command was queued and is sent shortly after; a later failure shows up in get_api_stats (commands.failed, commands.last_error)."""
+    controller = _get_controller(account)
+    return await run_blocking(controller.set_volume, volume_percent, device_id)
 
 async def get_user_playlists(
-    limit: Annotated[int, Field(description="Number of playlists to return (1-50)", ge=1, le=50)] = 20
+    limit: Annotated[int, Field(description="Number of playlists to return (1-50)", ge=1, le=50)] = 20,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> List[Dict[str, Any]]:
     """Get the current user's Spotify playlists."""
-    controller = _get_controller()
-    return controller.get_user_playlists(limit)
+    controller = _get_controller(account)
+    return await run_blocking(controller.get_user_playlists, limit)
 
-async def get_available_devices() -> List[Dict[str, Any]]:
+async def get_available_devices(
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> List[Dict[str, Any]]:
     """Get all available Spotify devices for playback."""
-    controller = _get_controller()
-    return controller.get_available_devices()
+    controller = _get_controller(account)
+    return await run_blocking(controller.get_available_devices)
 
 async def transfer_playback(
     device_id: Annotated[str, Field(description="ID of the device to transfer playback to")],
-    force_play: Annotated[bool, Field(description="Whether to start playing immediately after transfer")] = False
+    force_play: Annotated[bool, Field(description="Whether to start playing immediately after transfer")] = False,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
 ) -> bool:
-    """Transfer Spotify playback to a different device."""
-    controller = _get_controller()
-    return controller.transfer_playback(device_id, force_play) 
\ No newline at end of file
+    """Transfer Spotify playback to a different device. With SPOTIFY_COMMAND_DEBOUNCE set, True means the command was queued and is sent shortly after; a later failure shows up in get_api_stats (commands.failed, commands.last_error)."""
+    controller = _get_controller(account)
+    return await run_blocking(controller.transfer_playback, device_id, force_play) 
+
+async def iter_user_playlists(fields: Optional[List[str]] = None,
+                              account: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream all of the current user's playlists as their pages arrive.
+
+    Pages after the first are fetched concurrently, so playlists are not in
+    library order. fields limits each playlist to the given keys.
+    """
+    controller = _get_controller(account)
+    async for playlist in iter_paginated(
+        controller.user_playlists_page,
+        PLAYLISTS_PAGE_SIZE,
+        transform=lambda item: project(controller.format_playlist(item), fields)
+    ):
+        yield playlist
+
+async def iter_playlist_tracks(playlist_id: str, fields: Optional[List[str]] = None,
+                               account: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream every track of a playlist as its pages arrive.
+
+    Pages after the first are fetched concurrently, so tracks are not in
+    playlist order. fields limits each track to the given keys.
+    """
+    controller = _get_controller(account)
+
+    def transform(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        track = controller.format_playlist_track(item)
+        return project(track, fields) if track else None
+
+    async for track in iter_paginated(
+        lambda offset, limit: controller.playlist_tracks_page(playlist_id, offset, limit),
+        PLAYLIST_TRACKS_PAGE_SIZE,
+        transform=transform
+    ):
+        yield track
+
+async def get_all_user_playlists(
+    fields: Annotated[Optional[List[str]], Field(description="Playlist fields to return, e.g. ['name', 'uri'] (optional, default all)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> List[Dict[str, Any]]:
+    """Get all of the current user's Spotify playlists, however many there are."""
+    try:
+        return [playlist async for playlist in iter_user_playlists(fields, account)]
+    except Exception as e:
+        print(f"Error getting playlists: {e}")
+        return []
+
+async def get_all_playlist_tracks(
+    playlist_id: Annotated[str, Field(description="ID or URI of the playlist")],
+    fields: Annotated[Optional[List[str]], Field(description="Track fields to return, e.g. ['name', 'artist', 'uri'] (optional, default all)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> List[Dict[str, Any]]:
+    """Get every track in a Spotify playlist, however long it is."""
+    try:
+        return [track async for track in iter_playlist_tracks(playlist_id, fields, account)]
+    except Exception as e:
+        print(f"Error getting playlist tracks: {e}")
+        return []
+
+async def sync_library(
+    full: Annotated[bool, Field(description="Refetch everything instead of only playlists and saved tracks that changed")] = False,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> Dict[str, Any]:
+    """Update the local index of the user's playlists and saved tracks used by search_library."""
+    try:
+        return await _get_library_index(account).sync(_get_controller(account), full=full)
+    except Exception as e:
+        print(f"Error syncing library: {e}")
+        return {}
+
+async def search_library(
+    query: Annotated[str, Field(description="Playlist name, or track name and/or artist, to look for in the user's library")],
+    search_type: Annotated[str, Field(description="What to search: 'playlist', 'track', or 'all'")] = "all",
+    limit: Annotated[int, Field(description="Maximum results per type (1-50)", ge=1, le=50)] = 10,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> Dict[str, Any]:
+    """Fuzzy search the user's own playlists and saved/playlist tracks locally, without a Spotify search."""
+    index = _get_library_index(account)
+    if index.synced_at is None:
+        # First use: build the index once, later searches are served locally
+        await sync_library(account=account)
+    return index.search(query, search_type, limit)
+
+async def watch_playback(account: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream playback change events for an account until the caller stops iterating.
+
+    Each event has a "type" (playback_started, playback_stopped, track_changed,
+    paused, resumed, seeked, device_changed, shuffle_changed, repeat_changed),
+    the new "state" as returned by get_current_playback, and a "timestamp".
+    """
+    stream = _get_controller(account).watch_playback()
+    try:
+        async for event in stream:
+            yield event
+    finally:
+        # Unsubscribe now rather than whenever the inner generator is collected
+        await stream.aclose()
+
+async def wait_for_playback_change(
+    timeout: Annotated[float, Field(description="Seconds to wait for a change (1-600)", ge=1, le=600)] = 60,
+    event_types: Annotated[Optional[List[str]], Field(description="Only return these event types, e.g. ['track_changed', 'playback_stopped'] (optional, default any change)")] = None,
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> Optional[Dict[str, Any]]:
+    """Wait until Spotify playback changes (track changed, paused, resumed, stopped, ...) and return the change, or None on timeout."""
+    stream = watch_playback(account)
+
+    async def next_event() -> Dict[str, Any]:
+        async for event in stream:
+            if not event_types or event["type"] in event_types:
+                return event
+
+    try:
+        return await asyncio.wait_for(next_event(), timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        await stream.aclose()
+
+async def get_api_stats(
+    account: Annotated[Optional[str], Field(description="Account to act for, when serving several Spotify users (optional, default account)")] = None
+) -> Dict[str, Any]:
+    """Get Spotify API throttling metrics: request budget, rate limits hit, queueing delays, coalesced commands and deferred commands that failed."""
+    stats = {"requests": get_request_scheduler().stats()}
+    if account is None:
+        controller = _spotify_controller
+    else:
+        # Only a live controller: reading stats must not log an account in or evict another
+        controller = _controller_pool.peek(account) if _controller_pool is not None else None
+    if controller is not None:
+        stats["commands"] = controller.commands.stats()
+    elif account is not None:
+        stats["commands"] = f"no controller for account '{account}'"
+    if _controller_pool is not None:
+        stats["accounts"] = {
+            "active": len(_controller_pool.accounts()),
+            "created": _controller_pool.created,
+            "evicted": _controller_pool.evicted
+        }
+    return stats
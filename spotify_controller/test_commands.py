@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test debouncing, coalescing and deferred failures in the command scheduler.
+
+Commands are plain callables recording what would have been sent to Spotify,
+and flush() stands in for the debounce window expiring. No Spotify
+credentials are needed.
+"""
+import os
+import sys
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_controller.commands import CommandScheduler
+
+# Long enough that the timers never fire during a test; flush() sends instead
+WINDOW = 60.0
+
+
+def test_coalescing_keeps_last_value_in_issue_order():
+    """A burst of volumes sends only the last one, after commands issued before it."""
+    commands = CommandScheduler(WINDOW)
+    sent = []
+    for volume in (10, 20):
+        commands.debounce(None, "volume", lambda volume=volume: sent.append(("volume", volume)))
+    commands.debounce(None, "transfer", lambda: sent.append(("transfer", "phone")))
+    commands.debounce(None, "volume", lambda: sent.append(("volume", 30)))
+    commands.skip(None, True, lambda: sent.append(("next", 1)))
+    commands.skip(None, True, lambda: sent.append(("next", 2)))
+    commands.skip(None, False, lambda: sent.append(("previous", 1)))
+    assert sent == []
+
+    commands.flush()
+    assert sent == [("transfer", "phone"), ("volume", 30), ("next", 1)]
+    assert commands.stats()["coalesced"] == 4
+
+
+def test_deferred_failure_is_recorded():
+    """A command that fails after the caller was told it succeeded is visible in stats()."""
+    commands = CommandScheduler(WINDOW)
+    errors = []
+
+    def fail():
+        raise RuntimeError("device not found")
+
+    commands.debounce("speaker", "volume", fail, errors.append)
+    commands.debounce("speaker", "transfer", lambda: None)
+    commands.flush()
+
+    stats = commands.stats()
+    assert [str(e) for e in errors] == ["device not found"]
+    assert stats["failed"] == 1
+    assert stats["last_error"] == "volume: device not found"
+    assert stats["sent"] == 2
+
+
+if __name__ == "__main__":
+    test_coalescing_keeps_last_value_in_issue_order()
+    test_deferred_failure_is_recorded()
+    print("✅ commands are coalesced in issue order and deferred failures are recorded")
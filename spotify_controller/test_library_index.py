@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test incremental syncing of saved tracks in the library index.
+
+A stub controller serves saved-track pages from a list, so the tests can
+check which syncs are incremental and which fall back to a full refetch. No
+Spotify credentials are needed.
+"""
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_controller.controller import SpotifyController
+from spotify_controller.library_index import LibraryIndex
+
+
+def _item(track_id, added_at):
+    """A saved-track item; track_id None stands for an unavailable (null) track."""
+    if track_id is None:
+        return {"added_at": added_at, "track": None}
+    return {"added_at": added_at, "track": {
+        "id": track_id, "name": f"Song {track_id}", "uri": f"spotify:track:{track_id}",
+        "artists": [{"name": "Artist"}], "album": {"name": "Album"}
+    }}
+
+
+class SavedTracksController:
+    """Stands in for SpotifyController, serving saved tracks newest first."""
+
+    format_playlist_track = staticmethod(SpotifyController.format_playlist_track)
+
+    def __init__(self, items):
+        self.items = items
+
+    def saved_tracks_page(self, offset, limit=50):
+        return {"items": self.items[offset:offset + limit], "total": len(self.items)}
+
+
+def _sync(index, items):
+    stored = index.data["saved_tracks"]
+    tracks, unavailable, refetched = asyncio.run(
+        index._sync_saved_tracks(SavedTracksController(items), stored, index.data["saved_tracks_unavailable"])
+    )
+    index.data.update(saved_tracks=tracks, saved_tracks_unavailable=unavailable)
+    return [track["id"] for track in tracks], refetched
+
+
+def test_unavailable_tracks_keep_syncs_incremental():
+    """Null tracks are not indexed but still count towards Spotify's total."""
+    with tempfile.TemporaryDirectory() as directory:
+        index = LibraryIndex(os.path.join(directory, "library.json"))
+        library = [_item("b", "3"), _item(None, "2"), _item("c", "1")]
+
+        assert _sync(index, library) == (["b", "c"], True)
+        assert _sync(index, library) == (["b", "c"], False)
+        assert _sync(index, [_item("a", "4")] + library) == (["a", "b", "c"], False)
+
+
+def test_removed_track_triggers_refetch():
+    """Unsaving a track forces a full refetch rather than leaving it indexed."""
+    with tempfile.TemporaryDirectory() as directory:
+        index = LibraryIndex(os.path.join(directory, "library.json"))
+        assert _sync(index, [_item("b", "3"), _item("c", "2"), _item("d", "1")])[1]
+
+        # b was unsaved and e saved since
+        tracks, refetched = _sync(index, [_item("e", "5"), _item("c", "2"), _item("d", "1")])
+        assert refetched and tracks == ["e", "c", "d"]
+
+
+if __name__ == "__main__":
+    test_unavailable_tracks_keep_syncs_incremental()
+    test_removed_track_triggers_refetch()
+    print("✅ saved tracks sync incrementally and refetch on removals")
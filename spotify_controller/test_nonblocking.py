@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test that the Spotify tools do not block the event loop.
+
+Replaces the controller with one whose calls sleep like a slow Spotify round
+trip, then checks that a ticker coroutine keeps running while tools await
+those calls. No Spotify credentials are needed.
+"""
+import os
+import sys
+import time
+import asyncio
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_controller import spotify_functions
+
+SLOW_CALL_SECONDS = 0.5
+TICK_SECONDS = 0.01
+
+
+class SlowController:
+    """Stands in for SpotifyController, taking SLOW_CALL_SECONDS per blocking call."""
+
+    def get_current_playback(self):
+        time.sleep(SLOW_CALL_SECONDS)
+        return {"is_playing": True, "track_name": "Slow Song"}
+
+    def get_available_devices(self):
+        time.sleep(SLOW_CALL_SECONDS)
+        return [{"id": "device-1", "name": "Speaker"}]
+
+    def pause_playback(self, device_id=None):
+        time.sleep(SLOW_CALL_SECONDS)
+        return True
+
+
+async def _ticker(stop: asyncio.Event, ticks: list) -> None:
+    while not stop.is_set():
+        ticks.append(time.perf_counter())
+        await asyncio.sleep(TICK_SECONDS)
+
+
+async def _run_tools_with_ticker():
+    stop = asyncio.Event()
+    ticks = []
+    ticker = asyncio.create_task(_ticker(stop, ticks))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        spotify_functions.get_current_playback(),
+        spotify_functions.get_available_devices(),
+        spotify_functions.pause_playback()
+    )
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    return results, elapsed, ticks
+
+
+def test_event_loop_keeps_running():
+    """Other coroutines make progress while slow Spotify calls are in flight."""
+    previous = spotify_functions._spotify_controller
+    spotify_functions._spotify_controller = SlowController()
+    try:
+        results, elapsed, ticks = asyncio.run(_run_tools_with_ticker())
+    finally:
+        spotify_functions._spotify_controller = previous
+
+    assert results[0]["track_name"] == "Slow Song"
+    assert results[1][0]["id"] == "device-1"
+    assert results[2] is True
+
+    # Blocking calls would leave the ticker starved for the whole call
+    largest_gap = max(b - a for a, b in zip(ticks, ticks[1:]))
+    assert largest_gap < SLOW_CALL_SECONDS / 2, f"event loop stalled for {largest_gap:.3f}s"
+    assert len(ticks) >= (SLOW_CALL_SECONDS / TICK_SECONDS) / 2, f"only {len(ticks)} ticks"
+
+    # The three calls ran side by side on the pool rather than one after another
+    assert elapsed < SLOW_CALL_SECONDS * 2, f"calls took {elapsed:.2f}s"
+
+    print(f"✅ {len(ticks)} ticks during {elapsed:.2f}s of Spotify calls "
+          f"(largest gap {largest_gap * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    test_event_loop_keeps_running()
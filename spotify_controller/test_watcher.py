@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test playback change detection and watcher shutdown.
+
+diff_playback is checked against hand-built playback states, and a watcher
+polling a stub controller must end its subscriptions when stopped. No Spotify
+credentials are needed.
+"""
+import os
+import sys
+import asyncio
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_controller.watcher import PlaybackWatcher, diff_playback
+
+
+def _state(**overrides):
+    state = {
+        "is_playing": True,
+        "track_uri": "spotify:track:1",
+        "track_name": "First",
+        "artist": "Artist",
+        "album": "Album",
+        "device": "Laptop",
+        "progress_ms": 10000,
+        "duration_ms": 200000,
+        "shuffle_state": False,
+        "repeat_state": "off"
+    }
+    state.update(overrides)
+    return state
+
+
+def _types(previous, current, elapsed=5.0):
+    return [event["type"] for event in diff_playback(previous, current, elapsed)]
+
+
+def test_diff_playback():
+    """Each kind of change is reported once, and normal progress is not a change."""
+    playing = _state()
+    assert _types(None, None) == []
+    assert _types(None, playing) == ["playback_started"]
+    assert _types(playing, None) == ["playback_stopped"]
+
+    # Five seconds of playback moves progress five seconds
+    assert _types(playing, _state(progress_ms=15000)) == []
+    assert _types(playing, _state(progress_ms=90000)) == ["seeked"]
+    # While paused progress stands still
+    paused = _state(is_playing=False)
+    assert _types(paused, _state(is_playing=False)) == []
+    assert _types(playing, _state(is_playing=False, progress_ms=15000)) == ["paused"]
+    assert _types(paused, _state(progress_ms=10000)) == ["resumed"]
+
+    events = diff_playback(playing, _state(track_uri="spotify:track:2", track_name="Second", progress_ms=0), 5.0)
+    assert [event["type"] for event in events] == ["track_changed"]
+    assert events[0]["previous_track"]["track_name"] == "First"
+
+    assert _types(playing, _state(progress_ms=15000, device="Phone", shuffle_state=True,
+                                  repeat_state="track")) == ["device_changed", "shuffle_changed", "repeat_changed"]
+
+
+class IdleController:
+    """Stands in for SpotifyController with nothing playing."""
+
+    def fetch_playback(self, flush=True):
+        assert not flush, "the poller must not flush debounced commands"
+        return None
+
+
+def test_stop_ends_subscriptions():
+    """stop() wakes subscribers waiting for an event instead of leaving them hanging."""
+    async def run():
+        watcher = PlaybackWatcher(IdleController(), interval=60, idle_interval=60)
+        events = []
+
+        async def listen():
+            async for event in watcher.subscribe():
+                events.append(event)
+
+        listener = asyncio.ensure_future(listen())
+        for _ in range(500):
+            if watcher.polls:
+                break
+            await asyncio.sleep(0.01)
+        assert watcher.polls == 1
+        watcher.stop()
+        await asyncio.wait_for(listener, 5)
+        assert events == []
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_diff_playback()
+    test_stop_ends_subscriptions()
+    print("✅ playback changes are detected and stopping ends subscriptions")
@@ -0,0 +1,122 @@
+"""
+In-memory OAuth token handling for SpotifyController.
+
+Spotipy asks its cache handler for the token before every API request, and
+the default handler reads the cache file each time. When the token is close
+to expiry, that request also pays for a synchronous refresh round trip.
+TokenStore keeps the token in memory (writing changes through to the cache
+file), and TokenRefresher renews it in the background well before spotipy
+would consider it expired, so commands only ever see a fresh in-memory token.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from spotipy.cache_handler import CacheHandler
+from spotipy.oauth2 import SpotifyOAuth
+
+
+class TokenStore(CacheHandler):
+    """Spotipy cache handler that serves the token from memory, with optional write-through to a file."""
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self.changed = threading.Event()
+        self._lock = threading.Lock()
+        self._token = self._load()
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error loading Spotify token cache: {e}")
+            return None
+
+    def get_cached_token(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._token
+
+    def save_token_to_cache(self, token_info: Dict[str, Any]) -> None:
+        with self._lock:
+            self._token = token_info
+        self.changed.set()
+        if self.cache_path:
+            self._write(token_info)
+
+    def _write(self, token_info: Dict[str, Any]) -> None:
+        """Replace the cache file atomically; mkstemp creates it readable by us only."""
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".spotify-token-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(token_info, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            # The in-memory token is still valid; only persistence across restarts is lost
+            print(f"Error writing Spotify token cache: {e}")
+
+
+class TokenRefresher:
+    """
+    Daemon thread that refreshes the access token `lead` seconds before it expires.
+
+    Waits without polling while there is no token yet (e.g. before manual
+    authentication) and retries failed refreshes every retry_interval seconds.
+    """
+
+    def __init__(self, auth_manager: SpotifyOAuth, store: TokenStore, lead: float = 300.0,
+                 retry_interval: float = 30.0):
+        self.auth_manager = auth_manager
+        self.store = store
+        self.lead = lead
+        self.retry_interval = retry_interval
+        self.refreshes = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spotify-token-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.store.changed.set()
+
+    def _next_refresh_in(self, token: Optional[Dict[str, Any]]) -> Optional[float]:
+        """Seconds until the token should be refreshed, or None if there is nothing to refresh."""
+        if not token or not token.get("refresh_token") or "expires_at" not in token:
+            return None
+        # Never refresh more often than every half token lifetime, however large lead is
+        lead = min(self.lead, token.get("expires_in", 3600) / 2)
+        return token["expires_at"] - lead - time.time()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.store.changed.clear()
+            token = self.store.get_cached_token()
+            delay = self._next_refresh_in(token)
+            if delay is None or delay > 0:
+                # A new token (from authentication or an inline refresh) reschedules us
+                self.store.changed.wait(delay)
+                continue
+            try:
+                self.auth_manager.refresh_access_token(token["refresh_token"])
+                self.refreshes += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"Error refreshing Spotify token: {e}")
+                self._stop.wait(self.retry_interval)
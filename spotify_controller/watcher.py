@@ -0,0 +1,157 @@
+"""
+Playback change events from a single adaptive poller.
+
+Spotify has no push API for playback state, so changes are found by polling.
+One poller per controller serves every subscriber, so API calls don't grow
+with the number of listeners. It polls often only when a change is likely:
+just after the current track should end, less often mid-track, and rarely
+while paused or idle. Successive states are diffed and only real changes
+are delivered.
+"""
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from .executor import run_blocking
+
+# A progress jump this far from what elapsed time predicts is a seek, not drift
+SEEK_THRESHOLD_MS = 5000
+
+# Queued to every subscriber when the watcher stops, ending their iteration
+_STOPPED = object()
+
+
+def diff_playback(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]],
+                  elapsed: float) -> List[Dict[str, Any]]:
+    """
+    Describe the changes between two get_current_playback() states as events.
+
+    elapsed is the time in seconds between the two states, used to tell a
+    seek from normal progress.
+    """
+    if previous is None and current is None:
+        return []
+    if previous is None:
+        return [{"type": "playback_started"}]
+    if current is None:
+        return [{"type": "playback_stopped"}]
+
+    events = []
+    if current['track_uri'] != previous['track_uri']:
+        events.append({"type": "track_changed", "previous_track": {
+            key: previous[key] for key in ('track_uri', 'track_name', 'artist', 'album')
+        }})
+    elif current['progress_ms'] is not None and previous['progress_ms'] is not None:
+        expected = previous['progress_ms'] + (elapsed * 1000 if previous['is_playing'] else 0)
+        if abs(current['progress_ms'] - expected) > SEEK_THRESHOLD_MS:
+            events.append({"type": "seeked"})
+    if current['is_playing'] != previous['is_playing']:
+        events.append({"type": "resumed" if current['is_playing'] else "paused"})
+    if current['device'] != previous['device']:
+        events.append({"type": "device_changed", "previous_device": previous['device']})
+    if current['shuffle_state'] != previous['shuffle_state']:
+        events.append({"type": "shuffle_changed"})
+    if current['repeat_state'] != previous['repeat_state']:
+        events.append({"type": "repeat_changed"})
+    return events
+
+
+class PlaybackWatcher:
+    """
+    Shared poller that fans playback change events out to subscriber queues.
+
+    The poller runs only while someone is subscribed. A subscriber that falls
+    more than max_queue events behind loses its oldest events.
+    """
+
+    def __init__(self, controller, interval: float = 5.0, idle_interval: float = 15.0,
+                 min_interval: float = 1.0, max_queue: int = 100):
+        self.controller = controller
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.min_interval = min(min_interval, interval)
+        self.max_queue = max_queue
+        self.polls = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._state: Optional[Dict[str, Any]] = None
+
+    @property
+    def state(self) -> Optional[Dict[str, Any]]:
+        """The most recently polled playback state."""
+        return self._state
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield change events until the caller stops iterating or the watcher is stopped.
+
+        Each event has a "type", the new "state" and a "timestamp"; see
+        diff_playback for the event types.
+        """
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.ensure_future(self._poll())
+        try:
+            while True:
+                event = await queue.get()
+                if event is _STOPPED:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+    def stop(self):
+        """Stop polling and end every subscription; safe to call from any thread."""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._shutdown)
+
+    def _shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._publish(_STOPPED)
+
+    def _next_interval(self, state: Optional[Dict[str, Any]]) -> float:
+        if not state or not state['is_playing']:
+            return self.idle_interval
+        if state['duration_ms'] and state['progress_ms'] is not None:
+            # Check again just after the track should end, but never wait longer than interval
+            remaining = (state['duration_ms'] - state['progress_ms']) / 1000
+            return max(self.min_interval, min(self.interval, remaining + 0.5))
+        return self.interval
+
+    def _publish(self, event: Any):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _poll(self):
+        # The first poll only establishes the baseline
+        baseline = True
+        polled_at = time.monotonic()
+        while True:
+            try:
+                # Polling must not send debounced commands early
+                state = await run_blocking(self.controller.fetch_playback, flush=False)
+            except Exception as e:
+                # Don't report an API error as playback stopping; try again later
+                print(f"Error polling playback: {e}")
+                await asyncio.sleep(self.idle_interval)
+                continue
+            self.polls += 1
+            now = time.monotonic()
+            if not baseline:
+                for event in diff_playback(self._state, state, now - polled_at):
+                    event.update(state=state, timestamp=time.time())
+                    self._publish(event)
+            baseline = False
+            self._state, polled_at = state, now
+            await asyncio.sleep(self._next_interval(state))
@@ -0,0 +1,78 @@
+# =============================================================================
+# START OF MODULE METADATA
+# =============================================================================
+_module_info = {
+    "name": "Webhook Transport",
+    "description": "Shared pooled HTTP transport used by the webhook notifier plugins",
+    "author": "BatteryShark",
+    "version": "1.0.0",
+    "platform": "any",
+    "python_requires": ">=3.10",
+    "dependencies": ["requests"],
+    "environment_variables": {
+        "WEBHOOK_TRANSPORT_CONNECT_TIMEOUT": {
+            "description": "Webhook connect timeout in seconds",
+            "default": "5",
+            "required": False
+        },
+        "WEBHOOK_TRANSPORT_READ_TIMEOUT": {
+            "description": "Webhook read timeout in seconds",
+            "default": "10",
+            "required": False
+        },
+        "WEBHOOK_TRANSPORT_POOL_SIZE": {
+            "description": "Maximum pooled keep-alive connections per webhook host",
+            "default": "10",
+            "required": False
+        },
+        "WEBHOOK_DELIVERY_WORKERS": {
+            "description": "Concurrent deliveries per background notifier queue",
+            "default": "4",
+            "required": False
+        },
+        "WEBHOOK_DELIVERY_MAX_ATTEMPTS": {
+            "description": "Delivery attempts before a background message is marked failed",
+            "default": "3",
+            "required": False
+        },
+        "WEBHOOK_DELIVERY_BACKOFF": {
+            "description": "Base retry backoff in seconds for background deliveries (doubles per attempt)",
+            "default": "1.0",
+            "required": False
+        },
+        "WEBHOOK_DELIVERY_MAX_QUEUED": {
+            "description": "Maximum undelivered messages held per background queue",
+            "default": "1000",
+            "required": False
+        },
+        "WEBHOOK_FANOUT_WORKERS": {
+            "description": "Threads shared by notifier fan-out to multiple destinations",
+            "default": "8",
+            "required": False
+        },
+        "WEBHOOK_OUTBOX_REPLAY_INTERVAL": {
+            "description": "Seconds between durable outbox replay passes (doubles while messages keep failing)",
+            "default": "30",
+            "required": False
+        }
+    }
+}
+# =============================================================================
+# END OF MODULE METADATA
+# =============================================================================
+# =============================================================================
+# START OF EXPORTS
+# =============================================================================
+from .transport import WebhookTransport, get_transport, post_json, post_json_async
+from .delivery import DeliveryQueue, create_delivery_queue
+from .outbox import Outbox, get_outbox
+from .throttle import SUPPRESSED, NotificationThrottle, create_throttle
+from .fanout import fan_out, load_destinations, route_destinations
+
+# Library only: shared by discord_notifier and slack_notifier, provides no tools
+_module_exports = {
+    "tools": []
+}
+# =============================================================================
+# END OF EXPORTS
+# =============================================================================
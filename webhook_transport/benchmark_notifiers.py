@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the Discord and Slack notifiers.
+
+Runs send_discord_notification and send_slack_notification against a local
+stub server that mimics both webhooks: Discord's 204 responses, rate limit
+headers and 429s with retry_after, and Slack's "ok" bodies, errors and slow
+responses. Each delivery mode is measured under a burst of concurrent sends
+for messages/sec, end-to-end latency, connection reuse and message loss. No
+real webhook is contacted.
+
+Example:
+    python webhook_transport/benchmark_notifiers.py --messages 500 --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import importlib
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmark raw delivery: no dedupe/throttling and no fan-out
+for _prefix in ("DISCORD_NOTIFIER", "SLACK_NOTIFIER"):
+    for _suffix in ("DEDUPE_WINDOW", "THROTTLE_PER_MINUTE", "DESTINATIONS", "OUTBOX_PATH"):
+        os.environ.pop(f"{_prefix}_{_suffix}", None)
+    os.environ[f"{_prefix}_ENABLED"] = "true"
+
+from webhook_transport.transport import get_transport
+
+discord = importlib.import_module("discord_notifier.notifier")
+slack = importlib.import_module("slack_notifier.notifier")
+
+MODES = {
+    "sync": {"DELIVERY_MODE": "sync"},
+    "sync+outbox": {"DELIVERY_MODE": "sync", "OUTBOX": True},
+    "background": {"DELIVERY_MODE": "background"},
+    "background+coalesce": {"DELIVERY_MODE": "background", "COALESCE_WINDOW_MS": "50"},
+    "background+outbox": {"DELIVERY_MODE": "background", "OUTBOX": True}
+}
+
+
+# =============================================================================
+# STUB WEBHOOK SERVER
+# =============================================================================
+
+class StubWebhookServer:
+    """Local HTTP server standing in for Discord and Slack incoming webhooks."""
+
+    def __init__(self, discord_limit: int = 30, discord_window: float = 1.0,
+                 slack_error_fraction: float = 0.0, slack_slow_fraction: float = 0.0,
+                 slack_slow_delay: float = 1.0, latency: float = 0.0, seed: int = 1):
+        self.discord_limit = discord_limit
+        self.discord_window = discord_window
+        self.slack_error_fraction = slack_error_fraction
+        self.slack_slow_fraction = slack_slow_fraction
+        self.slack_slow_delay = slack_slow_delay
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, float]] = {}
+        self.reset()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StubWebhookServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        """Clear the counters between runs."""
+        with self._lock:
+            self.connections = 0
+            self.responses = Counter()
+            self.received: Dict[str, float] = {}  # message text -> first arrival (perf_counter)
+            self.duplicates = 0
+
+    def record(self, messages: List[str], status: int) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.responses[status] += 1
+            if status not in (200, 204):
+                return
+            for message in messages:
+                if message in self.received:
+                    self.duplicates += 1
+                else:
+                    self.received[message] = now
+
+    def discord_bucket(self, webhook: str) -> Dict[str, float]:
+        """Take one request from a webhook's bucket, Discord style."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(webhook)
+            if bucket is None or now >= bucket["reset_at"]:
+                bucket = self._buckets[webhook] = {"remaining": self.discord_limit, "reset_at": now + self.discord_window}
+            limited = bucket["remaining"] <= 0
+            if not limited:
+                bucket["remaining"] -= 1
+            return {"limited": limited, "remaining": bucket["remaining"], "reset_after": max(0.0, bucket["reset_at"] - now)}
+
+    def slack_outcome(self) -> str:
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.slack_error_fraction:
+            return "error"
+        if roll < self.slack_error_fraction + self.slack_slow_fraction:
+            return "slow"
+        return "ok"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def _reply(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+                       content_type: str = "text/plain") -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                kind = self.path.strip("/").split("/")[0]
+                if kind == "discord":
+                    self._discord(payload)
+                elif kind == "slack":
+                    self._slack(payload)
+                else:
+                    self._reply(404)
+
+            def _discord(self, payload):
+                bucket = stub.discord_bucket(self.path)
+                headers = {
+                    "X-RateLimit-Bucket": "stub-bucket",
+                    "X-RateLimit-Limit": str(stub.discord_limit),
+                    "X-RateLimit-Remaining": str(int(bucket["remaining"])),
+                    "X-RateLimit-Reset-After": f"{bucket['reset_after']:.3f}"
+                }
+                if bucket["limited"]:
+                    body = json.dumps({"message": "You are being rate limited.",
+                                       "retry_after": round(bucket["reset_after"], 3), "global": False})
+                    stub.record([], 429)
+                    self._reply(429, body.encode(), headers, "application/json")
+                    return
+                # Record before replying so a sender never sees success ahead of the count
+                stub.record([embed.get("description", "") for embed in payload.get("embeds", [])], 204)
+                self._reply(204, headers=headers)
+
+            def _slack(self, payload):
+                outcome = stub.slack_outcome()
+                if outcome == "error":
+                    stub.record([], 500)
+                    self._reply(500, b"internal_error")
+                    return
+                if outcome == "slow":
+                    time.sleep(stub.slack_slow_delay)
+                stub.record([block["text"]["text"] for block in payload.get("blocks", [])
+                             if block.get("type") == "section"], 200)
+                self._reply(200, b"ok")
+
+        return Handler
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def reset_notifier(module, drain_timeout: float = 0.0) -> None:
+    """
+    Drop a notifier's delivery queue, throttle and pooled connections so the next
+    run picks up fresh settings and opens its own connections.
+    """
+    if module._delivery_queue is not None:
+        # Undelivered messages are already reported as lost; don't also warn about them
+        delivery_logger = logging.getLogger("webhook_transport.delivery")
+        level = delivery_logger.level
+        delivery_logger.setLevel(logging.ERROR)
+        try:
+            module._delivery_queue.shutdown(timeout=drain_timeout)
+        finally:
+            delivery_logger.setLevel(level)
+    module._delivery_queue = None
+    module._throttle = None
+    get_transport().close()
+
+
+def run_mode(server: StubWebhookServer, notifier: str, mode: str, messages: int,
+             concurrency: int, drain_timeout: float, outbox_dir: str) -> Dict[str, Any]:
+    """Send a burst of `messages` through one notifier in one delivery mode and collect stats."""
+    module, prefix, send = {
+        "discord": (discord, "DISCORD_NOTIFIER", discord.send_discord_notification),
+        "slack": (slack, "SLACK_NOTIFIER", slack.send_slack_notification)
+    }[notifier]
+
+    settings = MODES[mode]
+    os.environ[f"{prefix}_WEBHOOK_URL"] = f"{server.base_url}/{notifier}/{mode}"
+    os.environ[f"{prefix}_DELIVERY_MODE"] = settings["DELIVERY_MODE"]
+    os.environ[f"{prefix}_COALESCE_WINDOW_MS"] = settings.get("COALESCE_WINDOW_MS", "0")
+    if settings.get("OUTBOX"):
+        os.environ[f"{prefix}_OUTBOX_PATH"] = os.path.join(outbox_dir, f"{notifier}-{mode}.db")
+    else:
+        os.environ.pop(f"{prefix}_OUTBOX_PATH", None)
+    server.reset()
+
+    texts = [f"{notifier} {mode} message {i}" for i in range(messages)]
+    sent_at: Dict[str, float] = {}
+    call_latencies: List[float] = []
+    returned = Counter()
+    lock = threading.Lock()
+
+    def one_send(text: str) -> None:
+        start = time.perf_counter()
+        result = send(text, title="Benchmark")
+        elapsed = time.perf_counter() - start
+        with lock:
+            sent_at[text] = start
+            call_latencies.append(elapsed)
+            returned["ok" if result else "failed"] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_send, texts))
+    calls_done = time.perf_counter()
+
+    # Wait for background deliveries, retries and outbox replays to settle
+    queue = module._delivery_queue
+    deadline = time.monotonic() + drain_timeout
+    while time.monotonic() < deadline and len(server.received) < messages:
+        outstanding = queue is not None and (
+            queue.pending() or (queue.outbox is not None and queue.outbox.pending(queue.name))
+        )
+        if not outstanding:
+            break
+        time.sleep(0.05)
+
+    with server._lock:
+        received = dict(server.received)
+        responses = dict(server.responses)
+        connections = server.connections
+        duplicates = server.duplicates
+    last_delivery = max(received.values(), default=wall_start)
+    delivery_latencies = [received[text] - sent_at[text] for text in received if text in sent_at]
+    wall = max(last_delivery, calls_done) - wall_start
+    requests_total = sum(responses.values())
+    reset_notifier(module, drain_timeout)
+
+    return {
+        "notifier": notifier,
+        "mode": mode,
+        "messages": messages,
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "delivered_per_second": len(received) / wall if wall else 0.0,
+        "call_latency_ms": {
+            "p50": percentile(call_latencies, 50) * 1000,
+            "p99": percentile(call_latencies, 99) * 1000
+        },
+        "delivery_latency_ms": {
+            "p50": percentile(delivery_latencies, 50) * 1000,
+            "p90": percentile(delivery_latencies, 90) * 1000,
+            "p99": percentile(delivery_latencies, 99) * 1000,
+            "max": max(delivery_latencies, default=0.0) * 1000
+        },
+        "http_requests": requests_total,
+        "responses": responses,
+        "connections_opened": connections,
+        "requests_per_connection": requests_total / connections if connections else 0.0,
+        "returned": dict(returned),
+        "delivered": len(received),
+        "lost": messages - len(received),
+        "duplicates": duplicates
+    }
+
+
+def run_benchmark(messages: int, concurrency: int, notifiers: List[str], modes: List[str],
+                  drain_timeout: float, **server_options: Any) -> List[Dict[str, Any]]:
+    """Run every notifier in every requested mode against one stub server."""
+    server = StubWebhookServer(**server_options).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="notifier-bench-") as outbox_dir:
+            # Start cold: nothing may be left over from importing or an earlier run
+            reset_notifier(discord)
+            reset_notifier(slack)
+            return [
+                run_mode(server, notifier, mode, messages, concurrency, drain_timeout, outbox_dir)
+                for notifier in notifiers
+                for mode in modes
+            ]
+    finally:
+        server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the webhook notifiers")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per notifier and mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent senders in the burst")
+    parser.add_argument("--notifier", choices=["discord", "slack", "all"], default="all")
+    parser.add_argument("--mode", choices=list(MODES) + ["all"], default="all")
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub server response time (s)")
+    parser.add_argument("--discord-limit", type=int, default=30, help="Discord requests per rate limit window")
+    parser.add_argument("--discord-window", type=float, default=1.0, help="Discord rate limit window (s)")
+    parser.add_argument("--slack-error-fraction", type=float, default=0.02, help="Fraction of Slack posts answered 500")
+    parser.add_argument("--slack-slow-fraction", type=float, default=0.02, help="Fraction of slow Slack responses")
+    parser.add_argument("--slack-slow-delay", type=float, default=0.5, help="Delay of slow Slack responses (s)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Max wait for queued deliveries (s)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for Slack outcomes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Keep background retries and outbox replays within the run
+    os.environ.setdefault("WEBHOOK_DELIVERY_BACKOFF", "0.1")
+    os.environ.setdefault("WEBHOOK_OUTBOX_REPLAY_INTERVAL", "1")
+
+    results = run_benchmark(
+        messages=args.messages,
+        concurrency=args.concurrency,
+        notifiers=["discord", "slack"] if args.notifier == "all" else [args.notifier],
+        modes=list(MODES) if args.mode == "all" else [args.mode],
+        drain_timeout=args.drain_timeout,
+        discord_limit=args.discord_limit,
+        discord_window=args.discord_window,
+        slack_error_fraction=args.slack_error_fraction,
+        slack_slow_fraction=args.slack_slow_fraction,
+        slack_slow_delay=args.slack_slow_delay,
+        latency=args.latency,
+        seed=args.seed
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'notifier':<8} {'mode':<20} {'msg/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'call p50':>9} "
+          f"{'reqs':>5} {'conns':>5} {'lost':>5} {'dups':>5}  responses")
+    for stats in results:
+        latency = stats["delivery_latency_ms"]
+        print(f"{stats['notifier']:<8} {stats['mode']:<20} {stats['delivered_per_second']:>8.1f} "
+              f"{latency['p50']:>8.0f} {latency['p99']:>8.0f} {stats['call_latency_ms']['p50']:>9.1f} "
+              f"{stats['http_requests']:>5} {stats['connections_opened']:>5} {stats['lost']:>5} "
+              f"{stats['duplicates']:>5}  {stats['responses']}")
+
+
+if __name__ == "__main__":
+    main()
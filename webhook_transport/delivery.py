@@ -0,0 +1,421 @@
+"""
+Background delivery queue for fire-and-forget webhook notifications.
+Messages are queued and delivered by a small pool of worker threads with
+retries, and each message can be tracked by its delivery id.
+"""
+import os
+import time
+import uuid
+import heapq
+import atexit
+import logging
+import sqlite3
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .outbox import Outbox, get_outbox
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+# pack(payloads) -> [(packed_payload, [indexes into payloads]), ...]
+Packer = Callable[[List[Any]], List[Tuple[Any, List[int]]]]
+
+
+class DeliveryQueue:
+    """
+    Deliver payloads in the background with bounded concurrency and retries.
+
+    `deliver` is called with a queued payload and must return True once the
+    webhook confirmed the message; False or an exception triggers a retry with
+    exponential backoff until max_attempts is reached. A payload that fails its
+    last attempt is passed to `on_failed`, if given.
+
+    With a coalesce_window, payloads sharing a group_key that are queued within
+    the window (up to coalesce_max of them) are handed to `pack`, which combines
+    them into as few payloads as the platform allows. Retries are never coalesced.
+
+    With an outbox, every payload is persisted before it is queued or sent and
+    removed once delivered. Anything left in the outbox (from a crash, a restart
+    or exhausted retries) is replayed by a background thread, immediately on
+    startup and then every replay_interval seconds, backing off while the
+    webhook keeps failing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        deliver: Callable[[Any], bool],
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff: float = 1.0,
+        max_queued: int = 1000,
+        history: int = 1000,
+        coalesce_window: float = 0.0,
+        coalesce_max: int = 10,
+        group_key: Optional[Callable[[Any], Hashable]] = None,
+        pack: Optional[Packer] = None,
+        outbox: Optional[Outbox] = None,
+        replay_interval: float = 30.0,
+        max_replay_interval: float = 600.0,
+        on_failed: Optional[Callable[[Any], None]] = None
+    ):
+        self.name = name
+        self.deliver = deliver
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_queued = max_queued
+        self.history = history
+        self.coalesce_window = coalesce_window if group_key and pack else 0.0
+        self.coalesce_max = max(1, coalesce_max)
+        self.group_key = group_key
+        self.pack = pack
+        self.outbox = outbox
+        self.replay_interval = replay_interval
+        self.max_replay_interval = max(replay_interval, max_replay_interval)
+        self.on_failed = on_failed
+
+        self._ready: List[Any] = []  # heap of (ready_at, seq, delivery_id)
+        self._payloads: Dict[str, Any] = {}
+        self._statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._scheduled: Dict[str, int] = {}  # delivery id -> seq of its live heap entry
+        self._windows: Dict[Hashable, Dict[str, Any]] = {}  # open coalescing windows by group key
+        self._window_of: Dict[str, Dict[str, Any]] = {}
+        self._claimed: Set[str] = set()  # outbox ids held by a sender outside the queue, not to be replayed
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._closed = False
+        self._stopping = False
+        self._cond = threading.Condition()
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"{name}-delivery-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+        if outbox is not None:
+            threading.Thread(target=self._replay_loop, name=f"{name}-outbox-replay", daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def submit(self, payload: Any) -> Optional[str]:
+        """Queue a payload for delivery. Returns its delivery id, or None if the queue is full or closed."""
+        delivery_id = uuid.uuid4().hex
+        with self._cond:
+            if not self._accepting():
+                return None
+            self._claimed.add(delivery_id)
+        try:
+            if self.outbox is not None:
+                # Persist first so a crash from here on can only cause a replay, never a loss
+                try:
+                    self.outbox.put(self.name, payload, delivery_id)
+                except sqlite3.Error as e:
+                    logger.error(f"{self.name} message not queued, could not persist it to the outbox: {e}")
+                    return None
+            with self._cond:
+                if not self._accepting():
+                    return None
+                self._enqueue(delivery_id, payload)
+                return delivery_id
+        finally:
+            with self._cond:
+                self._claimed.discard(delivery_id)
+
+    def deliver_now(self, payload: Any) -> bool:
+        """
+        Deliver a payload on the calling thread, persisting it to the outbox first.
+
+        If the delivery fails the payload stays in the outbox and is retried by
+        the replay thread.
+        """
+        if self.outbox is None:
+            return self._attempt(payload)[0]
+
+        message_id = uuid.uuid4().hex
+        with self._cond:
+            self._claimed.add(message_id)
+        try:
+            try:
+                self.outbox.put(self.name, payload, message_id)
+            except sqlite3.Error as e:
+                # The caller still gets the real outcome, there just is no replay if it fails
+                logger.error(f"{self.name} message could not be persisted to the outbox, sending without it: {e}")
+                return self._attempt(payload)[0]
+            delivered = self._attempt(payload)[0]
+            if delivered:
+                self._remove_from_outbox([message_id])
+            else:
+                logger.warning(f"{self.name} delivery failed, message kept in the outbox for replay")
+            return delivered
+        finally:
+            with self._cond:
+                self._claimed.discard(message_id)
+
+    def _accepting(self) -> bool:
+        """Whether a new message can be queued, logging why not. Caller holds the lock."""
+        if self._closed:
+            logger.error(f"{self.name} delivery queue is shut down, message dropped")
+            return False
+        if len(self._payloads) >= self.max_queued:
+            logger.error(f"{self.name} delivery queue is full ({self.max_queued}), message dropped")
+            return False
+        return True
+
+    def _enqueue(self, delivery_id: str, payload: Any) -> None:
+        """Queue a payload under the given id. Caller holds the lock."""
+        self._payloads[delivery_id] = payload
+        self._set_status(delivery_id, QUEUED, attempts=0)
+
+        ready_at = time.monotonic()
+        if self.coalesce_window > 0:
+            key = self.group_key(payload)
+            window = self._windows.setdefault(key, {"key": key, "ids": [], "ready_at": ready_at + self.coalesce_window})
+            window["ids"].append(delivery_id)
+            self._window_of[delivery_id] = window
+            if len(window["ids"]) < self.coalesce_max:
+                ready_at = window["ready_at"]
+            else:
+                # A full window is closed and flushed right away instead of waiting for the timer
+                del self._windows[key]
+
+        self._schedule(delivery_id, ready_at)
+        self._cond.notify()
+
+    def status(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        """Return the delivery status record for an id, or None if it is unknown or expired."""
+        with self._cond:
+            record = self._statuses.get(delivery_id)
+            return dict(record) if record else None
+
+    def pending(self) -> int:
+        """Number of messages queued, awaiting retry or being sent."""
+        with self._cond:
+            return len(self._payloads)
+
+    def shutdown(self, timeout: float = 10.0) -> bool:
+        """
+        Stop accepting messages and wait for queued ones to be delivered.
+
+        Returns True if the queue drained within the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            # Deliver pending retries and open windows now instead of waiting them out
+            self._ready = [(0.0, seq, delivery_id) for _, seq, delivery_id in self._ready
+                           if self._scheduled.get(delivery_id) == seq]
+            heapq.heapify(self._ready)
+            self._cond.notify_all()
+
+            while self._payloads:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            drained = not self._payloads
+            self._stopping = True
+            self._cond.notify_all()
+
+        if not drained:
+            logger.warning(f"{self.name} delivery queue shut down with {len(self._payloads)} undelivered messages")
+        return drained
+
+    def _set_status(self, delivery_id: str, state: str, **fields: Any) -> None:
+        record = self._statuses.setdefault(delivery_id, {"id": delivery_id, "queued_at": time.time()})
+        record.update(fields, state=state, updated_at=time.time())
+        self._statuses.move_to_end(delivery_id)
+        while len(self._statuses) > self.history:
+            oldest = next(iter(self._statuses))
+            if oldest in self._payloads:
+                break
+            self._statuses.popitem(last=False)
+
+    def _schedule(self, delivery_id: str, ready_at: float) -> None:
+        seq = next(self._sequence)
+        self._scheduled[delivery_id] = seq
+        heapq.heappush(self._ready, (ready_at, seq, delivery_id))
+
+    def _next_batch(self) -> Optional[List[str]]:
+        """Block until a delivery is due, returning None when the queue is stopping."""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                now = time.monotonic()
+                if self._ready and self._ready[0][0] <= now:
+                    _, seq, delivery_id = heapq.heappop(self._ready)
+                    # Skip entries superseded by a coalesced batch or a rescheduled retry
+                    if self._scheduled.get(delivery_id) != seq:
+                        continue
+
+                    window = self._window_of.pop(delivery_id, None)
+                    if window is not None:
+                        batch = window["ids"]
+                        if self._windows.get(window["key"]) is window:
+                            del self._windows[window["key"]]
+                        for member in batch:
+                            self._window_of.pop(member, None)
+                    else:
+                        batch = [delivery_id]
+
+                    self._in_flight += 1
+                    for member in batch:
+                        del self._scheduled[member]
+                        self._set_status(member, SENDING, attempts=self._statuses[member]["attempts"] + 1)
+                    return batch
+                self._cond.wait(self._ready[0][0] - now if self._ready else None)
+
+    def _attempt(self, payload: Any) -> Tuple[bool, Optional[str]]:
+        try:
+            return bool(self.deliver(payload)), None
+        except Exception as e:
+            logger.error(f"{self.name} delivery raised: {e}")
+            return False, str(e)
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            outcomes: Dict[str, Tuple[bool, Optional[str]]] = {}
+            delivered: List[str] = []
+            try:
+                outcomes = self._send_batch(batch)
+            finally:
+                # Whatever happened, every member gets an outcome and the batch stops counting as in flight
+                with self._cond:
+                    self._in_flight -= 1
+                    try:
+                        for delivery_id in batch:
+                            if self._finish(delivery_id, *outcomes.get(delivery_id, (False, "not included in any packed payload"))):
+                                delivered.append(delivery_id)
+                    finally:
+                        self._cond.notify_all()
+                self._remove_from_outbox(delivered)
+
+    def _send_batch(self, batch: List[str]) -> Dict[str, Tuple[bool, Optional[str]]]:
+        """Send a batch, packing it when it has several members, and return each member's outcome."""
+        payloads = [self._payloads[delivery_id] for delivery_id in batch]
+        if len(batch) == 1:
+            return {batch[0]: self._attempt(payloads[0])}
+
+        try:
+            packed_payloads = self.pack(payloads)
+        except Exception as e:
+            # Counts as a failed attempt; retries are sent one by one, so they skip the packer
+            logger.error(f"{self.name} packing {len(batch)} payloads raised: {e}")
+            return {delivery_id: (False, f"packing failed: {e}") for delivery_id in batch}
+
+        outcomes: Dict[str, Tuple[bool, Optional[str]]] = {}
+        for packed, indexes in packed_payloads:
+            outcome = self._attempt(packed)
+            for index in indexes:
+                outcomes[batch[index]] = outcome
+        return outcomes
+
+    def _remove_from_outbox(self, delivery_ids: List[str]) -> None:
+        """Drop delivered messages from the outbox; called without the lock held."""
+        if self.outbox is None or not delivery_ids:
+            return
+        try:
+            for delivery_id in delivery_ids:
+                try:
+                    self.outbox.remove(delivery_id)
+                except Exception as e:
+                    # At worst the message is replayed once more
+                    logger.error(f"Could not remove delivered {self.name} message {delivery_id} from the outbox: {e}")
+        finally:
+            with self._cond:
+                self._claimed.difference_update(delivery_ids)
+
+    def _finish(self, delivery_id: str, delivered: bool, error: Optional[str]) -> bool:
+        """
+        Record a delivery outcome and schedule a retry if attempts remain. Caller holds the lock.
+
+        Returns True if the message was delivered; the caller removes it from the
+        outbox once the lock is released.
+        """
+        attempts = self._statuses[delivery_id]["attempts"]
+        if delivered:
+            del self._payloads[delivery_id]
+            self._set_status(delivery_id, DELIVERED)
+            if self.outbox is not None:
+                # Keep the replay thread off it until it is removed from the outbox
+                self._claimed.add(delivery_id)
+            return True
+        elif attempts < self.max_attempts:
+            delay = 0.0 if self._closed else self.backoff * (2 ** (attempts - 1))
+            self._schedule(delivery_id, time.monotonic() + delay)
+            self._set_status(delivery_id, RETRYING, error=error)
+        else:
+            payload = self._payloads.pop(delivery_id)
+            self._set_status(delivery_id, FAILED, error=error)
+            logger.error(f"{self.name} delivery {delivery_id} failed after {attempts} attempts")
+            if self.on_failed is not None:
+                try:
+                    self.on_failed(payload)
+                except Exception as e:
+                    logger.error(f"{self.name} on_failed callback raised: {e}")
+        return False
+
+    def _replay_loop(self) -> None:
+        """Re-queue messages left in the outbox, backing off while they keep failing."""
+        interval = self.replay_interval
+        replayed: Set[str] = set()
+        while True:
+            try:
+                entries = self.outbox.pending(self.name)
+            except sqlite3.Error as e:
+                logger.error(f"Could not read the {self.name} outbox for replay: {e}")
+                entries = []
+            with self._cond:
+                if self._closed:
+                    return
+                orphaned = [(message_id, payload) for message_id, payload in entries
+                            if message_id not in self._payloads and message_id not in self._claimed]
+                orphaned = orphaned[:max(0, self.max_queued - len(self._payloads))]
+                for message_id, payload in orphaned:
+                    self._enqueue(message_id, payload)
+                if orphaned:
+                    logger.info(f"Replaying {len(orphaned)} undelivered {self.name} messages from the outbox")
+
+                # Messages replayed last round that are back again are still failing
+                still_failing = any(message_id in replayed for message_id, _ in orphaned)
+                interval = min(interval * 2, self.max_replay_interval) if still_failing else self.replay_interval
+                replayed = {message_id for message_id, _ in orphaned}
+
+                deadline = time.monotonic() + interval
+                while not self._closed and deadline > time.monotonic():
+                    self._cond.wait(deadline - time.monotonic())
+
+
+def create_delivery_queue(name: str, deliver: Callable[[Any], bool], outbox_path: Optional[str] = None,
+                          **options: Any) -> DeliveryQueue:
+    """
+    Create a delivery queue configured from the WEBHOOK_DELIVERY_* environment variables.
+
+    Extra keyword options (such as the coalescing settings) are passed through.
+    If outbox_path is set, messages are persisted to a durable outbox there.
+    """
+    outbox = get_outbox(outbox_path) if outbox_path else None
+    return DeliveryQueue(
+        name,
+        deliver,
+        workers=int(os.getenv("WEBHOOK_DELIVERY_WORKERS", "4")),
+        max_attempts=int(os.getenv("WEBHOOK_DELIVERY_MAX_ATTEMPTS", "3")),
+        backoff=float(os.getenv("WEBHOOK_DELIVERY_BACKOFF", "1.0")),
+        max_queued=int(os.getenv("WEBHOOK_DELIVERY_MAX_QUEUED", "1000")),
+        outbox=outbox,
+        replay_interval=float(os.getenv("WEBHOOK_OUTBOX_REPLAY_INTERVAL", "30")),
+        **options
+    )
@@ -0,0 +1,119 @@
+"""
+Multi-destination fan-out for webhook notifications.
+
+Destinations are configured as a JSON object mapping a name to a webhook URL,
+or to {"url": ..., "match": <regex>} to route only matching notifications
+there. The same notification is sent to every selected destination
+concurrently, so the total latency is that of the slowest destination.
+"""
+import os
+import re
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16)
+def load_destinations(config: Optional[str], default_url: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse a destinations JSON mapping into {name: {"url": ..., "match": compiled regex or None}}.
+
+    A legacy single webhook URL is included as the destination "default"
+    unless the mapping defines its own. Invalid entries are logged and skipped.
+    """
+    destinations: Dict[str, Dict[str, Any]] = {}
+    if default_url:
+        destinations["default"] = {"url": default_url, "match": None}
+    if not config:
+        return destinations
+
+    try:
+        raw = json.loads(config)
+    except ValueError as e:
+        logger.error(f"Invalid destinations JSON: {e}")
+        return destinations
+    if not isinstance(raw, dict):
+        logger.error("Destinations must be a JSON object mapping names to webhook URLs")
+        return destinations
+
+    for name, spec in raw.items():
+        if isinstance(spec, str):
+            spec = {"url": spec}
+        if not isinstance(spec, dict) or not spec.get("url"):
+            logger.error(f"Destination '{name}' has no webhook url, skipping")
+            continue
+        try:
+            match = re.compile(spec["match"]) if spec.get("match") else None
+        except re.error as e:
+            logger.error(f"Destination '{name}' has an invalid match pattern: {e}")
+            continue
+        destinations[name] = {"url": spec["url"], "match": match}
+    return destinations
+
+
+def route_destinations(
+    destinations: Dict[str, Dict[str, Any]],
+    text: str,
+    names: Optional[Union[str, List[str]]] = None
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Select the destinations for a notification.
+
+    Explicitly requested names (a list or comma-separated string) are used as
+    given. Otherwise every destination whose match pattern is found in the
+    text, or that has no pattern, is selected.
+
+    Returns ({name: url}, [requested names that are not configured]).
+    """
+    if names is not None:
+        if isinstance(names, str):
+            names = [name.strip() for name in names.split(",") if name.strip()]
+        selected = {name: destinations[name]["url"] for name in names if name in destinations}
+        return selected, [name for name in names if name not in destinations]
+
+    selected = {
+        name: destination["url"] for name, destination in destinations.items()
+        if destination["match"] is None or destination["match"].search(text)
+    }
+    return selected, []
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("WEBHOOK_FANOUT_WORKERS", "8")),
+                thread_name_prefix="webhook-fanout"
+            )
+        return _executor
+
+
+def fan_out(targets: Dict[str, str], send: Callable[[str], Any]) -> Dict[str, Any]:
+    """
+    Call send(url) for every target concurrently and collect the results by name.
+
+    A send that raises is logged and reported as False.
+    """
+    if len(targets) <= 1:
+        futures = None
+    else:
+        executor = _get_executor()
+        futures = {name: executor.submit(send, url) for name, url in targets.items()}
+
+    results: Dict[str, Any] = {}
+    for name, url in targets.items():
+        try:
+            results[name] = futures[name].result() if futures else send(url)
+        except Exception as e:
+            logger.error(f"Sending to destination '{name}' failed: {e}")
+            results[name] = False
+    return results
@@ -0,0 +1,167 @@
+"""
+Durable on-disk outbox for webhook notifications.
+
+Messages are written to a SQLite database (WAL mode, full fsync) before they
+are sent and removed once the webhook confirms them, so nothing is lost if
+the process dies or the webhook is down. Writes from concurrent senders are
+group-committed by a single writer thread: every caller waits for durability,
+but many messages share one fsync.
+"""
+import json
+import time
+import atexit
+import uuid
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Waiter:
+    """Lets a caller wait for its batch to commit and see the error if it didn't."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def wait(self) -> None:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class Outbox:
+    """SQLite write-ahead outbox shared by the notifier delivery queues."""
+
+    def __init__(self, path: str, max_batch: int = 512):
+        self.path = path
+        self.max_batch = max_batch
+        self._ops: List[Tuple[Optional[str], Tuple[Any, ...], Optional[_Waiter]]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.commits = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, "
+            "queue TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._write_loop, name="webhook-outbox-writer", daemon=True)
+        self._writer.start()
+        # Registered before any queue using it, so it runs after their shutdown drains
+        atexit.register(self.close)
+
+    def put(self, queue: str, payload: Dict[str, Any], message_id: Optional[str] = None) -> str:
+        """
+        Durably persist a message, returning its id once it is committed to disk.
+
+        Raises sqlite3.Error if the write could not be committed.
+        """
+        message_id = message_id or uuid.uuid4().hex
+        committed = _Waiter()
+        self._enqueue(
+            "INSERT OR REPLACE INTO outbox (id, queue, payload, created_at) VALUES (?, ?, ?, ?)",
+            (message_id, queue, json.dumps(payload), time.time()),
+            committed
+        )
+        committed.wait()
+        return message_id
+
+    def remove(self, message_id: str) -> None:
+        """Remove a delivered message. Does not wait for the commit."""
+        self._enqueue("DELETE FROM outbox WHERE id = ?", (message_id,), None)
+
+    def pending(self, queue: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """All undelivered messages for a queue, oldest first."""
+        self.flush()
+        with self._read_lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM outbox WHERE queue = ? ORDER BY created_at", (queue,)
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def flush(self) -> None:
+        """Wait until every write queued so far is committed; raises sqlite3.Error if that batch failed."""
+        committed = _Waiter()
+        self._enqueue(None, (), committed)
+        committed.wait()
+
+    def close(self) -> None:
+        """Commit outstanding writes and stop the writer thread."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass  # already logged by the writer; still shut down
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._conn.close()
+
+    def _enqueue(self, sql: Optional[str], params: Tuple[Any, ...], committed: Optional[_Waiter]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Outbox is closed")
+            self._ops.append((sql, params, committed))
+            self._cond.notify()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ops and not self._closed:
+                    self._cond.wait()
+                if not self._ops and self._closed:
+                    return
+                batch, self._ops = self._ops[:self.max_batch], self._ops[self.max_batch:]
+
+            # Everything that arrived while the previous commit was syncing goes in one transaction
+            error = None
+            try:
+                with self._read_lock:
+                    try:
+                        for sql, params, _ in batch:
+                            if sql:
+                                self._conn.execute(sql, params)
+                        self._conn.commit()
+                    except sqlite3.Error:
+                        # Don't leave half the batch pending to be committed with the next one
+                        self._conn.rollback()
+                        raise
+                self.commits += 1
+            except sqlite3.Error as e:
+                # Failed removals are harmless: those messages are just replayed again
+                logger.error(f"Outbox write to {self.path} failed: {e}")
+                error = e
+            finally:
+                for _, _, committed in batch:
+                    if committed:
+                        committed.error = error
+                        committed.done.set()
+
+
+_outboxes: Dict[str, Outbox] = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(path: str) -> Optional[Outbox]:
+    """Get the shared outbox for a database path, opening it on first use."""
+    with _outboxes_lock:
+        if path not in _outboxes:
+            try:
+                _outboxes[path] = Outbox(path)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open notification outbox at {path}: {e}")
+                return None
+        return _outboxes[path]
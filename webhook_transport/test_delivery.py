@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test that background delivery workers survive failures outside deliver().
+
+A packer that raises or leaves a message out, or an outbox that is already
+closed, must not kill the worker thread or lose a message: every message still
+gets an outcome and shutdown() drains.
+"""
+import os
+import sys
+import tempfile
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook_transport.delivery import DELIVERED, DeliveryQueue
+from webhook_transport.outbox import Outbox
+
+
+def test_packer_failure_is_a_failed_attempt():
+    """A raising packer fails the attempt for every member; the retries are sent one by one."""
+    sent = []
+
+    def broken_pack(payloads):
+        raise ValueError("cannot pack")
+
+    queue = DeliveryQueue("test", lambda payload: sent.append(payload) or True, workers=1,
+                          max_attempts=2, backoff=0.01, coalesce_window=0.05,
+                          group_key=lambda payload: "group", pack=broken_pack)
+    ids = [queue.submit({"text": str(i)}) for i in range(3)]
+
+    assert queue.shutdown(timeout=5)
+    assert [queue.status(delivery_id)["state"] for delivery_id in ids] == [DELIVERED] * 3
+    assert sorted(payload["text"] for payload in sent) == ["0", "1", "2"]
+
+
+def test_member_left_out_of_packing_is_retried():
+    """A batch member the packer leaves out gets a failed attempt, not a lost message."""
+    sent = []
+
+    def pack_all_but_last(payloads):
+        return [({"texts": [payload["text"] for payload in payloads[:-1]]}, list(range(len(payloads) - 1)))]
+
+    queue = DeliveryQueue("test", lambda payload: sent.append(payload) or True, workers=1,
+                          max_attempts=2, backoff=0.01, coalesce_window=0.05,
+                          group_key=lambda payload: "group", pack=pack_all_but_last)
+    ids = [queue.submit({"text": str(i)}) for i in range(3)]
+
+    assert queue.shutdown(timeout=5)
+    assert [queue.status(delivery_id)["state"] for delivery_id in ids] == [DELIVERED] * 3
+    assert sent == [{"texts": ["0", "1"]}, {"text": "2"}]
+
+
+def test_closed_outbox_does_not_stall_shutdown():
+    """A delivered message that can't be removed from a closed outbox is logged, not fatal."""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = Outbox(os.path.join(directory, "outbox.db"))
+
+        def deliver(payload):
+            outbox.close()
+            return True
+
+        queue = DeliveryQueue("test", deliver, workers=1, outbox=outbox)
+        delivery_id = queue.submit({"text": "hello"})
+
+        assert queue.shutdown(timeout=5)
+        assert queue.status(delivery_id)["state"] == DELIVERED
+
+
+if __name__ == "__main__":
+    test_packer_failure_is_a_failed_attempt()
+    test_member_left_out_of_packing_is_retried()
+    test_closed_outbox_does_not_stall_shutdown()
+    print("✅ delivery workers survive packer and outbox failures")
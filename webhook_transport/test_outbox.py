@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test that outbox write failures reach the caller.
+
+A trigger makes inserts for one queue fail, so the tests can check that a
+failed write is raised from put()/flush() instead of being reported as
+durable, and that a failed batch is rolled back rather than committed later.
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook_transport.outbox import Outbox, _Waiter
+
+INSERT = "INSERT OR REPLACE INTO outbox (id, queue, payload, created_at) VALUES (?, ?, ?, 0)"
+
+
+def _failing_outbox(directory):
+    outbox = Outbox(os.path.join(directory, "outbox.db"))
+    with outbox._read_lock:
+        outbox._conn.execute(
+            "CREATE TRIGGER reject_bad BEFORE INSERT ON outbox WHEN NEW.queue = 'bad' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+        outbox._conn.commit()
+    return outbox
+
+
+def test_put_raises_when_write_fails():
+    """put() raises instead of returning an id for a message that is not on disk."""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = _failing_outbox(directory)
+        try:
+            try:
+                outbox.put("bad", {"text": "lost"})
+            except sqlite3.Error:
+                pass
+            else:
+                raise AssertionError("put() returned although the insert failed")
+
+            # The outbox keeps working for later writes
+            message_id = outbox.put("good", {"text": "kept"})
+            assert outbox.pending("good") == [(message_id, {"text": "kept"})]
+            assert outbox.pending("bad") == []
+        finally:
+            outbox.close()
+
+
+def test_failed_batch_is_rolled_back():
+    """Every write in a failed batch fails together and none of it is committed later."""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = _failing_outbox(directory)
+        try:
+            good, bad = _Waiter(), _Waiter()
+            # Holding the condition keeps the writer from starting until both are queued
+            with outbox._cond:
+                outbox._enqueue(INSERT, ("m1", "good", "{}"), good)
+                outbox._enqueue(INSERT, ("m2", "bad", "{}"), bad)
+
+            for waiter in (good, bad):
+                try:
+                    waiter.wait()
+                except sqlite3.Error:
+                    continue
+                raise AssertionError("a write in the failed batch was reported as committed")
+
+            # A later successful commit must not carry the rolled-back insert with it
+            outbox.flush()
+            assert outbox.pending("good") == []
+        finally:
+            outbox.close()
+
+
+if __name__ == "__main__":
+    test_put_raises_when_write_fails()
+    test_failed_batch_is_rolled_back()
+    print("✅ outbox write failures are raised and rolled back")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test that the throttle only suppresses notifications that were delivered.
+
+A message that fails to send must not block its own retry as a duplicate, and
+a suppressed message must be reported differently from one that was sent.
+"""
+import os
+import sys
+
+# Add the plugins directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook_transport.throttle import SUPPRESSED, NotificationThrottle
+
+WEBHOOK_URL = "https://discord.com/api/webhooks/0/test"
+
+
+def test_failed_message_is_not_a_duplicate():
+    """failed() forgets the message for dedupe and refunds its token."""
+    throttle = NotificationThrottle("test", dedupe_window=60, rate_per_minute=1, burst=1)
+    key = (WEBHOOK_URL, "Disk alert")
+
+    assert throttle.allow(key, "disk full")
+    throttle.failed(key, "disk full")
+    assert throttle.allow(key, "disk full")
+    assert not throttle.allow(key, "disk full")
+
+    stats = throttle.stats()
+    assert stats["failed"] == 1
+    assert stats["duplicates"] == 1
+
+
+def test_notifier_retries_after_failed_send():
+    """A send that failed is retried for real; only a repeat of a delivered one is suppressed."""
+    from discord_notifier import notifier
+
+    outcomes = [False, True]
+    sent = []
+
+    def deliver(job):
+        sent.append(job["payload"])
+        return outcomes.pop(0)
+
+    env = {"DISCORD_NOTIFIER_WEBHOOK_URL": WEBHOOK_URL, "DISCORD_NOTIFIER_DEDUPE_WINDOW": "60"}
+    saved_env = {name: os.environ.get(name) for name in env}
+    saved = notifier._deliver, notifier._throttle
+    os.environ.update(env)
+    notifier._deliver, notifier._throttle = deliver, None
+    try:
+        send = lambda: notifier.send_discord_notification("disk full", title="Disk alert", background=False)
+        assert send() is False
+        assert send() is True
+        assert send() == SUPPRESSED
+        assert len(sent) == 2
+    finally:
+        notifier._deliver, notifier._throttle = saved
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+if __name__ == "__main__":
+    test_failed_message_is_not_a_duplicate()
+    test_notifier_retries_after_failed_send()
+    print("✅ throttle only suppresses delivered notifications")
@@ -0,0 +1,169 @@
+"""
+Duplicate suppression and throttling for repeated notifications.
+
+Agents stuck in retry loops tend to send the same alert over and over. The
+throttle drops exact repeats seen within a dedupe window, and limits each key
+(for example destination and title) to a token-bucket rate. Suppressed
+messages can be rolled up into a single "(x N)" follow-up once the window or
+throttle interval has passed.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Drop expired dedupe and bucket state once this many keys are tracked
+PRUNE_THRESHOLD = 1024
+
+# What the notifiers return instead of a send result for a message the throttle dropped
+SUPPRESSED = "suppressed"
+
+
+class NotificationThrottle:
+    """
+    Decide whether a notification should be sent, suppressing repeats.
+
+    With a dedupe_window, a message whose key and content match one sent less
+    than dedupe_window seconds ago is suppressed. With rate_per_minute, each
+    key may send at most burst messages at once, refilled at that rate.
+
+    If `rollup` is given, it is called as rollup(sample, count) with the most
+    recent suppressed sample once the suppression period ends, so the
+    receiver still learns how many notifications were dropped.
+
+    A message counts as sent as soon as allow() lets it through; if it then
+    fails to deliver, call failed() so a retry of it is not suppressed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dedupe_window: float = 0.0,
+        rate_per_minute: float = 0.0,
+        burst: int = 5,
+        rollup: Optional[Callable[[Any, int], None]] = None
+    ):
+        self.name = name
+        self.dedupe_window = dedupe_window
+        self.rate_per_minute = rate_per_minute
+        self.burst = max(1, burst)
+        self.rollup = rollup
+
+        self._seen: Dict[str, float] = {}  # content digest -> time it was last sent
+        self._buckets: Dict[Hashable, List[float]] = {}  # key -> [tokens, updated_at]
+        self._suppressed: Dict[Hashable, Dict[str, Any]] = {}  # rollup group -> sample and count
+        self._stats = {"sent": 0, "failed": 0, "duplicates": 0, "throttled": 0, "rollups": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.dedupe_window > 0 or self.rate_per_minute > 0
+
+    def allow(self, key: Hashable, content: str, sample: Any = None) -> bool:
+        """Return True if the message should be sent, False if it was suppressed."""
+        digest = self._digest(key, content)
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+
+            if self.dedupe_window > 0:
+                sent_at = self._seen.get(digest)
+                if sent_at is not None and now - sent_at < self.dedupe_window:
+                    self._stats["duplicates"] += 1
+                    self._suppress(("duplicate", digest), sample, self.dedupe_window - (now - sent_at))
+                    logger.info(f"Suppressed duplicate {self.name} notification")
+                    return False
+
+            if self.rate_per_minute > 0 and not self._take(key, now):
+                self._stats["throttled"] += 1
+                self._suppress(("throttled", key), sample, 60.0 / self.rate_per_minute)
+                logger.info(f"Throttled {self.name} notification")
+                return False
+
+            if self.dedupe_window > 0:
+                self._seen[digest] = now
+            self._stats["sent"] += 1
+            return True
+
+    def failed(self, key: Hashable, content: str) -> None:
+        """Undo allow() for a message that was not delivered: forget it for dedupe and refund its token."""
+        digest = self._digest(key, content)
+        with self._lock:
+            self._seen.pop(digest, None)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(float(self.burst), bucket[0] + 1.0)
+            self._stats["failed"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of sent, failed, suppressed and rolled up notifications."""
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def _digest(key: Hashable, content: str) -> str:
+        return hashlib.sha256(f"{key!r}\0{content}".encode("utf-8")).hexdigest()
+
+    def _take(self, key: Hashable, now: float) -> bool:
+        """Take a token from the key's bucket. Caller holds the lock."""
+        bucket = self._buckets.setdefault(key, [float(self.burst), now])
+        bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate_per_minute / 60.0)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def _suppress(self, group: Hashable, sample: Any, delay: float) -> None:
+        """Count a suppressed message towards its rollup. Caller holds the lock."""
+        if self.rollup is None:
+            return
+        entry = self._suppressed.get(group)
+        if entry is not None:
+            entry["count"] += 1
+            entry["sample"] = sample
+            return
+        self._suppressed[group] = {"sample": sample, "count": 1}
+        timer = threading.Timer(delay, self._flush, (group,))
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self, group: Hashable) -> None:
+        with self._lock:
+            entry = self._suppressed.pop(group, None)
+            if entry is not None:
+                self._stats["rollups"] += 1
+        if entry is None:
+            return
+        try:
+            self.rollup(entry["sample"], entry["count"])
+        except Exception as e:
+            logger.error(f"{self.name} rollup notification failed: {e}")
+
+    def _prune(self, now: float) -> None:
+        """Forget expired dedupe entries and refilled buckets. Caller holds the lock."""
+        if len(self._seen) > PRUNE_THRESHOLD:
+            self._seen = {digest: sent_at for digest, sent_at in self._seen.items()
+                          if now - sent_at < self.dedupe_window}
+        if len(self._buckets) > PRUNE_THRESHOLD and self.rate_per_minute > 0:
+            refill = 60.0 * self.burst / self.rate_per_minute
+            self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                             if now - bucket[1] < refill}
+
+
+def create_throttle(prefix: str, rollup: Optional[Callable[[Any, int], None]] = None) -> NotificationThrottle:
+    """
+    Create a throttle configured from the <prefix>_DEDUPE_WINDOW, _THROTTLE_PER_MINUTE,
+    _THROTTLE_BURST and _ROLLUP environment variables.
+    """
+    return NotificationThrottle(
+        prefix.lower(),
+        dedupe_window=float(os.getenv(f"{prefix}_DEDUPE_WINDOW", "0")),
+        rate_per_minute=float(os.getenv(f"{prefix}_THROTTLE_PER_MINUTE", "0")),
+        burst=int(os.getenv(f"{prefix}_THROTTLE_BURST", "5")),
+        rollup=rollup if os.getenv(f"{prefix}_ROLLUP", "false").lower() == "true" else None
+    )
@@ -0,0 +1,87 @@
+"""
+Shared HTTP transport for webhook notifiers.
+Keeps one pooled keep-alive session per webhook host and bounds every request
+with connect/read timeouts.
+"""
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookTransport:
+    """Connection-pooled JSON POST client shared by the notifier plugins."""
+
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 10.0, pool_size: int = 10):
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, url: str) -> requests.Session:
+        """Get the keep-alive session for the URL's host, creating it on first use."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def post_json(self, url: str, payload: Dict[str, Any], timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """
+        POST a JSON payload to a webhook URL.
+
+        Raises requests.exceptions.RequestException on connection errors and timeouts.
+        """
+        return self._session_for(url).post(url, json=payload, timeout=timeout or self.timeout)
+
+    async def post_json_async(self, url: str, payload: Dict[str, Any], timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """Async variant of post_json; runs the pooled request off the event loop."""
+        return await asyncio.to_thread(self.post_json, url, payload, timeout)
+
+    def close(self) -> None:
+        """Close every pooled session."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_transport: Optional[WebhookTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> WebhookTransport:
+    """Get the process-wide webhook transport, configured from the environment."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = WebhookTransport(
+                connect_timeout=float(os.getenv("WEBHOOK_TRANSPORT_CONNECT_TIMEOUT", "5")),
+                read_timeout=float(os.getenv("WEBHOOK_TRANSPORT_READ_TIMEOUT", "10")),
+                pool_size=int(os.getenv("WEBHOOK_TRANSPORT_POOL_SIZE", "10"))
+            )
+        return _transport
+
+
+def post_json(url: str, payload: Dict[str, Any]) -> requests.Response:
+    """POST a JSON payload through the shared transport."""
+    return get_transport().post_json(url, payload)
+
+
+async def post_json_async(url: str, payload: Dict[str, Any]) -> requests.Response:
+    """Async POST of a JSON payload through the shared transport."""
+    return await get_transport().post_json_async(url, payload)